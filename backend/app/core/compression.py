@@ -0,0 +1,309 @@
+"""
+Jiwar Backend - Response Compression
+gzip / brotli negotiation for responses and precompressed cached payloads
+"""
+import gzip
+import hashlib
+import threading
+import time
+import zlib
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # Optional dependency - gzip only
+    brotli = None
+
+# Media types worth compressing (images, PDFs etc. are already compressed)
+COMPRESSIBLE_TYPES = (
+    "application/json", "application/javascript", "application/xml",
+    "text/", "image/svg+xml",
+)
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    """Encodings this server can produce, in order of preference"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick the preferred encoding allowed by an Accept-Encoding header.
+    Ties in q-value are broken by server preference (br over gzip).
+    """
+    if not accept_encoding:
+        return None
+
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token.strip()] = q
+
+    best, best_q = None, 0.0
+    for encoding in supported_encodings():
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a whole body with the configured level"""
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.compression_brotli_quality)
+    return gzip.compress(body, compresslevel=settings.compression_gzip_level, mtime=0)
+
+
+class _StreamCompressor:
+    """Incremental compressor for bodies sent in several chunks"""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=settings.compression_brotli_quality)
+            self._finish = self._compressor.finish
+            self._chunk = self._compressor.process
+        else:
+            # wbits 16 + MAX_WBITS writes the gzip header and trailer
+            self._compressor = zlib.compressobj(settings.compression_gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._finish = self._compressor.flush
+            self._chunk = self._compressor.compress
+
+    def process(self, chunk: bytes) -> bytes:
+        return self._chunk(chunk)
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+def _is_compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers or "content-range" in headers:
+        return False
+    content_type = headers.get("content-type", "")
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def _add_vary(headers: MutableHeaders):
+    vary = headers.get("vary")
+    if not vary:
+        headers["Vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding"
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses for clients that accept gzip (or brotli, when the
+    `brotli` package is installed).
+
+    Bodies below `minimum_size`, non-text media types and responses that
+    already carry a Content-Encoding (precompressed cache entries) are sent
+    untouched. Streaming responses are compressed chunk by chunk.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingSend(send, encoding, self.minimum_size)
+        await self.app(scope, receive, responder)
+
+
+class _CompressingSend:
+    """
+    Per-request `send` wrapper. The start message and the first body chunks
+    are held back until `minimum_size` bytes (or the end of the body) are
+    seen, so small streamed bodies are not compressed either.
+    """
+
+    def __init__(self, send: Send, encoding: str, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start_message: Optional[Message] = None
+        self.buffer: List[bytes] = []
+        self.buffered = 0
+        self.compressor: Optional[_StreamCompressor] = None
+        self.passthrough = False
+
+    async def __call__(self, message: Message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self.start_message = message
+            self.passthrough = not _is_compressible(Headers(raw=message.get("headers", [])))
+            if self.passthrough:
+                await self.send(message)
+            return
+        if message_type != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            self.buffer.append(body)
+            self.buffered += len(body)
+            if more_body and self.buffered < self.minimum_size:
+                return
+
+            body, self.buffer = b"".join(self.buffer), []
+            start, self.start_message = self.start_message, None
+            if self.buffered < self.minimum_size:
+                self.passthrough = True
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+
+            headers = MutableHeaders(raw=start.setdefault("headers", []))
+            headers["Content-Encoding"] = self.encoding
+            _add_vary(headers)
+            if not more_body:
+                # Whole body known - compress it in one go
+                body = compress(body, self.encoding)
+                headers["Content-Length"] = str(len(body))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+
+            del headers["Content-Length"]
+            self.compressor = _StreamCompressor(self.encoding)
+            await self.send(start)
+
+        chunk = self.compressor.process(body)
+        if not more_body:
+            chunk += self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+
+class CachedPayload:
+    """
+    An encoded response body plus its compressed variants.
+    Each variant is compressed once, on first request, and reused afterwards.
+
+    Responses carry a strong ETag derived from the body (suffixed with the
+    content coding for compressed variants) and answer a matching
+    If-None-Match with 304 Not Modified.
+    """
+    __slots__ = ("body", "media_type", "digest", "_variants", "_lock")
+
+    def __init__(self, body: bytes, media_type: str = "application/json"):
+        self.body = body
+        self.media_type = media_type
+        self.digest = hashlib.sha256(body).hexdigest()[:32]
+        self._variants: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def variant(self, encoding: str) -> bytes:
+        """Body compressed with `encoding`"""
+        compressed = self._variants.get(encoding)
+        if compressed is None:
+            with self._lock:
+                compressed = self._variants.get(encoding)
+                if compressed is None:
+                    compressed = compress(self.body, encoding)
+                    self._variants[encoding] = compressed
+        return compressed
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+    def matches(self, if_none_match: str) -> bool:
+        """Whether an If-None-Match header names any variant of this body"""
+        if if_none_match.strip() == "*":
+            return True
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag.strip('"').split("-", 1)[0] == self.digest:
+                return True
+        return False
+
+    def response(
+        self,
+        request: Request,
+        headers: Optional[Dict[str, str]] = None,
+        cache_control: Optional[str] = None
+    ) -> Response:
+        """Response with the best variant the client accepts (304 if it has it already)"""
+        headers = dict(headers or {})
+        headers["Vary"] = "Accept-Encoding"
+        if cache_control:
+            headers["Cache-Control"] = cache_control
+
+        encoding = None
+        if len(self.body) >= settings.compression_min_bytes:
+            encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+        headers["ETag"] = self.etag(encoding)
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and self.matches(if_none_match):
+            return Response(status_code=304, headers=headers)
+
+        body = self.body
+        if encoding is not None:
+            body = self.variant(encoding)
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type=self.media_type, headers=headers)
+
+
+class PayloadCache:
+    """
+    CachedPayload entries keyed by request parameters.
+
+    An entry is served while it has not expired (`ttl` seconds, 0 = no
+    expiry) and was stored under the same `version` the caller passes to
+    get(), e.g. a change counter of the underlying data.
+    """
+
+    def __init__(self, ttl: float = 0, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # key -> (version, payload, expires_at)
+        self._entries: Dict[Hashable, Tuple[Hashable, CachedPayload, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: Hashable = None) -> Optional[CachedPayload]:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        entry_version, payload, expires_at = entry
+        if entry_version != version or (self.ttl and expires_at < time.monotonic()):
+            return None
+        return payload
+
+    def set(self, key: Hashable, payload: CachedPayload, version: Hashable = None) -> CachedPayload:
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[key] = (version, payload, time.monotonic() + self.ttl)
+        return payload
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -34,6 +34,62 @@ class Settings(BaseSettings):
     mail_username: str | None = None
     mail_password: str | None = None
     support_email: str = "ahmedmohamed1442006m@gmail.com"  # Default, override in .env
+    smtp_host: str = "smtp.gmail.com"
+    smtp_port: int = 587
+    smtp_starttls: bool = True
+    smtp_auth: bool = True  # Log in with mail_username / mail_password
+    mail_queue_size: int = 1000  # Messages beyond this are rejected
+    mail_batch_size: int = 20  # Messages sent per connection checkout
+    mail_max_retries: int = 3
+    mail_retry_backoff_seconds: float = 2.0  # Doubled on every retry
+    
+    # Cache Settings
+    availability_cache_ttl_seconds: int = 60  # Doctor day-occupancy bitmaps
+    next_slot_cache_ttl_seconds: int | None = None  # Next-free-slot index, defaults to the availability TTL
+    next_slot_warm_interval_seconds: int = 30  # Precompute the next-free-slot index this often (below its TTL, 0 = on lookup only)
+    reference_cache_ttl_seconds: int = 300  # Specialties / subjects reload interval
+    reference_cache_max_age_seconds: int = 300  # Cache-Control max-age sent to clients (capped at the reload interval)
+    
+    # Upload Settings
+    max_upload_bytes: int = 10 * 1024 * 1024  # Larger uploads are rejected with 413
+    image_worker_threads: int = 2  # Thumbnail / WebP derivative generation
+    file_url_ttl_seconds: int = 900  # Signed file URLs are valid for 1-2x this
+    prescription_url_ttl_seconds: int = 300  # Same for prescription images (medical documents)
+    upload_cache_max_age_seconds: int = 31536000  # Uploads never change once stored
+    upload_accel_redirect_prefix: str | None = None  # e.g. "/protected-uploads/" to let nginx send the bytes
+    upload_gc_enabled: bool = False  # Delete unreferenced uploads in the maintenance loop
+    upload_gc_grace_hours: int = 24  # Uploads younger than this are never collected
+    
+    # Compression Settings (brotli is used when the package is installed)
+    compression_min_bytes: int = 1024  # Smaller responses are sent uncompressed
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 5
+    
+    # Metrics Settings (Prometheus text format at /api/metrics)
+    metrics_enabled: bool = True
+    metrics_token: str | None = None  # If set, scrapers must send "Authorization: Bearer <token>"
+    
+    # Query Audit Settings (development / staging: N+1 detection and SQL budgets)
+    query_audit_enabled: bool = False
+    query_repeat_threshold: int = 5  # Same statement this often in one request is reported as N+1
+    query_budget: int = 0  # Max statements per request, 0 disables
+    query_budgets: dict[str, int] = {}  # Per-route budgets, e.g. {"/api/search/all": 4} (route template -> max)
+    query_budget_strict: bool = False  # Raise instead of logging when over budget (fails tests)
+    
+    # Slow Query Settings
+    slow_query_threshold_ms: int = 0  # Statements slower than this are logged, 0 disables
+    slow_query_sample_seconds: int = 60  # Each statement shape is logged at most once per interval
+    slow_query_explain: bool = False  # Log the PostgreSQL plan (EXPLAIN, not ANALYZE) of slow SELECTs
+    
+    # Ranking Settings (Bayesian average: prior_mean weighted as prior_weight ratings)
+    ranking_prior_mean: float = 3.5
+    ranking_prior_weight: float = 10.0
+    ranking_decay_half_life_days: int = 0  # 0 disables recency decay
+    ranking_score_tolerance: float = 0.005  # Smaller score moves are not written (or announced to the directory)
+    
+    # Maintenance Settings
+    maintenance_interval_minutes: int = 60  # 0 disables periodic maintenance jobs
+    notification_retention_days: int = 90  # Read notifications older than this are archived
     
     class Config:
         env_file = ".env"
@@ -110,6 +110,19 @@ teachers_engine = create_engine(
 TeachersSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=teachers_engine)
 TeachersBase = declarative_base()
 
+# Database name -> engine (instrumentation, health checks)
+ENGINES = {
+    "users": users_engine,
+    "doctors": doctors_engine,
+    "pharmacies": pharmacies_engine,
+    "codes": codes_engine,
+    "restaurants": restaurants_engine,
+    "companies": companies_engine,
+    "engineers": engineers_engine,
+    "mechanics": mechanics_engine,
+    "teachers": teachers_engine,
+}
+
 
 # ============================================
 # DATABASE DEPENDENCIES
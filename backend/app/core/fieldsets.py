@@ -0,0 +1,67 @@
+"""
+Jiwar Backend - Sparse Fieldsets
+`fields=` query parameter support for provider endpoints
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+
+FIELDS_DESCRIPTION = (
+    "Comma-separated fields to return, e.g. id,name,latitude,longitude,rating "
+    "(default: all fields)"
+)
+
+Fieldset = Tuple[str, ...]
+
+
+def parse_fields(
+    fields: Optional[str],
+    model: Type[BaseModel],
+    always: Iterable[str] = ("id",)
+) -> Optional[Fieldset]:
+    """
+    Validate a `fields=` value against a response model.
+
+    Returns None when no fieldset was requested (all fields), otherwise the
+    requested fields plus `always`, in the model's field order (so equal
+    fieldsets compare equal, e.g. as cache keys).
+    """
+    if not fields:
+        return None
+
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = sorted(requested - model.model_fields.keys())
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error_code": "INVALID_FIELDS", "message": f"Unknown fields: {', '.join(unknown)}"}
+        )
+
+    requested.update(always)
+    return tuple(name for name in model.model_fields if name in requested)
+
+
+def select_fields(item: dict, fields: Optional[Fieldset]) -> dict:
+    """Project a response dict onto a fieldset (None keeps every field)"""
+    if fields is None:
+        return item
+    return {name: item.get(name) for name in fields}
+
+
+def entity_columns(entity_model, fields: Fieldset) -> List:
+    """Mapped columns of `entity_model` named in the fieldset (for load_only)"""
+    table_columns = entity_model.__table__.columns
+    return [getattr(entity_model, name) for name in fields if name in table_columns]
+
+
+def sparse_item(entity, fields: Fieldset, derived: Dict[str, Callable] = None) -> dict:
+    """
+    Response dict of an ORM entity loaded with load_only(entity_columns(...)).
+    Fields that are not columns are computed by the `derived` getters.
+    """
+    derived = derived or {}
+    return {
+        name: derived[name](entity) if name in derived else getattr(entity, name)
+        for name in fields
+    }
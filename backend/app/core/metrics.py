@@ -0,0 +1,287 @@
+"""
+Jiwar Backend - Performance Metrics
+Per-route latency / status metrics and per-request database usage,
+exposed in the Prometheus text format
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Upper bounds (seconds) of the request / query latency histograms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upper bounds of the queries-per-request histogram
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Route label of requests that matched no route (keeps label cardinality bounded)
+UNMATCHED_ROUTE = "<unmatched>"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set"""
+
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        # labels -> [bucket counts..., sum, count]
+        self._series: Dict[Labels, List[float]] = {}
+
+    def observe(self, labels: Labels, value: float):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(labels, le=_number(bound))} {cumulative}")
+            lines.append(f'{self.name}_bucket{_labels(labels, le="+Inf")} {series[-1]}')
+            lines.append(f"{self.name}_sum{_labels(labels)} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{_labels(labels)} {series[-1]}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(labels)} {_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """Value that goes up and down"""
+
+    kind = "gauge"
+
+    def dec(self, labels: Labels, amount: float = 1):
+        self.inc(labels, -amount)
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Labels, **extra: str) -> str:
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+class MetricsRegistry:
+    """All application metrics (updated from the event loop and DB threads)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter("http_requests_total", "HTTP requests by route, method and status code")
+        self.latency = Histogram(
+            "http_request_duration_seconds", "HTTP request latency by route", LATENCY_BUCKETS
+        )
+        self.in_flight = Gauge("http_requests_in_flight", "HTTP requests being processed")
+        self.request_queries = Histogram(
+            "http_request_db_queries", "Database queries per request by route and database", QUERY_COUNT_BUCKETS
+        )
+        self.request_db_time = Histogram(
+            "http_request_db_seconds", "Database time per request by route and database", LATENCY_BUCKETS
+        )
+        self.queries = Counter("db_queries_total", "Database queries by database")
+        self.query_time = Histogram("db_query_duration_seconds", "Database query latency by database", LATENCY_BUCKETS)
+        self._metrics = (
+            self.requests, self.latency, self.in_flight,
+            self.request_queries, self.request_db_time, self.queries, self.query_time,
+        )
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight.inc(())
+
+    def request_finished(
+        self, route: str, method: str, status_code: int, seconds: float, db_usage: Dict[str, List[float]]
+    ):
+        labels = (("route", route), ("method", method))
+        with self._lock:
+            self.in_flight.dec(())
+            self.requests.inc(labels + (("status", str(status_code)),))
+            self.latency.observe(labels, seconds)
+            for database, (count, db_seconds) in db_usage.items():
+                db_labels = (("route", route), ("database", database))
+                self.request_queries.observe(db_labels, count)
+                self.request_db_time.observe(db_labels, db_seconds)
+
+    def query_finished(self, database: str, seconds: float):
+        labels = (("database", database),)
+        with self._lock:
+            self.queries.inc(labels)
+            self.query_time.observe(labels, seconds)
+
+    def render(self) -> str:
+        with self._lock:
+            lines = [line for metric in self._metrics for line in metric.render()]
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+class RequestState:
+    """
+    The request being handled: its ASGI scope and database name ->
+    [queries, seconds]. Created per request and mutated in place, so
+    queries made from threadpool workers (which run in a copy of the
+    context) are counted.
+    """
+    __slots__ = ("scope", "db_usage")
+
+    def __init__(self, scope: Scope):
+        self.scope = scope
+        self.db_usage: Dict[str, List[float]] = {}
+
+
+_request_state: ContextVar[Optional[RequestState]] = ContextVar("request_state", default=None)
+
+# (threshold seconds, handler) - handler(database, engine, statement, parameters, executemany, seconds)
+# is called for statements at least that slow (see core/slow_queries.py)
+_slow_statement_handler: Optional[Tuple[float, Callable]] = None
+
+
+def on_slow_statement(threshold_seconds: float, handler: Callable):
+    """Register the callback for slow statements (one per process)"""
+    global _slow_statement_handler
+    _slow_statement_handler = (threshold_seconds, handler)
+
+
+def current_route() -> Optional[str]:
+    """"METHOD /route/{template}" of the request being handled, None outside requests"""
+    state = _request_state.get()
+    if state is None:
+        return None
+    return f"{state.scope['method']} {route_template(state.scope)}"
+
+
+# ==========================================
+# DATABASE INSTRUMENTATION
+# ==========================================
+
+def instrument_engine(database: str, engine: Engine):
+    """
+    Time every statement of an engine, attribute it to the current request
+    and hand slow ones to the slow statement handler.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("query_started")
+        if not started:
+            return
+        seconds = time.perf_counter() - started.pop()
+        metrics.query_finished(database, seconds)
+        state = _request_state.get()
+        if state is not None:
+            totals = state.db_usage.setdefault(database, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+        slow = _slow_statement_handler
+        if slow is not None and seconds >= slow[0]:
+            slow[1](database, engine, statement, parameters, executemany, seconds)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        # Failed statements never reach after_cursor_execute
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
+
+
+def instrument_engines(engines: Dict[str, Engine]):
+    for database, engine in engines.items():
+        instrument_engine(database, engine)
+
+
+# ==========================================
+# REQUEST INSTRUMENTATION
+# ==========================================
+
+def route_template(scope: Scope) -> str:
+    """
+    Path template of the route that handled a request, e.g. /api/doctors/{doctor_id}.
+    Routes of included routers may only know their own part of the template
+    (/{doctor_id}), so the router prefix is taken from the request path.
+    """
+    template = getattr(scope.get("route"), "path", None)
+    if not template:
+        return UNMATCHED_ROUTE
+    segments = scope["path"].split("/")
+    prefix = "/".join(segments[:max(len(segments) - template.count("/"), 0)])
+    return prefix + template
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status code and database usage of every HTTP request
+    under its route template (e.g. /api/doctors/{doctor_id}).
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        state = RequestState(scope)
+        token = _request_state.set(state)
+        metrics.request_started()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            seconds = time.perf_counter() - started
+            _request_state.reset(token)
+            metrics.request_finished(route_template(scope), scope["method"], status_code, seconds, state.db_usage)
@@ -0,0 +1,50 @@
+"""
+Jiwar Backend - Keyset Pagination Helpers
+Opaque cursors for (sort_key, id) keyset pagination
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Type
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode the sort key of the last row of a page into an opaque cursor"""
+    payload = [
+        {"dt": v.isoformat()} if isinstance(v, datetime) else v
+        for v in values
+    ]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_value(value: Any, expected: Type) -> Any:
+    if expected is datetime:
+        if not isinstance(value, dict) or not isinstance(value.get("dt"), str):
+            raise ValueError("cursor value is not a datetime")
+        return datetime.fromisoformat(value["dt"])
+    # bool is an int subclass but never a valid key
+    if isinstance(value, bool) or not isinstance(value, expected):
+        raise ValueError(f"cursor value is not {expected.__name__}")
+    return value
+
+
+def decode_cursor(cursor: str, *types: Type) -> List[Any]:
+    """
+    Decode a cursor produced by encode_cursor.
+    `types` are the expected types of the sort key values (int, datetime, ...).
+    Raises a 400 INVALID_CURSOR error if the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise ValueError("cursor size mismatch")
+        return [_decode_value(value, expected) for value, expected in zip(payload, types)]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error_code": "INVALID_CURSOR", "message": "Invalid pagination cursor"}
+        )
@@ -0,0 +1,156 @@
+"""
+Jiwar Backend - Query Audit
+Development / staging check for N+1 query patterns and per-request SQL budgets
+"""
+import logging
+import os
+import re
+import traceback
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+# Frames of application code (not libraries) make up the reported origin of a query
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+_THIS_FILE = os.path.abspath(__file__)
+
+# Values that vary between otherwise identical statements
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|:\w+|\$\d+")
+_VALUE_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """A request ran more statements than its query budget allows (strict mode)"""
+
+
+def fingerprint(statement: str) -> str:
+    """
+    Statement shape with literals, bind parameters and IN-lists collapsed,
+    so `WHERE id = 1` and `WHERE id = 2` count as the same query.
+    """
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _PLACEHOLDER.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _VALUE_LIST.sub("?+", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+def _origin(limit: int = 6) -> str:
+    """Innermost application frames of the current stack"""
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(_APP_DIR) and frame.filename != _THIS_FILE
+    ]
+    return "".join(traceback.format_list(frames[-limit:]))
+
+
+class RequestQueries:
+    """Statements executed while handling one request"""
+
+    def __init__(self):
+        self.count = 0
+        # (database, fingerprint) -> executions
+        self.repeats: Dict[Tuple[str, str], int] = {}
+        # (database, fingerprint) -> stack where it crossed the repeat threshold
+        self.origins: Dict[Tuple[str, str], str] = {}
+
+    def record(self, database: str, statement: str):
+        self.count += 1
+        key = (database, fingerprint(statement))
+        executions = self.repeats.get(key, 0) + 1
+        self.repeats[key] = executions
+        if executions == settings.query_repeat_threshold:
+            self.origins[key] = _origin()
+
+
+_request_queries: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+
+def audit_engine(database: str, engine: Engine):
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        queries = _request_queries.get()
+        if queries is not None:
+            queries.record(database, statement)
+
+
+def audit_engines(engines: Dict[str, Engine]):
+    for database, engine in engines.items():
+        audit_engine(database, engine)
+
+
+def query_budget(route: str) -> int:
+    """Statement budget of a route template: QUERY_BUDGETS entry, else QUERY_BUDGET (0 = none)"""
+    return settings.query_budgets.get(route, settings.query_budget)
+
+
+def report(method: str, route: str, queries: RequestQueries):
+    """Log N+1 patterns of a handled request and enforce its query budget"""
+    for (database, statement_shape), executions in queries.repeats.items():
+        if executions >= settings.query_repeat_threshold:
+            logger.warning(
+                f"⚠️ N+1 query on {method} {route}: {executions}x on {database}: {statement_shape}\n"
+                f"{queries.origins.get((database, statement_shape), '')}"
+            )
+
+    budget = query_budget(route)
+    if budget and queries.count > budget:
+        message = f"{method} {route} ran {queries.count} queries (budget {budget})"
+        if settings.query_budget_strict:
+            raise QueryBudgetExceeded(message)
+        logger.warning(f"⚠️ Query budget exceeded: {message}")
+
+
+class QueryAuditMiddleware:
+    """
+    Tracks the statements of every HTTP request, per database.
+    Statements repeated QUERY_REPEAT_THRESHOLD times are logged as N+1
+    patterns with the route and the application stack that issued them.
+
+    The check runs when the response starts, before anything is sent:
+    requests over their budget (QUERY_BUDGETS / QUERY_BUDGET) are logged,
+    or with QUERY_BUDGET_STRICT fail with QueryBudgetExceeded (a 500, and
+    a raised error in test clients) instead of being answered.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries()
+        reported = False
+
+        async def send_wrapper(message: Message):
+            nonlocal reported
+            if message["type"] == "http.response.start" and not reported:
+                reported = True
+                report(scope["method"], route_template(scope), queries)
+            await send(message)
+
+        token = _request_queries.set(queries)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_queries.reset(token)
+            if not reported:
+                # The request failed before responding - still log its N+1 patterns
+                reported = True
+                try:
+                    report(scope["method"], route_template(scope), queries)
+                except QueryBudgetExceeded as e:
+                    logger.warning(f"⚠️ Query budget exceeded: {e}")
@@ -0,0 +1,61 @@
+"""
+Jiwar Backend - Fast JSON Responses
+orjson-backed response class for large list endpoints
+"""
+import json
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+from enum import Enum
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # Optional dependency - fall back to the stdlib encoder
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """Types the encoders do not handle natively"""
+    if isinstance(value, datetime):
+        if value.tzinfo is not None and value.utcoffset() == timezone.utc.utcoffset(None):
+            return value.replace(tzinfo=None).isoformat() + "Z"
+        return value.isoformat()
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode plain dicts / lists / tuples to JSON bytes (same output as Pydantic for dates)"""
+    if orjson is not None:
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+        )
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Response for endpoints that build their payload from plain dicts.
+
+    Returning it directly skips FastAPI's response_model validation and
+    serialization; keep `response_model=` on the route so the OpenAPI
+    schema is still generated, and make sure the dicts carry every field
+    of that model.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
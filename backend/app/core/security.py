@@ -182,6 +182,8 @@ def mark_code_as_used(code: str, code_type: str, email: str, codes_db: Session)
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+# Same scheme, but a missing token is left to the endpoint (signed file URLs)
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
 
 def get_current_user(
     token: str = Depends(oauth2_scheme),
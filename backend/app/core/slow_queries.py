@@ -0,0 +1,138 @@
+"""
+Jiwar Backend - Slow Query Log
+Statements over SLOW_QUERY_THRESHOLD_MS are logged (sampled) with redacted
+parameters, the calling route and optionally their PostgreSQL plan
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.core.metrics import current_route, on_slow_statement
+from app.core.query_audit import fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Statement shapes tracked for sampling before the table is reset
+MAX_TRACKED_STATEMENTS = 1000
+
+# EXPLAIN runs off the request threads, on connections outside the request pools
+_explain_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+# database -> un-instrumented NullPool engine for EXPLAIN (only used by the executor thread)
+_explain_engines: Dict[str, Engine] = {}
+
+# Statement shape -> [last logged (monotonic), slow executions not logged since]
+_samples: Dict[str, list] = {}
+_samples_lock = threading.Lock()
+
+
+def redact(parameters: Any) -> Any:
+    """Parameter shapes without their values (which may be emails, tokens, ...)"""
+    if isinstance(parameters, dict):
+        return {key: redact(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany - one row is enough
+            return [redact(parameters[0]), f"... {len(parameters)} rows"]
+        return [redact(value) for value in parameters]
+    if parameters is None:
+        return None
+    if isinstance(parameters, (str, bytes)):
+        return f"<{type(parameters).__name__} len={len(parameters)}>"
+    return f"<{type(parameters).__name__}>"
+
+
+def _sample(shape: str) -> Optional[int]:
+    """
+    Whether a slow statement shape should be logged now.
+    Returns the number of executions suppressed since it was last logged,
+    or None to suppress this one.
+    """
+    now = time.monotonic()
+    with _samples_lock:
+        sample = _samples.get(shape)
+        if sample is not None and now - sample[0] < settings.slow_query_sample_seconds:
+            sample[1] += 1
+            return None
+        if sample is None and len(_samples) >= MAX_TRACKED_STATEMENTS:
+            _samples.clear()
+        suppressed = sample[1] if sample is not None else 0
+        _samples[shape] = [now, 0]
+        return suppressed
+
+
+def _explain_engine(database: str, engine: Engine) -> Engine:
+    """
+    Engine for EXPLAIN: a NullPool copy of a database engine, so plans never
+    take a connection from the pool serving requests, and without the
+    metrics instrumentation, so the EXPLAIN itself is not timed or logged.
+    """
+    explain_engine = _explain_engines.get(database)
+    if explain_engine is None:
+        explain_engine = _explain_engines[database] = create_engine(engine.url, poolclass=NullPool)
+    return explain_engine
+
+
+def _explain(database: str, engine: Engine, statement: str, parameters: Any) -> str:
+    """Estimated plan of a statement (EXPLAIN without ANALYZE - it is not executed)"""
+    with _explain_engine(database, engine).connect() as connection:
+        rows = connection.exec_driver_sql(f"EXPLAIN (ANALYZE false) {statement}", parameters)
+        return "\n".join(row[0] for row in rows)
+
+
+def _log(
+    database: str, route: str, seconds: float, shape: str, parameters: Any,
+    suppressed: int, plan: Optional[str] = None
+):
+    similar = f" (+{suppressed} similar since last logged)" if suppressed else ""
+    message = (
+        f"🐢 Slow query ({seconds * 1000:.0f} ms) on {database} from {route}{similar}: {shape}"
+        f" | params: {redact(parameters)}"
+    )
+    if plan:
+        message += f"\n{plan}"
+    logger.warning(message)
+
+
+def _log_with_plan(engine, database, route, seconds, shape, statement, parameters, suppressed):
+    try:
+        plan = _explain(database, engine, statement, parameters)
+    except Exception as e:
+        plan = f"(EXPLAIN failed: {e})"
+    _log(database, route, seconds, shape, parameters, suppressed, plan)
+
+
+def _can_explain(engine: Engine, statement: str, executemany: bool) -> bool:
+    return (
+        settings.slow_query_explain
+        and not executemany
+        and engine.dialect.name == "postgresql"
+        and statement.lstrip()[:6].upper() in ("SELECT", "WITH ")
+    )
+
+
+def _slow_statement(database: str, engine: Engine, statement: str, parameters: Any, executemany: bool, seconds: float):
+    """Slow statement handler - called by the metrics instrumentation of every engine"""
+    shape = fingerprint(statement)
+    suppressed = _sample(shape)
+    if suppressed is None:
+        return
+    route = current_route() or "background"
+
+    if _can_explain(engine, statement, executemany):
+        _explain_executor.submit(
+            _log_with_plan, engine, database, route, seconds, shape, statement, parameters, suppressed
+        )
+    else:
+        _log(database, route, seconds, shape, parameters, suppressed)
+
+
+def enable_slow_query_log():
+    """Log statements slower than SLOW_QUERY_THRESHOLD_MS (needs the metrics instrumentation)"""
+    on_slow_statement(settings.slow_query_threshold_ms / 1000, _slow_statement)
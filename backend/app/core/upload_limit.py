@@ -0,0 +1,62 @@
+"""
+Jiwar Backend - Upload Size Limit
+Rejects oversized multipart uploads before their body is parsed and spooled
+"""
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+# Multipart framing (boundaries, part headers, small form fields) allowed on top of the file
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+
+def upload_too_large_detail() -> str:
+    return f"File too large. Maximum size is {round(settings.max_upload_bytes / (1024 * 1024), 1):g} MB"
+
+
+class UploadLimitMiddleware:
+    """
+    Enforces MAX_UPLOAD_BYTES on multipart/form-data requests (the upload
+    routes) at the ASGI level. By the time a route runs, the form has been
+    fully received and spooled to disk, so the limit is applied here:
+    a declared Content-Length over the limit is answered with 413 without
+    reading the body, and bodies without one are counted while they stream
+    in and cut off with 413 once they exceed it.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        if not headers.get("content-type", "").startswith("multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = settings.max_upload_bytes + MULTIPART_OVERHEAD_BYTES
+        content_length = headers.get("content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_bytes:
+            response = JSONResponse(status_code=413, content={"detail": upload_too_large_detail()})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_wrapper() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    # Raised into the form parser - FastAPI passes HTTPException through
+                    raise HTTPException(status_code=413, detail=upload_too_large_detail())
+            return message
+
+        await self.app(scope, receive_wrapper, send)
@@ -4,19 +4,25 @@ FastAPI application with 8 database architecture
 """
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 import uvicorn
+from starlette.concurrency import run_in_threadpool
 
 from app.core.config import settings
+from app.core.compression import CompressionMiddleware
+from app.core.upload_limit import UploadLimitMiddleware
+from app.core.metrics import MetricsMiddleware, instrument_engines, metrics
+from app.core.query_audit import QueryAuditMiddleware, audit_engines
+from app.core.slow_queries import enable_slow_query_log
 from app.core.limiter import limiter
 from app.core.database import (
     UsersBase, DoctorsBase, PharmaciesBase, CodesBase, TeachersBase,
     users_engine, doctors_engine, pharmacies_engine, codes_engine, teachers_engine,
-    DoctorsSessionLocal, TeachersSessionLocal
+    DoctorsSessionLocal, TeachersSessionLocal, ENGINES
 )
 from app.routers import (
     auth_router,
@@ -30,7 +36,8 @@ from app.routers import (
     utils_router,
     favorites_router,
     addresses_router,
-    notifications_router
+    notifications_router,
+    providers_router
 )
 from fastapi.staticfiles import StaticFiles
 
@@ -44,20 +51,55 @@ app = FastAPI(
     openapi_url="/api/openapi.json"
 )
 
-# Configure Rate Limiter
+# ============================================
+# MIDDLEWARE
+# ============================================
+# Starlette runs the middleware added last first, so the stack below is
+# added innermost first. Request path, outermost to innermost:
+#   1. MetricsMiddleware      - latency / DB usage of the whole request (incl. compression),
+#                               request context of the slow query log
+#   2. QueryAuditMiddleware   - N+1 / query budget checks (optional)
+#   3. CompressionMiddleware  - compresses the final body of every inner middleware
+#   4. CORSMiddleware
+#   5. SlowAPIMiddleware      - rate limiting
+#   6. UploadLimitMiddleware  - rejects oversized uploads before the form is parsed (inside
+#                               CORS, so browsers can read the 413), closest to the routes
+
+# 6. Upload size limit
+app.add_middleware(UploadLimitMiddleware)
+
+# 5. Configure Rate Limiter
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 app.add_middleware(SlowAPIMiddleware)
 
-# Configure CORS
+# 4. Configure CORS
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Keyset pagination cursor of /api/notifications, read by the web client
+    expose_headers=["X-Next-Cursor"],
 )
 
+# 3. Compress large responses
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_min_bytes)
+
+# 2. N+1 / query budget checks (development and staging)
+if settings.query_audit_enabled:
+    audit_engines(ENGINES)
+    app.add_middleware(QueryAuditMiddleware)
+
+# 1. Per-route latency and per-request DB usage. The same statement hook
+#    feeds the slow query log, so it is installed for either of them.
+if settings.metrics_enabled or settings.slow_query_threshold_ms > 0:
+    instrument_engines(ENGINES)
+    app.add_middleware(MetricsMiddleware)
+if settings.slow_query_threshold_ms > 0:
+    enable_slow_query_log()
+
 # Mount Static Files
 # SECURITY WARNING: Do not serve static files publicly. Use /api/utils/files/{filename} instead.
 # app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -120,6 +162,7 @@ app.include_router(utils_router, prefix="/api/utils", tags=["Utils"])
 app.include_router(favorites_router, prefix="/api/favorites", tags=["Favorites"])
 app.include_router(addresses_router, prefix="/api/addresses", tags=["Addresses"])
 app.include_router(notifications_router, prefix="/api/notifications", tags=["Notifications"])
+app.include_router(providers_router, prefix="/api/providers", tags=["Providers"])
 
 
 @app.get("/")
@@ -144,6 +187,16 @@ async def health_check():
     return {"status": "healthy", "databases": 8}
 
 
+@app.get("/api/metrics", include_in_schema=False)
+async def metrics_endpoint(request: Request):
+    """Prometheus scrape endpoint"""
+    if not settings.metrics_enabled:
+        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    if settings.metrics_token and request.headers.get("authorization") != f"Bearer {settings.metrics_token}":
+        return JSONResponse(status_code=401, content={"detail": "Not authenticated"})
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 # ============================================
 # DATABASE INITIALIZATION
 # ============================================
@@ -172,6 +225,7 @@ async def startup_event():
     
     # Seed specialties
     from app.models.doctor import SPECIALTIES_DATA, Specialty
+    from app.services.reference_data import reference_data
     
     try:
         db = DoctorsSessionLocal()
@@ -180,6 +234,7 @@ async def startup_event():
                 specialty = Specialty(**spec_data)
                 db.add(specialty)
             db.commit()
+            reference_data.invalidate()
             print("   ✅ Seeded specialties data")
         db.close()
     except Exception as e:
@@ -198,16 +253,57 @@ async def startup_event():
                 subject = Subject(**sub_data)
                 db.add(subject)
             db.commit()
+            reference_data.invalidate()
             print("   ✅ Seeded subjects data")
         db.close()
     except Exception as e:
         print(f"   ⚠️ Seeding subjects: {e}")
     
+    # Reference data (specialties, subjects) served from memory
+    try:
+        reference_data.load()
+        print("   ✅ Loaded reference data")
+    except Exception as e:
+        print(f"   ⚠️ Reference data (loaded on first request): {e}")
+    
+    # Provider directory: sync on provider writes, initial fill of a fresh table
+    from app.services.directory import register_directory_sync, rebuild_directory_if_empty
+    register_directory_sync()
+    try:
+        if rebuild_directory_if_empty():
+            print("   ✅ Built provider directory")
+    except Exception as e:
+        print(f"   ⚠️ Provider directory: {e}")
+    
+    # Periodic maintenance (notification retention, ...)
+    from app.services.maintenance import start_maintenance, start_next_slot_warming
+    app.state.maintenance_task = start_maintenance()
+    app.state.next_slot_task = start_next_slot_warming()
+    
+    # Support mail worker (pooled SMTP connection)
+    from app.services.mailer import mailer
+    mailer.start()
+    
     print(f"\n🚀 {settings.app_name} API started!")
     print("   📊 8 Databases connected")
     print("   📡 API: http://localhost:8000/api/docs\n")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background jobs"""
+    for name in ("maintenance_task", "next_slot_task"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+    
+    # Flush queued mail and directory syncs without blocking the event loop
+    from app.services.mailer import mailer
+    from app.services.directory import directory_sync
+    await run_in_threadpool(mailer.stop)
+    await run_in_threadpool(directory_sync.stop)
+
+
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
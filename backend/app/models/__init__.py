@@ -3,6 +3,7 @@ Jiwar Backend - Models Package
 """
 from app.models.user import User, UserType, UserDevice
 from app.models.notification import Notification
+from app.models.directory import ProviderDirectory, ProviderDirectorySequence
 from app.models.doctor import Doctor, Specialty, DoctorRating, SPECIALTIES_DATA
 from app.models.pharmacy import Pharmacy, Medicine, PharmacyRating
 from .teacher import Teacher, TeacherPricing, Subject
@@ -20,6 +21,8 @@ __all__ = [
     "User",
     "UserType",
     "UserDevice",
+    "ProviderDirectory",
+    "ProviderDirectorySequence",
     # Doctor
     "Doctor",
     "Specialty",
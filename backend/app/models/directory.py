@@ -0,0 +1,82 @@
+"""
+Jiwar Backend - Provider Directory Model (Users Database)
+Denormalized read model of doctors, pharmacies and teachers
+"""
+from sqlalchemy import (
+    Column, Integer, BigInteger, String, Float, Boolean,
+    DateTime, Text, JSON, Index, UniqueConstraint, DDL, event
+)
+from sqlalchemy.sql import func, expression
+
+from app.core.database import UsersBase
+
+
+class ProviderDirectory(UsersBase):
+    """
+    One row per provider, kept in sync from the doctor / pharmacy / teacher
+    write paths (see services/directory.py). Cross-vertical reads (map,
+    unified search, favorites, batch) query this table instead of fanning
+    out to three databases.
+    """
+    __tablename__ = "provider_directory"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    provider_type = Column(String(20), nullable=False)  # doctor, pharmacy, teacher
+    provider_id = Column(Integer, nullable=False)  # Id in the provider's own database
+    name = Column(String(100), nullable=False)
+    category_id = Column(Integer, nullable=True)  # specialty_id / subject_id
+    category = Column(String(100), nullable=True)  # Specialty / subject display name
+    city = Column(String(50), nullable=True)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    rating = Column(Float, default=0.0)
+    total_ratings = Column(Integer, default=0)
+    ranking_score = Column(Float, default=0.0)
+    examination_fee = Column(Float, nullable=True)
+    is_verified = Column(Boolean, default=True)
+    search_text = Column(Text, nullable=False, default="")  # Lowercased name + category names
+    payload = Column(JSON, nullable=False)  # Precomputed MapProvider fields
+    is_deleted = Column(Boolean, default=False, server_default=expression.false(), nullable=False)  # Tombstone
+    change_seq = Column(BigInteger, default=0, server_default="0", nullable=False)  # Change feed position
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now()
+    )
+    
+    __table_args__ = (
+        UniqueConstraint("provider_type", "provider_id", name="uq_provider_directory_provider"),
+        # Map / search listings: verified providers of a city, best first
+        Index("ix_provider_directory_city_rank", "is_verified", "city", "ranking_score"),
+        Index("ix_provider_directory_type_rank", "provider_type", "is_verified", "ranking_score"),
+        # Change feed: WHERE (change_seq, id) > (?, ?) ORDER BY change_seq, id
+        Index("ix_provider_directory_change_seq", "change_seq", "id"),
+        # Unified search: search_text LIKE '%q%' (trigram GIN, PostgreSQL only)
+        Index(
+            "ix_provider_directory_search_trgm", "search_text",
+            postgresql_using="gin", postgresql_ops={"search_text": "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+    )
+    
+    def __repr__(self):
+        return f"<ProviderDirectory({self.provider_type}:{self.provider_id}, name='{self.name}')>"
+
+
+# The trigram index needs pg_trgm
+event.listen(
+    ProviderDirectory.__table__, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+
+class ProviderDirectorySequence(UsersBase):
+    """
+    Single-row counter handing out change_seq values.
+    Incrementing it row-locks the counter until the directory write commits,
+    so sequence numbers become visible in order and the change feed never
+    skips a change.
+    """
+    __tablename__ = "provider_directory_sequence"
+    
+    id = Column(Integer, primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
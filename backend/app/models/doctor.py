@@ -4,12 +4,13 @@ Defines the Doctor profile with location and availability
 """
 from sqlalchemy import (
     Column, Integer, String, Float, Boolean, 
-    DateTime, Text, ForeignKey, JSON
+    DateTime, Text, ForeignKey, JSON, Index
 )
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
 from app.core.database import DoctorsBase
+from app.models.mixins import RatingAggregateMixin
 
 
 class Specialty(DoctorsBase):
@@ -30,7 +31,7 @@ class Specialty(DoctorsBase):
         return f"<Specialty(id={self.id}, name_ar='{self.name_ar}')>"
 
 
-class Doctor(DoctorsBase):
+class Doctor(RatingAggregateMixin, DoctorsBase):
     """
     Doctor profile model (stored in Doctors DB)
     """
@@ -65,6 +66,13 @@ class Doctor(DoctorsBase):
     specialty = relationship("Specialty", back_populates="doctors")
     ratings = relationship("DoctorRating", back_populates="doctor")
     
+    # Nearest-doctor search: specialty filter + latitude/longitude bounding box
+    __table_args__ = (
+        Index("ix_doctors_specialty_lat_lng", "specialty_id", "latitude", "longitude"),
+        # list_doctors: WHERE city = ? ORDER BY ranking_score DESC LIMIT n
+        Index("ix_doctors_city_ranking", "city", "ranking_score", "id"),
+    )
+    
     def __repr__(self):
         return f"<Doctor(id={self.id}, name='{self.name}')>"
 
@@ -84,6 +92,12 @@ class DoctorRating(DoctorsBase):
     
     # Relationships
     doctor = relationship("Doctor", back_populates="ratings")
+    
+    # Keyset pagination of a provider's reviews (newest/oldest, highest/lowest)
+    __table_args__ = (
+        Index("ix_doctor_ratings_doctor_created_id", "doctor_id", "created_at", "id"),
+        Index("ix_doctor_ratings_doctor_rating_id", "doctor_id", "rating", "id"),
+    )
 
 
 SPECIALTIES_DATA = [
@@ -0,0 +1,42 @@
+"""
+Jiwar Backend - Shared Model Mixins
+Column groups reused by provider profiles living in different databases
+"""
+from sqlalchemy import Column, Float, Integer
+
+from app.core.config import settings
+
+
+def _unrated_ranking_score() -> float:
+    """Bayesian average of a provider without ratings is the prior mean"""
+    return settings.ranking_prior_mean
+
+
+class RatingAggregateMixin:
+    """
+    Running rating aggregates of a provider.
+
+    `rating` (average) and `total_ratings` stay on the models for the
+    existing readers; these columns let a new rating be applied with a
+    single UPDATE instead of re-scanning every rating of the provider.
+    """
+    rating_sum = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_1_count = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_2_count = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_3_count = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_4_count = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_5_count = Column(Integer, default=0, server_default="0", nullable=False)
+
+    # Ranking: Bayesian average over recency-weighted ratings (see services/ratings.py).
+    # Without decay the weighted sum/count equal rating_sum/total_ratings.
+    ranking_weighted_sum = Column(Float, default=0.0, server_default="0", nullable=False)
+    ranking_weighted_count = Column(Float, default=0.0, server_default="0", nullable=False)
+    # Rows inserted outside the ORM start at the prior mean too, not below every rated provider
+    ranking_score = Column(
+        Float, default=_unrated_ranking_score,
+        server_default=str(settings.ranking_prior_mean), nullable=False, index=True
+    )
+
+    def rating_histogram(self) -> dict:
+        """{stars: count} for 1..5"""
+        return {stars: getattr(self, f"rating_{stars}_count") or 0 for stars in range(1, 6)}
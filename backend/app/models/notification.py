@@ -1,7 +1,7 @@
 """
 Jiwar Backend - Notification Model
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Index, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import UsersBase
@@ -19,8 +19,38 @@ class Notification(UsersBase):
     data = Column(JSON, nullable=True) # Store action/type data
     is_read = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    
+
     user = relationship("User", back_populates="notifications")
 
+    # Matches the feed ordering: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+    __table_args__ = (
+        Index("ix_notifications_user_created_id", "user_id", "created_at", "id"),
+        # Retention job: read notifications oldest first, WHERE is_read AND created_at < ?
+        Index(
+            "ix_notifications_read_created_id", "created_at", "id",
+            postgresql_where=text("is_read"),
+            sqlite_where=text("is_read = 1"),
+        ),
+    )
+
     def __repr__(self):
         return f"<Notification(id={self.id}, title='{self.title}')>"
+
+
+class NotificationArchive(UsersBase):
+    """
+    Old read notifications moved out of the hot table by the retention job
+    """
+    __tablename__ = "notifications_archive"
+
+    id = Column(Integer, primary_key=True)  # Same id as the original notification
+    user_id = Column(Integer, nullable=False, index=True)
+    title = Column(String(255), nullable=False)
+    body = Column(String(1000), nullable=False)
+    data = Column(JSON, nullable=True)
+    is_read = Column(Boolean, default=True)
+    created_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<NotificationArchive(id={self.id}, user_id={self.user_id})>"
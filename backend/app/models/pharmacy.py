@@ -4,15 +4,16 @@ Defines the Pharmacy profile with location and medicines
 """
 from sqlalchemy import (
     Column, Integer, String, Float, Boolean, 
-    DateTime, Text, ForeignKey, JSON
+    DateTime, Text, ForeignKey, JSON, Index
 )
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
 from app.core.database import PharmaciesBase
+from app.models.mixins import RatingAggregateMixin
 
 
-class Pharmacy(PharmaciesBase):
+class Pharmacy(RatingAggregateMixin, PharmaciesBase):
     """
     Pharmacy profile model (stored in Pharmacies DB)
     """
@@ -89,3 +90,9 @@ class PharmacyRating(PharmaciesBase):
     
     # Relationships
     pharmacy = relationship("Pharmacy", back_populates="ratings")
+    
+    # Keyset pagination of a provider's reviews (newest/oldest, highest/lowest)
+    __table_args__ = (
+        Index("ix_pharmacy_ratings_pharmacy_created_id", "pharmacy_id", "created_at", "id"),
+        Index("ix_pharmacy_ratings_pharmacy_rating_id", "pharmacy_id", "rating", "id"),
+    )
@@ -3,7 +3,7 @@ Jiwar Backend - Reservations Models
 Stores reservations for Doctors and Teachers in their respective databases.
 """
 from sqlalchemy import (
-    Column, Integer, String, DateTime, Enum as SQLEnum, ForeignKey, Text, JSON
+    Column, Integer, String, DateTime, Enum as SQLEnum, ForeignKey, Text, JSON, Index, text
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -18,6 +18,23 @@ class ReservationStatus(str, enum.Enum):
     CANCELLED = "cancelled"
 
 
+# Statuses that keep a time slot occupied
+ACTIVE_RESERVATION_STATUSES = (
+    ReservationStatus.PENDING,
+    ReservationStatus.CONFIRMED,
+    ReservationStatus.COMPLETED,
+)
+
+# SQL predicate for active reservations (enum columns store member names)
+ACTIVE_RESERVATION_SQL = "status IN ({})".format(
+    ", ".join(f"'{s.name}'" for s in ACTIVE_RESERVATION_STATUSES)
+)
+
+
+# Unique partial index guarding doctor slots against double-booking
+ACTIVE_SLOT_INDEX = "uq_doctor_reservations_active_slot"
+
+
 class DoctorReservation(DoctorsBase):
     """
     Reservation for a Doctor's appointment.
@@ -45,6 +62,19 @@ class DoctorReservation(DoctorsBase):
     
     # Relationships
     doctor = relationship("Doctor", backref="reservations")
+    
+    __table_args__ = (
+        # Slot lookups: WHERE doctor_id = ? AND visit_date >= ? AND visit_date < ?
+        Index("ix_doctor_reservations_doctor_visit", "doctor_id", "visit_date"),
+        # At most one active reservation per doctor slot (double-booking guard).
+        # Cancelled / rejected rows are outside the index, so the slot can be re-booked.
+        Index(
+            ACTIVE_SLOT_INDEX, "doctor_id", "visit_date",
+            unique=True,
+            postgresql_where=text(ACTIVE_RESERVATION_SQL),
+            sqlite_where=text(ACTIVE_RESERVATION_SQL),
+        ),
+    )
 
 
 class TeacherReservation(TeachersBase):
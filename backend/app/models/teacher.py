@@ -4,12 +4,13 @@ Defines the Teacher profile with subjects and pricing
 """
 from sqlalchemy import (
     Column, Integer, String, Float, Boolean, 
-    DateTime, Text, ForeignKey, JSON
+    DateTime, Text, ForeignKey, JSON, Index
 )
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
 from app.core.database import TeachersBase
+from app.models.mixins import RatingAggregateMixin
 
 
 class Subject(TeachersBase):
@@ -32,7 +33,7 @@ class Subject(TeachersBase):
         return f"<Subject(id={self.id}, name_ar='{self.name_ar}')>"
 
 
-class Teacher(TeachersBase):
+class Teacher(RatingAggregateMixin, TeachersBase):
     """
     Teacher profile model (stored in Teachers DB)
     """
@@ -67,6 +68,11 @@ class Teacher(TeachersBase):
     pricing = relationship("TeacherPricing", back_populates="teacher", cascade="all, delete-orphan")
     ratings = relationship("TeacherRating", back_populates="teacher")
     
+    # list_teachers: WHERE city = ? ORDER BY ranking_score DESC LIMIT n
+    __table_args__ = (
+        Index("ix_teachers_city_ranking", "city", "ranking_score", "id"),
+    )
+    
     def __repr__(self):
         return f"<Teacher(id={self.id}, name='{self.name}')>"
 
@@ -85,6 +91,12 @@ class TeacherRating(TeachersBase):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     teacher = relationship("Teacher", back_populates="ratings")
+    
+    # Keyset pagination of a provider's reviews (newest/oldest, highest/lowest)
+    __table_args__ = (
+        Index("ix_teacher_ratings_teacher_created_id", "teacher_id", "created_at", "id"),
+        Index("ix_teacher_ratings_teacher_rating_id", "teacher_id", "rating", "id"),
+    )
 
 
 class TeacherPricing(TeachersBase):
@@ -39,6 +39,7 @@ class User(UsersBase):
         profile_id: ID of the profile in the respective database
         is_active: Whether the user account is active
         is_verified: Whether the user has verified their email
+        unread_notifications: Number of unread notifications (badge counter)
     """
     __tablename__ = "users"
     
@@ -62,6 +63,8 @@ class User(UsersBase):
     fcm_token = Column(String(500), nullable=True)
     # Token version for single session enforcement
     token_version = Column(Integer, default=1, nullable=False)
+    # Unread notifications counter (maintained by the notifications service)
+    unread_notifications = Column(Integer, default=0, server_default="0", nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(
         DateTime(timezone=True),
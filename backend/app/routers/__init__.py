@@ -13,6 +13,7 @@ from app.routers.addresses import router as addresses_router
 from app.routers.notifications import router as notifications_router
 from app.routers.utils import router as utils_router
 from app.routers.favorites import router as favorites_router
+from app.routers.providers import router as providers_router
 
 __all__ = [
     "auth_router",
@@ -26,5 +27,6 @@ __all__ = [
     "utils_router",
     "favorites_router",
     "addresses_router",
-    "notifications_router"
+    "notifications_router",
+    "providers_router"
 ]
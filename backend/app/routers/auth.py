@@ -581,6 +581,14 @@ def delete_account(
     from app.models.orders import OrderStatus
     
     # 1. Cancel Doctor Reservations
+    from app.models.reservations import ACTIVE_RESERVATION_STATUSES
+    from app.services.availability import availability_cache
+    affected_doctors = [
+        row.doctor_id for row in doctors_db.query(DoctorReservation.doctor_id).filter(
+            DoctorReservation.user_id == current_user.id,
+            DoctorReservation.status.in_(ACTIVE_RESERVATION_STATUSES)
+        ).distinct().all()
+    ]
     doctors_db.query(DoctorReservation).filter(
         DoctorReservation.user_id == current_user.id
     ).update({
@@ -588,6 +596,8 @@ def delete_account(
         "notes": DoctorReservation.notes + " [Account Deleted]" # Append note carefully (might need coalesce if null, let's keep it simple: just status)
     }, synchronize_session=False)
     doctors_db.commit()
+    for doctor_id in affected_doctors:
+        availability_cache.invalidate_doctor(doctor_id)
 
     # 2. Cancel Teacher Reservations
     teachers_db.query(TeacherReservation).filter(
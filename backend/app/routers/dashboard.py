@@ -1,18 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, BackgroundTasks
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from typing import List, Optional
 from datetime import datetime
 
+from app.core.config import settings
 from app.core.database import (
     get_users_db, get_doctors_db, get_pharmacies_db, 
     get_teachers_db
 )
+from app.core.responses import FastJSONResponse
 from app.core.security import get_current_user
 from app.models.user import User, UserType
 from app.models.doctor import Doctor
 from app.models.pharmacy import Pharmacy
 from app.models.teacher import Teacher, TeacherPricing
-from app.models.reservations import DoctorReservation, TeacherReservation, ReservationStatus
+from app.models.reservations import (
+    DoctorReservation, TeacherReservation, ReservationStatus, ACTIVE_RESERVATION_STATUSES,
+    ACTIVE_SLOT_INDEX
+)
 from app.models.orders import PharmacyOrder, OrderStatus
 
 from app.schemas.dashboard import (
@@ -26,6 +32,10 @@ from app.services.notifications import (
     notify_new_booking, notify_booking_confirmed, notify_booking_rejected,
     notify_new_order, notify_order_priced, send_notification, notify_new_rating
 )
+from app.services.availability import availability_cache, refresh_doctor_next_free_slot
+from app.services.slot_generator import compile_working_hours, is_slot_start
+from app.services.directory import mark_directory_changed
+from app.services.storage import sign_file_url, unsigned_file_url
 
 
 
@@ -40,6 +50,48 @@ def get_provider_profile(user: User, db_session: Session, model_class):
         return None
     return db_session.query(model_class).filter(model_class.id == user.profile_id).first()
 
+# ==========================================
+# HELPER: Keep doctor availability cache in sync
+# ==========================================
+def track_slot_change(reservation, was_active: bool, background_tasks: BackgroundTasks):
+    """
+    Update cached slot occupancy after a committed doctor reservation status
+    change, and recompute the doctor's next free slot after the response.
+    """
+    if isinstance(reservation, DoctorReservation):
+        is_active = reservation.status in ACTIVE_RESERVATION_STATUSES
+        availability_cache.reservation_changed(
+            reservation.doctor_id, reservation.id, reservation.visit_date, was_active, is_active
+        )
+        if was_active != is_active:
+            background_tasks.add_task(refresh_doctor_next_free_slot, reservation.doctor_id)
+
+def is_slot_conflict(error: IntegrityError) -> bool:
+    """Whether an integrity error is a violation of the active slot index"""
+    diag = getattr(error.orig, "diag", None)
+    if diag is not None:
+        # PostgreSQL names the violated constraint
+        return getattr(diag, "constraint_name", None) == ACTIVE_SLOT_INDEX
+    # SQLite only names the columns of the violated unique index
+    return "UNIQUE constraint failed: doctor_reservations.doctor_id, doctor_reservations.visit_date" in str(error.orig)
+
+def commit_reservation(db: Session):
+    """
+    Commit a reservation write. The unique partial index on active doctor
+    reservations rejects a second booking of the same slot atomically;
+    other integrity errors are not slot conflicts and are raised as is.
+    """
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if not is_slot_conflict(e):
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"error_code": "SLOT_ALREADY_BOOKED", "message": "This time slot is already booked"}
+        )
+
 # ==========================================
 # 1. PROFILE MANAGEMENT
 # ==========================================
@@ -65,7 +117,7 @@ def get_profile(
                 "phone": profile.phone,
                 "address": profile.address,
                 "description": profile.description,
-                "profile_image": profile.profile_image,
+                "profile_image": sign_file_url(profile.profile_image),
                 "specialty": {"id": profile.specialty.id, "name_ar": profile.specialty.name_ar} if profile.specialty else None,
                 "consultation_fee": profile.consultation_fee,
                 "examination_fee": profile.examination_fee,
@@ -82,7 +134,7 @@ def get_profile(
                 "email": current_user.email,
                 "phone": profile.phone,
                 "address": profile.address,
-                "profile_image": profile.profile_image,
+                "profile_image": sign_file_url(profile.profile_image),
                 "delivery_available": profile.delivery_available,
                 "working_hours": profile.working_hours,
                 "rating": profile.rating,
@@ -102,7 +154,7 @@ def get_profile(
                 "whatsapp": profile.whatsapp,
                 "address": profile.address,
                 "description": profile.description,
-                "profile_image": profile.profile_image,
+                "profile_image": sign_file_url(profile.profile_image),
                 "subject": subject_data,
                 "pricing": pricing_list,
                 "rating": profile.rating,
@@ -146,11 +198,13 @@ def update_doctor_profile(
     if update_data.description is not None:
         profile.description = update_data.description
     if update_data.profile_image is not None:
-        profile.profile_image = update_data.profile_image
+        profile.profile_image = unsigned_file_url(update_data.profile_image)
     if update_data.working_hours is not None:
         profile.working_hours = update_data.working_hours
         
     doctors_db.commit()
+    if update_data.working_hours is not None:
+        availability_cache.invalidate_doctor(profile.id)
     return ProfileUpdateResponse(success=True, message="Profile updated", data={"id": profile.id})
 
 @router.patch("/profile/pharmacy", response_model=ProfileUpdateResponse)
@@ -171,7 +225,7 @@ def update_pharmacy_profile(
     if update_data.working_hours is not None:
         profile.working_hours = update_data.working_hours
     if update_data.profile_image is not None:
-        profile.profile_image = update_data.profile_image
+        profile.profile_image = unsigned_file_url(update_data.profile_image)
     if update_data.phone is not None:
         profile.phone = update_data.phone
         
@@ -201,11 +255,12 @@ def update_teacher_profile(
         profile.description = update_data.description
         
     if update_data.profile_image is not None:
-        profile.profile_image = update_data.profile_image
+        profile.profile_image = unsigned_file_url(update_data.profile_image)
 
     if update_data.pricing is not None:
         # Delete existing pricing
         teachers_db.query(TeacherPricing).filter(TeacherPricing.teacher_id == profile.id).delete()
+        mark_directory_changed(teachers_db, "teacher", [profile.id])
         
         # Add new pricing
         for price_item in update_data.pricing:
@@ -264,14 +319,14 @@ def get_reservations(
                 DoctorReservation.doctor_id == profile.id
             ).order_by(DoctorReservation.visit_date.desc()).all()
             
-            # Map to response (manual or Pydantic)
-            return [
-                ReservationResponse(
-                    id=r.id, user_id=r.user_id, patient_name=r.patient_name,
-                    phone=r.patient_phone, date=r.visit_date, status=r.status.value,
-                    notes=r.notes
-                ) for r in reservations
-            ]
+            # Plain dicts with every ReservationResponse field (fast encoder path)
+            return FastJSONResponse([
+                {
+                    "id": r.id, "user_id": r.user_id, "patient_name": r.patient_name,
+                    "student_name": None, "phone": r.patient_phone, "date": r.visit_date,
+                    "status": r.status.value, "notes": r.notes
+                } for r in reservations
+            ])
 
     elif current_user.user_type == UserType.TEACHER:
         profile = get_provider_profile(current_user, teachers_db, Teacher)
@@ -280,13 +335,13 @@ def get_reservations(
                 TeacherReservation.teacher_id == profile.id
             ).order_by(TeacherReservation.requested_date.desc()).all()
             
-            return [
-                ReservationResponse(
-                    id=r.id, user_id=r.user_id, student_name=r.student_name,
-                    phone=r.student_phone, date=r.requested_date, status=r.status.value,
-                    notes=r.notes
-                ) for r in reservations
-            ]
+            return FastJSONResponse([
+                {
+                    "id": r.id, "user_id": r.user_id, "patient_name": None,
+                    "student_name": r.student_name, "phone": r.student_phone,
+                    "date": r.requested_date, "status": r.status.value, "notes": r.notes
+                } for r in reservations
+            ])
             
     return []
 
@@ -317,6 +372,8 @@ def reservation_action(
         
     if not reservation:
         raise HTTPException(status_code=404, detail="Reservation not found")
+    
+    was_active = reservation.status in ACTIVE_RESERVATION_STATUSES
         
     if action.action == "accept":
         reservation.status = ReservationStatus.CONFIRMED
@@ -325,7 +382,8 @@ def reservation_action(
         if hasattr(reservation, 'schedule') and hasattr(action, 'schedule') and action.schedule:
              reservation.schedule = action.schedule
              
-        db.commit()
+        commit_reservation(db)
+        track_slot_change(reservation, was_active, background_tasks)
         
         # Notify User
         user_to_notify = users_db.query(User).filter(User.id == reservation.user_id).first()
@@ -338,6 +396,7 @@ def reservation_action(
         reservation.status = ReservationStatus.REJECTED
         reservation.rejection_reason = action.reason
         db.commit()
+        track_slot_change(reservation, was_active, background_tasks)
         
         # Notify User
         user_to_notify = users_db.query(User).filter(User.id == reservation.user_id).first()
@@ -348,7 +407,8 @@ def reservation_action(
     elif action.action == "complete":
         reservation.status = ReservationStatus.COMPLETED
         
-    db.commit()
+    commit_reservation(db)
+    track_slot_change(reservation, was_active, background_tasks)
 
     # Notify User about status change
     user_to_notify = users_db.query(User).filter(User.id == reservation.user_id).first()
@@ -382,19 +442,20 @@ def get_orders(
         PharmacyOrder.pharmacy_id == profile.id
     ).order_by(PharmacyOrder.created_at.desc()).all()
     
-    return [
-        OrderResponse(
-            id=o.id, user_id=o.user_id, customer_name=o.customer_name,
-            customer_phone=o.customer_phone, customer_address=o.customer_address,
-            items=o.items_json, 
-            items_text=o.items_text,
-            prescription_image=o.prescription_image,
-            total_price=o.total_price, delivery_fee=o.delivery_fee,
-            estimated_time=o.estimated_delivery_time,
-            notes=o.pharmacy_notes,
-            status=o.status.value, created_at=o.created_at
-        ) for o in orders
-    ]
+    # Plain dicts with every OrderResponse field (fast encoder path)
+    return FastJSONResponse([
+        {
+            "id": o.id, "user_id": o.user_id, "customer_name": o.customer_name,
+            "customer_phone": o.customer_phone, "customer_address": o.customer_address,
+            "items": o.items_json,
+            "items_text": o.items_text,
+            "prescription_image": sign_file_url(o.prescription_image, settings.prescription_url_ttl_seconds),
+            "total_price": o.total_price, "delivery_fee": o.delivery_fee,
+            "estimated_time": o.estimated_delivery_time,
+            "notes": o.pharmacy_notes,
+            "status": o.status.value, "created_at": o.created_at
+        } for o in orders
+    ])
 
 @router.post("/orders/{id}/price")
 @router.post("/orders/{id}/price")
@@ -456,6 +517,15 @@ def create_booking(
         if not doctor:
             raise HTTPException(status_code=404, detail="Doctor not found")
         
+        # Only slot starts inside working hours can be booked: the unique index
+        # then rejects any second booking of the same slot
+        visit_date = booking.visit_date.replace(second=0, microsecond=0)
+        if not is_slot_start(compile_working_hours(doctor.working_hours), visit_date):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail={"error_code": "INVALID_SLOT", "message": "This time is not an available slot of the doctor"}
+            )
+        
         # Create reservation
         reservation = DoctorReservation(
             doctor_id=booking.provider_id,
@@ -463,13 +533,15 @@ def create_booking(
             patient_name=booking.patient_name,
             patient_phone=booking.patient_phone,
             booking_type=booking.booking_type,
-            visit_date=booking.visit_date,
+            visit_date=visit_date,
             notes=booking.notes,
             status=ReservationStatus.PENDING
         )
         doctors_db.add(reservation)
-        doctors_db.commit()
+        commit_reservation(doctors_db)
         doctors_db.refresh(reservation)
+        availability_cache.book(reservation.doctor_id, reservation.id, reservation.visit_date)
+        background_tasks.add_task(refresh_doctor_next_free_slot, reservation.doctor_id)
         
         # Notify Doctor
         doctor_user = users_db.query(User).filter(User.profile_id == doctor.id, User.user_type == UserType.DOCTOR).first()
@@ -524,18 +596,19 @@ def get_my_reservations(
     
     for r in doctor_reservations:
         doctor = doctors_db.query(Doctor).filter(Doctor.id == r.doctor_id).first()
-        results.append(UserReservationResponse(
-            id=r.id,
-            provider_id=r.doctor_id,
-            provider_type="doctor",
-            provider_name=doctor.name if doctor else "Unknown",
-            specialty=doctor.specialty.name_ar if doctor and doctor.specialty else None,
-            booking_type=r.booking_type,
-            visit_date=r.visit_date,
-            status=r.status.value,
-            notes=r.notes,
-            created_at=r.created_at
-        ))
+        results.append({
+            "id": r.id,
+            "provider_id": r.doctor_id,
+            "provider_type": "doctor",
+            "provider_name": doctor.name if doctor else "Unknown",
+            "specialty": doctor.specialty.name_ar if doctor and doctor.specialty else None,
+            "subject": None,
+            "booking_type": r.booking_type,
+            "visit_date": r.visit_date,
+            "status": r.status.value,
+            "notes": r.notes,
+            "created_at": r.created_at
+        })
     
     # Teacher Reservations
     teacher_reservations = teachers_db.query(TeacherReservation).filter(
@@ -544,27 +617,30 @@ def get_my_reservations(
     
     for r in teacher_reservations:
         teacher = teachers_db.query(Teacher).filter(Teacher.id == r.teacher_id).first()
-        results.append(UserReservationResponse(
-            id=r.id,
-            provider_id=r.teacher_id,
-            provider_type="teacher",
-            provider_name=teacher.name if teacher else "Unknown",
-            subject=teacher.subject.name_ar if teacher and teacher.subject else None,
-            visit_date=r.requested_date,
-            status=r.status.value,
-            notes=r.notes,
-            created_at=r.created_at
-        ))
+        results.append({
+            "id": r.id,
+            "provider_id": r.teacher_id,
+            "provider_type": "teacher",
+            "provider_name": teacher.name if teacher else "Unknown",
+            "specialty": None,
+            "subject": teacher.subject.name_ar if teacher and teacher.subject else None,
+            "booking_type": None,
+            "visit_date": r.requested_date,
+            "status": r.status.value,
+            "notes": r.notes,
+            "created_at": r.created_at
+        })
     
     # Sort by date descending
-    results.sort(key=lambda x: x.visit_date, reverse=True)
-    return results
+    results.sort(key=lambda x: x["visit_date"], reverse=True)
+    return FastJSONResponse(results)
 
 
 @router.delete("/reservations/{id}")
 def cancel_reservation(
     id: int,
     provider_type: str,  # Query param: "doctor" or "teacher"
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     doctors_db: Session = Depends(get_doctors_db),
     teachers_db: Session = Depends(get_teachers_db)
@@ -577,8 +653,10 @@ def cancel_reservation(
         ).first()
         if not reservation:
             raise HTTPException(status_code=404, detail="Reservation not found")
+        was_active = reservation.status in ACTIVE_RESERVATION_STATUSES
         reservation.status = ReservationStatus.CANCELLED
         doctors_db.commit()
+        track_slot_change(reservation, was_active, background_tasks)
         return {"success": True, "message": "تم إلغاء الحجز"}
     
     elif provider_type == "teacher":
@@ -604,6 +682,7 @@ def cancel_reservation(
 def delete_provider_reservation(
     id: int,
     provider_type: str, # "doctor" or "teacher"
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     doctors_db: Session = Depends(get_doctors_db),
     teachers_db: Session = Depends(get_teachers_db)
@@ -625,8 +704,13 @@ def delete_provider_reservation(
         if reservation.status not in [ReservationStatus.COMPLETED, ReservationStatus.REJECTED]:
              raise HTTPException(status_code=400, detail="Can only delete completed or rejected reservations")
              
+        was_active = reservation.status in ACTIVE_RESERVATION_STATUSES
+        doctor_id, reservation_id, visit_date = reservation.doctor_id, reservation.id, reservation.visit_date
         doctors_db.delete(reservation)
         doctors_db.commit()
+        if was_active:
+            availability_cache.release(doctor_id, reservation_id, visit_date)
+            background_tasks.add_task(refresh_doctor_next_free_slot, doctor_id)
         return {"success": True, "message": "Reservation deleted"}
         
     elif provider_type == "teacher":
@@ -713,7 +797,7 @@ def create_order(
         pharmacy_id=order.pharmacy_id,
         user_id=current_user.id,
         items_text=order.items_text,
-        prescription_image=order.prescription_image,
+        prescription_image=unsigned_file_url(order.prescription_image),
         customer_name=order.customer_name,
         customer_phone=order.customer_phone,
         customer_address=order.customer_address,
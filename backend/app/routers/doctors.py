@@ -3,26 +3,56 @@ Jiwar Backend - Doctors Router
 Using separate Doctors database
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, load_only
 from sqlalchemy import or_
 from typing import Optional, List
 
 from app.core.database import get_doctors_db, get_users_db
+from app.core.fieldsets import FIELDS_DESCRIPTION, parse_fields, entity_columns, sparse_item
+from app.core.responses import FastJSONResponse
 from app.models import Doctor, Specialty, User, UserType
-from app.models.reservations import DoctorReservation
-from app.services.slot_generator import SlotGenerator
+from app.services.slot_generator import SlotGenerator, DEFAULT_SLOT_MINUTES
+from app.services.availability import get_day_masks, find_next_free_slots, availability_cache
+from app.services.storage import sign_file_url
 from datetime import date as date_type, datetime
+import math
 from app.schemas.doctor import (
     DoctorResponse,
     DoctorListResponse,
     DoctorMapPin,
-    DoctorUpdateRequest
+    DoctorUpdateRequest,
+    DoctorAvailabilityResponse,
+    DayAvailability,
+    NearestDoctorResult,
+    NearestDoctorsResponse
 )
 from app.schemas.common import SpecialtyResponse, SpecialtyListResponse
 from app.dependencies import get_current_user, require_user_type
 
 router = APIRouter()
 
+# Longest window accepted by the availability endpoint (a calendar month view + margin)
+MAX_AVAILABILITY_DAYS = 62
+
+# Kilometres per degree of latitude
+KM_PER_DEGREE = 111.32
+
+# DoctorResponse fields that are not Doctor columns (need the specialty join)
+DOCTOR_DERIVED_FIELDS = {
+    "specialty_name_ar": lambda d: d.specialty.name_ar if d.specialty else None,
+    "specialty_name_en": lambda d: d.specialty.name_en if d.specialty else None,
+}
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points in kilometres"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
 
 def build_doctor_response(doctor: Doctor) -> DoctorResponse:
     """Helper to build doctor response with specialty info"""
@@ -54,43 +84,70 @@ async def get_doctor_slots(
     doctors_db: Session = Depends(get_doctors_db)
 ):
     """Get available time slots for a doctor on a specific date"""
-    doctor = doctors_db.query(Doctor).filter(Doctor.id == doctor_id).first()
+    doctor = doctors_db.query(Doctor.working_hours).filter(Doctor.id == doctor_id).first()
     if not doctor:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail={"error_code": "DOCTOR_NOT_FOUND", "message": "Doctor not found"}
         )
         
-    # Get existing reservations for this doctor on this day
-    # Assuming visit_date is DATETIME. We filter by the date part.
-    # Note: sqlalchemy filter on date(DateTimeColumn) depends on DB backend. 
-    # For postgres: func.date(col)
-    from sqlalchemy import func
-    
-    reservations = doctors_db.query(DoctorReservation).filter(
-        DoctorReservation.doctor_id == doctor_id,
-        func.date(DoctorReservation.visit_date) == date
-    ).all()
-    
-    # Generate slots
-    slots = SlotGenerator.generate_slots(
-        working_hours=doctor.working_hours, 
-        date=datetime.combine(date, datetime.min.time()),
-        existing_reservations=reservations
-    )
+    # Occupancy bitmap of the day (cached, loaded with a range predicate on miss)
+    masks = get_day_masks(doctors_db, doctor_id, date, date)
+    slots = SlotGenerator.generate_from_masks(doctor.working_hours, masks)[date]
     
     return slots
 
 
+@router.get("/{doctor_id}/availability", response_model=DoctorAvailabilityResponse)
+async def get_doctor_availability(
+    doctor_id: int,
+    date_from: date_type = Query(..., alias="from"),
+    date_to: date_type = Query(..., alias="to"),
+    doctors_db: Session = Depends(get_doctors_db)
+):
+    """
+    Get available time slots for every day in [from, to].
+    Days missing from the availability cache are loaded with a single query.
+    Slots are DEFAULT_SLOT_MINUTES long - the length bookings are validated
+    and occupancy is cached with.
+    """
+    if date_to < date_from or (date_to - date_from).days >= MAX_AVAILABILITY_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "error_code": "INVALID_DATE_RANGE",
+                "message": f"'to' must be after 'from' and span at most {MAX_AVAILABILITY_DAYS} days"
+            }
+        )
+    
+    doctor = doctors_db.query(Doctor.working_hours).filter(Doctor.id == doctor_id).first()
+    if not doctor:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error_code": "DOCTOR_NOT_FOUND", "message": "Doctor not found"}
+        )
+    
+    masks = get_day_masks(doctors_db, doctor_id, date_from, date_to)
+    days = SlotGenerator.generate_from_masks(doctor.working_hours, masks)
+    
+    return DoctorAvailabilityResponse(
+        doctor_id=doctor_id,
+        slot_minutes=DEFAULT_SLOT_MINUTES,
+        days=[DayAvailability(date=day, slots=slots) for day, slots in days.items()]
+    )
+
+
 @router.get("/", response_model=DoctorListResponse)
 async def list_doctors(
     city: Optional[str] = None,
     specialty_id: Optional[int] = None,
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=100, le=1000),
+    fields: Optional[str] = Query(default=None, description=FIELDS_DESCRIPTION),
     doctors_db: Session = Depends(get_doctors_db)
 ):
     """List all doctors, optionally filtered by city and specialty"""
+    selected = parse_fields(fields, DoctorResponse)
     query = doctors_db.query(Doctor)
     
     # Optional city filter
@@ -101,11 +158,23 @@ async def list_doctors(
     if specialty_id:
         query = query.filter(Doctor.specialty_id == specialty_id)
     
-    # Order by rating (best first)
-    query = query.order_by(Doctor.rating.desc())
+    # Order by Bayesian ranking score (best first) - served by ix_doctors_city_ranking
+    query = query.order_by(Doctor.ranking_score.desc(), Doctor.id.desc())
     
     # Pagination
     total = query.count()
+    
+    if selected is not None:
+        # Sparse fieldset - load only the requested columns
+        options = [load_only(*entity_columns(Doctor, selected), Doctor.specialty_id)]
+        if DOCTOR_DERIVED_FIELDS.keys() & set(selected):
+            options.append(joinedload(Doctor.specialty))
+        doctors = query.options(*options).offset(skip).limit(limit).all()
+        return FastJSONResponse({
+            "doctors": [sparse_item(d, selected, DOCTOR_DERIVED_FIELDS) for d in doctors],
+            "total": total
+        })
+    
     # Use joinedload to prevent N+1 queries for specialty
     doctors = query.options(joinedload(Doctor.specialty)).offset(skip).limit(limit).all()
     
@@ -173,6 +242,80 @@ async def get_doctors_by_specialty(
     ]
 
 
+@router.get("/nearest-available", response_model=NearestDoctorsResponse)
+async def get_nearest_available_doctors(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    specialty_id: Optional[int] = None,
+    radius_km: float = Query(default=10, gt=0, le=100),
+    sort: str = Query(default="soonest", pattern="^(soonest|nearest)$"),
+    limit: int = Query(default=20, ge=1, le=100),
+    doctors_db: Session = Depends(get_doctors_db)
+):
+    """
+    Doctors near a point ranked by earliest free slot (or by distance),
+    in one call instead of one /slots call per doctor and day.
+    """
+    # Bounding box on latitude/longitude (served by ix_doctors_specialty_lat_lng),
+    # then exact great-circle distance in Python
+    lat_delta = radius_km / KM_PER_DEGREE
+    lng_delta = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    
+    query = doctors_db.query(
+        Doctor.id, Doctor.name, Doctor.specialty_id, Doctor.address,
+        Doctor.latitude, Doctor.longitude, Doctor.rating, Doctor.examination_fee,
+        Doctor.profile_image, Doctor.working_hours, Specialty.name_ar.label("specialty_name_ar")
+    ).outerjoin(Specialty, Doctor.specialty_id == Specialty.id).filter(
+        Doctor.is_verified == True,
+        Doctor.latitude.between(lat - lat_delta, lat + lat_delta),
+        Doctor.longitude.between(lng - lng_delta, lng + lng_delta)
+    )
+    if specialty_id:
+        query = query.filter(Doctor.specialty_id == specialty_id)
+    
+    candidates = []
+    for row in query.all():
+        distance = haversine_km(lat, lng, row.latitude, row.longitude)
+        if distance <= radius_km:
+            candidates.append((row, distance))
+    
+    next_slots = find_next_free_slots(
+        doctors_db,
+        [(row.id, row.working_hours) for row, _ in candidates],
+        now=datetime.now()
+    )
+    
+    ranked = [
+        (row, distance, next_slots[row.id])
+        for row, distance in candidates
+        if next_slots.get(row.id) is not None
+    ]
+    if sort == "nearest":
+        ranked.sort(key=lambda item: (item[1], item[2]))
+    else:
+        ranked.sort(key=lambda item: (item[2], item[1]))
+    
+    results = [
+        NearestDoctorResult(
+            id=row.id,
+            name=row.name,
+            specialty_id=row.specialty_id,
+            specialty_name_ar=row.specialty_name_ar,
+            address=row.address,
+            latitude=row.latitude,
+            longitude=row.longitude,
+            distance_km=round(distance, 2),
+            rating=row.rating or 0.0,
+            examination_fee=row.examination_fee,
+            profile_image=sign_file_url(row.profile_image),
+            next_available=slot
+        )
+        for row, distance, slot in ranked[:limit]
+    ]
+    
+    return NearestDoctorsResponse(results=results, total=len(ranked))
+
+
 @router.get("/{doctor_id}", response_model=DoctorResponse)
 async def get_doctor(
     doctor_id: int,
@@ -213,6 +356,8 @@ async def update_my_doctor_profile(
     
     doctors_db.commit()
     doctors_db.refresh(doctor)
+    # Schedule may have changed - drop cached availability
+    availability_cache.invalidate_doctor(doctor.id)
     
     return build_doctor_response(doctor)
 
@@ -1,19 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import desc, tuple_
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 
-from app.core.database import get_users_db, get_doctors_db, get_pharmacies_db, get_teachers_db
+from app.core.database import get_users_db
+from app.core.fieldsets import FIELDS_DESCRIPTION, parse_fields, select_fields
+from app.core.responses import FastJSONResponse
 from app.core.security import get_current_user
 from app.models.user import User
 from app.models.favorites import Favorite
-from app.models.doctor import Doctor
-from app.models.pharmacy import Pharmacy
-from app.models.teacher import Teacher
-from app.models.doctor import Specialty
-from app.models.teacher import Subject
+from app.models.directory import ProviderDirectory
+from app.services.directory import directory_columns
+from app.services.storage import with_signed_image
 
 router = APIRouter()
 
@@ -48,6 +48,29 @@ class FavoriteResponse(BaseModel):
     class Config:
         from_attributes = True
 
+# Every FavoriteResponse field - the list is encoded from plain dicts
+EMPTY_FAVORITE = {field: None for field in FavoriteResponse.model_fields}
+
+# FavoriteResponse provider field -> MapProvider field of the directory payload
+FAVORITE_PROVIDER_FIELDS = {
+    "provider_name": "name",
+    "provider_image": "profile_image",
+    "provider_specialty": "specialty",
+    "provider_address": "address",
+    "provider_latitude": "latitude",
+    "provider_longitude": "longitude",
+    "provider_rating": "rating",
+    "provider_total_ratings": "total_ratings",
+    "provider_phone": "phone",
+    "provider_description": "description",
+    "provider_whatsapp": "whatsapp",
+    "provider_consultation_fee": "consultation_fee",
+    "provider_examination_fee": "examination_fee",
+    "provider_delivery_available": "delivery_available",
+    "provider_working_hours": "working_hours",
+    "provider_pricing": "pricing",
+}
+
 # --- Endpoints ---
 
 @router.post("/toggle")
@@ -81,105 +104,64 @@ def toggle_favorite(
 @router.get("/", response_model=List[FavoriteResponse])
 def get_my_favorites(
     type: Optional[str] = None, # optional filter
+    fields: Optional[str] = Query(default=None, description=FIELDS_DESCRIPTION),
     current_user: User = Depends(get_current_user),
-    users_db: Session = Depends(get_users_db),
-    doctors_db: Session = Depends(get_doctors_db),
-    pharmacies_db: Session = Depends(get_pharmacies_db),
-    teachers_db: Session = Depends(get_teachers_db)
+    users_db: Session = Depends(get_users_db)
 ):
-    """Get all favorites with provider details"""
+    """Get all favorites with provider details (one provider directory lookup)"""
+    selected = parse_fields(fields, FavoriteResponse)
+    
     query = users_db.query(Favorite).filter(Favorite.user_id == current_user.id)
     if type:
         query = query.filter(Favorite.provider_type == type)
     
     favorites = query.order_by(desc(Favorite.created_at)).all()
-    results = []
+    if not favorites:
+        return FastJSONResponse([])
+    
+    provider_fields = {
+        field: key for field, key in FAVORITE_PROVIDER_FIELDS.items()
+        if selected is None or field in selected
+    }
     
+    directory = {}
+    if provider_fields:
+        # Directory columns are enough unless a payload-only field was requested
+        columns = directory_columns(provider_fields.values())
+        projection = columns if columns is not None else [ProviderDirectory.payload]
+        for entry in users_db.query(
+            ProviderDirectory.provider_type.label("directory_type"),
+            ProviderDirectory.provider_id.label("directory_id"),
+            *projection
+        ).filter(
+            tuple_(ProviderDirectory.provider_type, ProviderDirectory.provider_id).in_(
+                list({(fav.provider_type, fav.provider_id) for fav in favorites})
+            ),
+            ProviderDirectory.is_deleted == False
+        ):
+            directory[(entry.directory_type, entry.directory_id)] = (
+                entry.payload if columns is None else entry._asdict()
+            )
+    
+    results = []
     for fav in favorites:
-        provider_data = {
+        provider_data = dict(EMPTY_FAVORITE)
+        provider_data.update({
             "id": fav.id,
             "provider_id": fav.provider_id,
             "provider_type": fav.provider_type,
             "provider_name": "Unknown",
-            "provider_image": None,
-            "provider_specialty": None,
-            "provider_address": None,
-            "provider_latitude": None,
-            "provider_longitude": None,
-            "provider_rating": None,
-            "provider_total_ratings": None,
-            "provider_phone": None,
-            "provider_description": None,
-            "provider_whatsapp": None,
-            "provider_consultation_fee": None,
-            "provider_examination_fee": None,
-            "provider_delivery_available": None,
-            "provider_working_hours": None,
-            "provider_pricing": None,
             "created_at": fav.created_at
-        }
+        })
         
-        # Fetch provider details from respective DB
-        if fav.provider_type == "doctor":
-            doc = doctors_db.query(Doctor).filter(Doctor.id == fav.provider_id).first()
-            if doc:
-                provider_data["provider_name"] = doc.name
-                provider_data["provider_image"] = doc.profile_image
-                provider_data["provider_address"] = doc.address
-                provider_data["provider_latitude"] = doc.latitude
-                provider_data["provider_longitude"] = doc.longitude
-                provider_data["provider_rating"] = doc.rating
-                provider_data["provider_total_ratings"] = doc.total_ratings
-                provider_data["provider_phone"] = doc.phone
-                provider_data["provider_description"] = doc.description
-                provider_data["provider_consultation_fee"] = doc.consultation_fee
-                provider_data["provider_examination_fee"] = doc.examination_fee
-                provider_data["provider_working_hours"] = doc.working_hours
-                if doc.specialty_id:
-                    spec = doctors_db.query(Specialty).filter(Specialty.id == doc.specialty_id).first()
-                    provider_data["provider_specialty"] = spec.name_ar if spec else None
-                    
-        elif fav.provider_type == "pharmacy":
-            pharma = pharmacies_db.query(Pharmacy).filter(Pharmacy.id == fav.provider_id).first()
-            if pharma:
-                provider_data["provider_name"] = pharma.name
-                provider_data["provider_image"] = pharma.profile_image
+        payload = directory.get((fav.provider_type, fav.provider_id))
+        if payload:
+            for field, key in provider_fields.items():
+                provider_data[field] = payload.get(key)
+            provider_data["provider_pricing"] = provider_data["provider_pricing"] or None
+            if fav.provider_type == "pharmacy":
                 provider_data["provider_specialty"] = "صيدلية"
-                provider_data["provider_address"] = pharma.address
-                provider_data["provider_latitude"] = pharma.latitude
-                provider_data["provider_longitude"] = pharma.longitude
-                provider_data["provider_rating"] = pharma.rating
-                provider_data["provider_total_ratings"] = pharma.total_ratings
-                provider_data["provider_phone"] = pharma.phone
-                provider_data["provider_description"] = getattr(pharma, 'description', None)
-                provider_data["provider_whatsapp"] = getattr(pharma, 'whatsapp', None)
-                provider_data["provider_delivery_available"] = getattr(pharma, 'delivery_available', None)
-                provider_data["provider_working_hours"] = getattr(pharma, 'working_hours', None)
-
-        elif fav.provider_type == "teacher":
-            teacher = teachers_db.query(Teacher).filter(Teacher.id == fav.provider_id).first()
-            if teacher:
-                provider_data["provider_name"] = teacher.name
-                provider_data["provider_image"] = teacher.profile_image
-                provider_data["provider_address"] = teacher.address
-                provider_data["provider_latitude"] = teacher.latitude
-                provider_data["provider_longitude"] = teacher.longitude
-                provider_data["provider_rating"] = teacher.rating
-                provider_data["provider_total_ratings"] = teacher.total_ratings
-                provider_data["provider_phone"] = teacher.phone
-                provider_data["provider_description"] = getattr(teacher, 'description', None)
-                provider_data["provider_whatsapp"] = getattr(teacher, 'whatsapp', None)
-                provider_data["provider_working_hours"] = getattr(teacher, 'working_hours', None)
-                # Convert pricing ORM objects to dicts
-                pricing = getattr(teacher, 'pricing', None)
-                if pricing:
-                    provider_data["provider_pricing"] = [
-                        {"grade_name": p.grade_name, "price": p.price} for p in pricing
-                    ]
-                if teacher.subject_id:
-                    subj = teachers_db.query(Subject).filter(Subject.id == teacher.subject_id).first()
-                    provider_data["provider_specialty"] = subj.name_ar if subj else None
-
-        results.append(FavoriteResponse(**provider_data))
         
-    return results
+        results.append(with_signed_image(select_fields(provider_data, selected), "provider_image"))
+        
+    return FastJSONResponse(results)
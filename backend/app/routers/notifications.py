@@ -1,28 +1,60 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import case, tuple_
+from typing import List, Optional
+from datetime import datetime
 from app.core.database import get_users_db
+from app.core.pagination import encode_cursor, decode_cursor
 from app.core.security import get_current_user
 from app.models.user import User
 from app.models.notification import Notification
-from app.schemas.notification import NotificationResponse
+from app.schemas.notification import NotificationResponse, UnreadCountResponse
 
 router = APIRouter()
 
 @router.get("/", response_model=List[NotificationResponse])
 def get_notifications(
-    skip: int = 0,
-    limit: int = 20,
+    response: Response,
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_users_db)
 ):
-    """Get current user's notifications (newest first)"""
-    notifications = db.query(Notification).filter(
+    """
+    Get current user's notifications (newest first).
+    Keyset pagination: pass the X-Next-Cursor response header back as `cursor`.
+    `skip` (offset pagination) is kept for older clients.
+    """
+    query = db.query(Notification).filter(
         Notification.user_id == current_user.id
-    ).order_by(Notification.created_at.desc()).offset(skip).limit(limit).all()
-    
+    )
+
+    if cursor:
+        created_at, last_id = decode_cursor(cursor, datetime, int)
+        query = query.filter(
+            tuple_(Notification.created_at, Notification.id) < tuple_(created_at, last_id)
+        )
+    elif skip:
+        query = query.offset(skip)
+
+    notifications = query.order_by(
+        Notification.created_at.desc(), Notification.id.desc()
+    ).limit(limit).all()
+
+    if len(notifications) == limit:
+        last = notifications[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
+
     return notifications
 
+@router.get("/unread-count", response_model=UnreadCountResponse)
+def get_unread_count(
+    current_user: User = Depends(get_current_user)
+):
+    """Get the unread notifications badge counter (no notifications scan)"""
+    return UnreadCountResponse(unread_count=max(current_user.unread_notifications or 0, 0))
+
 @router.patch("/{id}/read")
 def mark_read(
     id: int,
@@ -30,15 +62,29 @@ def mark_read(
     db: Session = Depends(get_users_db)
 ):
     """Mark a notification as read"""
-    notification = db.query(Notification).filter(
+    updated = db.query(Notification).filter(
         Notification.id == id,
-        Notification.user_id == current_user.id
-    ).first()
-    
-    if not notification:
-        raise HTTPException(status_code=404, detail="Notification not found")
-        
-    notification.is_read = True
+        Notification.user_id == current_user.id,
+        Notification.is_read == False
+    ).update({"is_read": True}, synchronize_session=False)
+
+    if not updated:
+        # Either already read or not ours / missing
+        exists = db.query(Notification.id).filter(
+            Notification.id == id,
+            Notification.user_id == current_user.id
+        ).first()
+        if not exists:
+            raise HTTPException(status_code=404, detail="Notification not found")
+        return {"success": True}
+
+    db.query(User).filter(
+        User.id == current_user.id,
+        User.unread_notifications > 0
+    ).update(
+        {User.unread_notifications: User.unread_notifications - 1},
+        synchronize_session=False
+    )
     db.commit()
     return {"success": True}
 
@@ -48,11 +94,21 @@ def mark_all_read(
     db: Session = Depends(get_users_db)
 ):
     """Mark all notifications as read"""
-    db.query(Notification).filter(
+    updated = db.query(Notification).filter(
         Notification.user_id == current_user.id,
         Notification.is_read == False
-    ).update({"is_read": True})
-    
+    ).update({"is_read": True}, synchronize_session=False)
+
+    if updated:
+        # Subtract what was marked rather than resetting: a notification
+        # created in between stays unread and keeps its count
+        db.query(User).filter(User.id == current_user.id).update(
+            {User.unread_notifications: case(
+                (User.unread_notifications > updated, User.unread_notifications - updated),
+                else_=0
+            )},
+            synchronize_session=False
+        )
+
     db.commit()
     return {"success": True}
-        
@@ -3,10 +3,12 @@ Jiwar Backend - Pharmacies Router
 Using separate Pharmacies database
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.orm import Session, load_only
+from typing import List, Optional
 
 from app.core.database import get_pharmacies_db
+from app.core.fieldsets import FIELDS_DESCRIPTION, parse_fields, entity_columns, sparse_item
+from app.core.responses import FastJSONResponse
 from app.models import Pharmacy, Medicine, User, UserType
 from app.schemas.pharmacy import (
     PharmacyResponse,
@@ -44,13 +46,25 @@ def build_pharmacy_response(pharmacy: Pharmacy) -> PharmacyResponse:
 @router.get("/", response_model=PharmacyListResponse)
 async def list_pharmacies(
     city: str = Query(default="الواسطي"),
+    fields: Optional[str] = Query(default=None, description=FIELDS_DESCRIPTION),
     pharmacies_db: Session = Depends(get_pharmacies_db)
 ):
     """List all pharmacies in a city"""
-    pharmacies = pharmacies_db.query(Pharmacy).filter(
+    selected = parse_fields(fields, PharmacyResponse)
+    query = pharmacies_db.query(Pharmacy).filter(
         Pharmacy.city == city,
         Pharmacy.is_verified == True
-    ).all()
+    )
+    
+    if selected is not None:
+        # Sparse fieldset - every PharmacyResponse field is a column
+        pharmacies = query.options(load_only(*entity_columns(Pharmacy, selected))).all()
+        return FastJSONResponse({
+            "pharmacies": [sparse_item(p, selected) for p in pharmacies],
+            "total": len(pharmacies)
+        })
+    
+    pharmacies = query.all()
     
     return PharmacyListResponse(
         pharmacies=[build_pharmacy_response(p) for p in pharmacies],
@@ -0,0 +1,57 @@
+"""
+Jiwar Backend - Providers Router
+Multi-get of doctors, pharmacies and teachers in one round-trip
+"""
+from fastapi import APIRouter, Depends
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+from app.core.database import get_users_db
+from app.models.directory import ProviderDirectory
+from app.schemas.search import MapProvider, ProviderBatchRequest, ProviderBatchItem, ProviderBatchResponse
+from app.services.providers import PROVIDER_LOADERS
+from app.services.storage import with_signed_image
+
+router = APIRouter()
+
+
+@router.post("/batch", response_model=ProviderBatchResponse)
+async def get_providers_batch(
+    request: ProviderBatchRequest,
+    users_db: Session = Depends(get_users_db)
+):
+    """
+    Resolve mixed (type, id) pairs - favorites, recents, notification deep links.
+    One provider directory query for the whole batch; results keep request
+    order and carry a per-item error instead of failing the whole batch.
+    """
+    refs = list({
+        (item.type, item.id) for item in request.items if item.type in PROVIDER_LOADERS
+    })
+    found = {}
+    if refs:
+        found = {
+            (entry.provider_type, entry.provider_id): entry.payload
+            for entry in users_db.query(
+                ProviderDirectory.provider_type, ProviderDirectory.provider_id, ProviderDirectory.payload
+            ).filter(
+                tuple_(ProviderDirectory.provider_type, ProviderDirectory.provider_id).in_(refs),
+                ProviderDirectory.is_deleted == False
+            )
+        }
+    
+    results = []
+    for item in request.items:
+        if item.type not in PROVIDER_LOADERS:
+            error = {"error_code": "INVALID_PROVIDER_TYPE", "message": f"Unknown provider type: {item.type}"}
+            results.append(ProviderBatchItem(type=item.type, id=item.id, error=error))
+            continue
+        
+        payload = found.get((item.type, item.id))
+        if payload is None:
+            error = {"error_code": f"{item.type.upper()}_NOT_FOUND", "message": f"{item.type.title()} not found"}
+            results.append(ProviderBatchItem(type=item.type, id=item.id, error=error))
+        else:
+            results.append(ProviderBatchItem(type=item.type, id=item.id, provider=MapProvider(**with_signed_image(payload))))
+    
+    return ProviderBatchResponse(results=results)
@@ -3,12 +3,14 @@ Jiwar Backend - Ratings Router
 Using separate databases for doctors and pharmacies ratings
 Refactored to use generic functions (DRY principle)
 """
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, status, BackgroundTasks
 from typing import List, Optional, Any, Type
+from datetime import datetime
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import tuple_
 
 from app.core.database import get_doctors_db, get_pharmacies_db, get_users_db, get_teachers_db
+from app.core.pagination import encode_cursor, decode_cursor
 from app.models import Doctor, Pharmacy, User, DoctorRating, PharmacyRating
 from app.models.teacher import Teacher, TeacherRating
 from app.schemas.common import (
@@ -19,6 +21,8 @@ from app.schemas.common import (
 )
 from app.dependencies import get_current_user
 from app.services.notifications import notify_new_rating
+from app.services.ratings import apply_rating
+from app.services.directory import mark_directory_changed
 
 router = APIRouter()
 
@@ -65,17 +69,9 @@ def create_entity_rating(
     rating = rating_model(**rating_data)
     db.add(rating)
     
-    # Calculate new average rating
-    id_filter = getattr(rating_model, entity_id_field) == entity_id
-    result = db.query(
-        func.avg(rating_model.rating),
-        func.count(rating_model.id)
-    ).filter(id_filter).first()
-    
-    total_ratings = (result[1] or 0) + 1
-    sum_ratings = ((result[0] or 0) * (result[1] or 0)) + rating_value
-    entity.rating = round(sum_ratings / total_ratings, 1)
-    entity.total_ratings = total_ratings
+    # Running aggregates - one atomic UPDATE in the same transaction as the insert
+    apply_rating(db, entity_model, entity_id, rating_value)
+    mark_directory_changed(db, entity_type, [entity_id])
     
     db.commit()
     db.refresh(rating)
@@ -91,6 +87,15 @@ def create_entity_rating(
     return rating, entity
 
 
+# Keyset orderings: sort -> (sort column name, descending)
+RATING_SORTS = {
+    "newest": ("created_at", True),
+    "oldest": ("created_at", False),
+    "highest": ("rating", True),
+    "lowest": ("rating", False),
+}
+
+
 def get_entity_ratings(
     db: Session,
     entity_model: Type,
@@ -99,39 +104,59 @@ def get_entity_ratings(
     entity_id_field: str,
     entity_type: str,
     sort: Optional[str] = None,
-    stars: Optional[int] = None
+    stars: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    summary: bool = False
 ) -> RatingListResponse:
     """
     Generic function to get ratings for any entity (Doctor, Pharmacy, Teacher).
+    Keyset-paginated over (created_at, id) or (rating, id); `summary` returns
+    only the precomputed average and star histogram.
     """
-    # Find entity
-    entity = db.query(entity_model).filter(entity_model.id == entity_id).first()
-    if not entity:
+    # Aggregates only - no rating rows needed for totals / average / histogram
+    aggregates = db.query(
+        entity_model.rating,
+        entity_model.total_ratings,
+        *[getattr(entity_model, f"rating_{s}_count") for s in range(1, 6)]
+    ).filter(entity_model.id == entity_id).first()
+    if not aggregates:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail={"error_code": f"{entity_type.upper()}_NOT_FOUND", "message": f"{entity_type.title()} not found"}
         )
     
-    # Build query
+    histogram = {s: aggregates[s + 1] or 0 for s in range(1, 6)}
+    total = histogram.get(stars, 0) if stars else (aggregates.total_ratings or 0)
+    average = aggregates.rating or 0.0
+    
+    if summary:
+        return RatingListResponse(ratings=[], total=total, average=average, histogram=histogram)
+    
+    # Build query - served by the (entity_id, created_at, id) / (entity_id, rating, id) indexes
     id_filter = getattr(rating_model, entity_id_field) == entity_id
     query = db.query(rating_model).filter(id_filter)
     
     if stars:
         query = query.filter(rating_model.rating == stars)
     
-    # Apply sorting
-    if sort == "newest":
-        query = query.order_by(rating_model.created_at.desc())
-    elif sort == "oldest":
-        query = query.order_by(rating_model.created_at.asc())
-    elif sort == "highest":
-        query = query.order_by(rating_model.rating.desc())
-    elif sort == "lowest":
-        query = query.order_by(rating_model.rating.asc())
+    sort_field, descending = RATING_SORTS.get(sort, RATING_SORTS["newest"])
+    sort_column = getattr(rating_model, sort_field)
+    
+    if cursor:
+        sort_type = datetime if sort_field == "created_at" else int
+        last_value, last_id = decode_cursor(cursor, sort_type, int)
+        keyset = tuple_(sort_column, rating_model.id)
+        query = query.filter(
+            keyset < tuple_(last_value, last_id) if descending else keyset > tuple_(last_value, last_id)
+        )
+    
+    if descending:
+        query = query.order_by(sort_column.desc(), rating_model.id.desc())
     else:
-        query = query.order_by(rating_model.created_at.desc())
+        query = query.order_by(sort_column.asc(), rating_model.id.asc())
     
-    ratings = query.all()
+    ratings = query.limit(limit).all()
     
     # Build response
     rating_responses = []
@@ -148,10 +173,17 @@ def get_entity_ratings(
             created_at=r.created_at
         ))
     
+    next_cursor = None
+    if len(ratings) == limit:
+        last = ratings[-1]
+        next_cursor = encode_cursor(getattr(last, sort_field), last.id)
+    
     return RatingListResponse(
         ratings=rating_responses,
-        total=len(ratings),
-        average=entity.rating or 0.0
+        total=total,
+        average=average,
+        histogram=histogram,
+        next_cursor=next_cursor
     )
 
 
@@ -254,10 +286,13 @@ async def create_rating(
 async def get_doctor_ratings(
     doctor_id: int,
     sort: Optional[str] = None,
-    stars: Optional[int] = None,
+    stars: Optional[int] = Query(default=None, ge=1, le=5),
+    cursor: Optional[str] = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    summary: bool = False,
     doctors_db: Session = Depends(get_doctors_db)
 ):
-    """Get all ratings for a doctor"""
+    """Get a page of a doctor's ratings (or only the summary)"""
     return get_entity_ratings(
         db=doctors_db,
         entity_model=Doctor,
@@ -266,7 +301,10 @@ async def get_doctor_ratings(
         entity_id_field="doctor_id",
         entity_type="doctor",
         sort=sort,
-        stars=stars
+        stars=stars,
+        cursor=cursor,
+        limit=limit,
+        summary=summary
     )
 
 
@@ -274,10 +312,13 @@ async def get_doctor_ratings(
 async def get_pharmacy_ratings(
     pharmacy_id: int,
     sort: Optional[str] = None,
-    stars: Optional[int] = None,
+    stars: Optional[int] = Query(default=None, ge=1, le=5),
+    cursor: Optional[str] = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    summary: bool = False,
     pharmacies_db: Session = Depends(get_pharmacies_db)
 ):
-    """Get all ratings for a pharmacy"""
+    """Get a page of a pharmacy's ratings (or only the summary)"""
     return get_entity_ratings(
         db=pharmacies_db,
         entity_model=Pharmacy,
@@ -286,7 +327,10 @@ async def get_pharmacy_ratings(
         entity_id_field="pharmacy_id",
         entity_type="pharmacy",
         sort=sort,
-        stars=stars
+        stars=stars,
+        cursor=cursor,
+        limit=limit,
+        summary=summary
     )
 
 
@@ -294,10 +338,13 @@ async def get_pharmacy_ratings(
 async def get_teacher_ratings(
     teacher_id: int,
     sort: Optional[str] = None,
-    stars: Optional[int] = None,
+    stars: Optional[int] = Query(default=None, ge=1, le=5),
+    cursor: Optional[str] = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    summary: bool = False,
     teachers_db: Session = Depends(get_teachers_db)
 ):
-    """Get all ratings for a teacher"""
+    """Get a page of a teacher's ratings (or only the summary)"""
     return get_entity_ratings(
         db=teachers_db,
         entity_model=Teacher,
@@ -306,5 +353,8 @@ async def get_teacher_ratings(
         entity_id_field="teacher_id",
         entity_type="teacher",
         sort=sort,
-        stars=stars
+        stars=stars,
+        cursor=cursor,
+        limit=limit,
+        summary=summary
     )
@@ -1,203 +1,107 @@
 """
 Jiwar Backend - Search Router  
-Unified search across doctors, pharmacies, and teachers databases
+Unified search across doctors, pharmacies, and teachers
+(served from the provider directory read model in the users database)
 """
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import List, Optional
-from pydantic import BaseModel
-
-from app.core.database import get_doctors_db, get_pharmacies_db, get_teachers_db
-from app.models import Doctor, Pharmacy, Specialty
-from app.models.teacher import Teacher, Subject
+from sqlalchemy import and_, case, or_, tuple_
+from typing import Optional
+
+from app.core.compression import CachedPayload, PayloadCache
+from app.core.database import get_users_db
+from app.core.fieldsets import FIELDS_DESCRIPTION, parse_fields, select_fields
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.responses import FastJSONResponse, dumps
+from app.models.directory import ProviderDirectory
+from app.schemas.search import (
+    SearchResult, SearchResponse, MapProvider, AllProvidersResponse, ProviderChangesResponse
+)
+from app.services.directory import directory_columns, directory_version
+from app.services.storage import url_expiry_bucket, with_signed_image
 
 router = APIRouter()
 
+# Listing order of provider groups
+TYPE_ORDER = case(
+    {"doctor": 0, "pharmacy": 1, "teacher": 2},
+    value=ProviderDirectory.provider_type,
+    else_=3
+)
 
-class SearchResult(BaseModel):
-    """Unified search result"""
-    id: int
-    type: str  # doctor, pharmacy, teacher (extensible for future types)
-    name: str
-    specialty: str | None = None
-    address: str
-    latitude: float
-    longitude: float
-    rating: float
-    total_ratings: int = 0
-    phone: str | None = None
-    profile_image: str | None = None
-    description: str | None = None
-
-
-class SearchResponse(BaseModel):
-    results: List[SearchResult]
-    total: int
-
-
-class MapProvider(BaseModel):
-    """Provider data for map markers"""
-    id: int
-    type: str
-    name: str
-    specialty: str | None = None
-    address: str
-    latitude: float
-    longitude: float
-    rating: float
-    total_ratings: int = 0
-    phone: str | None = None
-    profile_image: str | None = None
-    description: str | None = None
-    consultation_fee: float | None = None  # For doctors
-    examination_fee: float | None = None   # For doctors
-    delivery_available: bool | None = None  # For pharmacies
-    working_hours: dict | None = None  # For doctors and pharmacies
-    whatsapp: str | None = None  # For teachers
-    pricing: List[dict] | None = None  # For teachers [{'grade_name': '...', 'price': ...}]
-
-
-class AllProvidersResponse(BaseModel):
-    providers: List[MapProvider]
-    total: int
-    doctors_count: int
-    pharmacies_count: int
-    teachers_count: int
+# Encoded /all snapshots per filter set, valid until the directory changes
+# (or the signed image URLs they contain roll over to a new expiry)
+map_snapshots = PayloadCache(max_entries=128)
 
 
 @router.get("/all", response_model=AllProvidersResponse)
 async def get_all_providers(
+    request: Request,
     city: Optional[str] = Query(default=None),
     teacher_name: Optional[str] = Query(default=None, description="Filter teachers by name"),
     subject_id: Optional[int] = Query(default=None, description="Filter teachers by subject ID"),
-    doctors_db: Session = Depends(get_doctors_db),
-    pharmacies_db: Session = Depends(get_pharmacies_db),
-    teachers_db: Session = Depends(get_teachers_db)
+    fields: Optional[str] = Query(default=None, description=FIELDS_DESCRIPTION),
+    users_db: Session = Depends(get_users_db)
 ):
     """
     Get ALL verified providers for the map display.
-    Returns doctors, pharmacies, and teachers with their coordinates.
+    Returns doctors, pharmacies, and teachers with their coordinates,
+    each group ordered by ranking score (best first).
+    `fields` limits each provider to the given MapProvider fields.
+    Snapshots are cached (with their compressed bodies) per filter set
+    until the next directory change.
     """
-    providers = []
-    
-    # Get all verified doctors
-    doc_query = doctors_db.query(Doctor).join(Specialty, isouter=True).filter(Doctor.is_verified == True)
-    if city:
-        doc_query = doc_query.filter(Doctor.city == city)
-    doctors = doc_query.all()
-    
-    for d in doctors:
-        providers.append(MapProvider(
-            id=d.id,
-            type="doctor",
-            name=d.name,
-            specialty=d.specialty.name_ar if d.specialty else None,
-            address=d.address,
-            latitude=d.latitude,
-            longitude=d.longitude,
-            rating=d.rating or 0.0,
-            total_ratings=d.total_ratings or 0,
-            phone=d.phone,
-            profile_image=d.profile_image,
-            description=d.description,
-            consultation_fee=d.consultation_fee,
-            examination_fee=d.examination_fee,
-            working_hours=d.working_hours,
-        ))
-    
-    # Get all verified pharmacies
-    pharm_query = pharmacies_db.query(Pharmacy).filter(Pharmacy.is_verified == True)
-    if city:
-        pharm_query = pharm_query.filter(Pharmacy.city == city)
-    pharmacies = pharm_query.all()
-    
-    for p in pharmacies:
-        providers.append(MapProvider(
-            id=p.id,
-            type="pharmacy",
-            name=p.name,
-            specialty=None,
-            address=p.address,
-            latitude=p.latitude,
-            longitude=p.longitude,
-            rating=p.rating or 0.0,
-            total_ratings=p.total_ratings or 0,
-            phone=p.phone,
-            profile_image=p.profile_image,
-            description=None,
-            delivery_available=p.delivery_available,
-            working_hours=p.working_hours,
-        ))
-    
-    # Get all verified teachers
-    teachers_query = teachers_db.query(Teacher).join(Subject, isouter=True).filter(Teacher.is_verified == True)
+    selected = parse_fields(fields, MapProvider, always=("id", "type"))
+    key = (city, teacher_name, subject_id, selected)
+    version = (directory_version(users_db), url_expiry_bucket())
+    snapshot = map_snapshots.get(key, version)
+    if snapshot is not None:
+        return snapshot.response(request)
     
+    # Fieldsets covered by directory columns skip the payload JSON entirely
+    columns = directory_columns(selected)
+    projection = columns if columns is not None else [ProviderDirectory.payload]
+    query = users_db.query(*projection).filter(
+        ProviderDirectory.is_verified == True,
+        ProviderDirectory.is_deleted == False
+    )
     if city:
-        teachers_query = teachers_query.filter(Teacher.city == city)
+        query = query.filter(ProviderDirectory.city == city)
     
-    # Apply teacher name filter
+    # Teacher filters only narrow down teachers
+    teacher_filters = []
     if teacher_name:
-        teachers_query = teachers_query.filter(
-            Teacher.name.ilike(f"%{teacher_name}%")
-        )
-    
-    # Apply subject filter
+        teacher_filters.append(ProviderDirectory.name.ilike(f"%{teacher_name}%"))
     if subject_id:
-        teachers_query = teachers_query.filter(
-            Teacher.subject_id == subject_id
-        )
+        teacher_filters.append(ProviderDirectory.category_id == subject_id)
+    if teacher_filters:
+        query = query.filter(or_(
+            ProviderDirectory.provider_type != "teacher",
+            and_(*teacher_filters)
+        ))
     
-    teachers = teachers_query.all()
+    rows = query.order_by(TYPE_ORDER, ProviderDirectory.ranking_score.desc()).all()
     
-    for t in teachers:
-        providers.append(MapProvider(
-            id=t.id,
-            type="teacher",
-            name=t.name,
-            specialty=t.subject.name_ar if t.subject else None,
-            address=t.address,
-            latitude=t.latitude,
-            longitude=t.longitude,
-            rating=t.rating or 0.0,
-            total_ratings=t.total_ratings or 0,
-            phone=t.phone,
-            profile_image=t.profile_image,
-            description=t.description,
-            whatsapp=t.whatsapp,
-            pricing=[{"grade_name": p.grade_name, "price": p.price} for p in t.pricing] if t.pricing else []
-        ))
+    # Directory payloads already have the MapProvider shape - encode them as-is
+    counts = {"doctor": 0, "pharmacy": 0, "teacher": 0}
+    providers = []
+    for row in rows:
+        provider = row.payload if columns is None else row._asdict()
+        counts[provider["type"]] = counts.get(provider["type"], 0) + 1
+        providers.append(with_signed_image(select_fields(provider, selected)))
     
-    return AllProvidersResponse(
-        providers=providers,
-        total=len(providers),
-        doctors_count=len(doctors),
-        pharmacies_count=len(pharmacies),
-        teachers_count=len(teachers)
-    )
+    snapshot = CachedPayload(dumps({
+        "providers": providers,
+        "total": len(providers),
+        "doctors_count": counts["doctor"],
+        "pharmacies_count": counts["pharmacy"],
+        "teachers_count": counts["teacher"]
+    }))
+    return map_snapshots.set(key, snapshot, version).response(request)
+
+
+SEARCH_RESULT_FIELDS = tuple(SearchResult.model_fields)
 
-def to_search_result(entity, type_str: str) -> SearchResult:
-    """Helper to convert entity to SearchResult"""
-    specialty = None
-    if type_str == "doctor" and entity.specialty:
-        specialty = entity.specialty.name_ar
-    elif type_str == "teacher" and entity.subject:
-        specialty = entity.subject.name_ar
-        
-    return SearchResult(
-        id=entity.id,
-        type=type_str,
-        name=entity.name,
-        specialty=specialty,
-        address=entity.address,
-        latitude=entity.latitude,
-        longitude=entity.longitude,
-        rating=entity.rating or 0.0,
-        total_ratings=entity.total_ratings or 0,
-        phone=entity.phone,
-        profile_image=entity.profile_image,
-        description=getattr(entity, 'description', None)
-    )
 
 @router.get("/", response_model=SearchResponse)
 async def unified_search(
@@ -208,78 +112,108 @@ async def unified_search(
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
     min_rating: Optional[float] = None,
-    doctors_db: Session = Depends(get_doctors_db),
-    pharmacies_db: Session = Depends(get_pharmacies_db),
-    teachers_db: Session = Depends(get_teachers_db)
+    fields: Optional[str] = Query(default=None, description=FIELDS_DESCRIPTION),
+    users_db: Session = Depends(get_users_db)
 ):
     """
     Unified search with advanced filters
     """
-    results = []
+    selected = parse_fields(fields, SearchResult, always=("id", "type"))
+    if type not in ["all", "doctor", "pharmacy", "teacher"]:
+        return SearchResponse(results=[], total=0)
     
-    # Search doctors
-    if type in ["all", "doctor"]:
-        query = doctors_db.query(Doctor).join(Specialty, isouter=True).filter(
-            Doctor.is_verified == True,
-            or_(
-                Doctor.name.ilike(f"%{q}%"),
-                Specialty.name_ar.ilike(f"%{q}%"),
-                Specialty.name_en.ilike(f"%{q}%")
-            )
-        )
-        if city:
-             query = query.filter(Doctor.city == city)
-             
-        if min_price is not None:
-             query = query.filter(Doctor.examination_fee >= min_price)
-        if max_price is not None:
-             query = query.filter(Doctor.examination_fee <= max_price)
-        if min_rating is not None:
-             query = query.filter(Doctor.rating >= min_rating)
-
-        doctors = query.all()
-        results.extend([to_search_result(d, "doctor") for d in doctors])
+    columns = directory_columns(selected)
+    projection = columns if columns is not None else [ProviderDirectory.payload]
     
-    # Search pharmacies
-    if type in ["all", "pharmacy"]:
-        query = pharmacies_db.query(Pharmacy).filter(
-            Pharmacy.is_verified == True,
-            Pharmacy.name.ilike(f"%{q}%")
-        )
-        if city:
-             query = query.filter(Pharmacy.city == city)
-             
-        if min_rating is not None:
-             query = query.filter(Pharmacy.rating >= min_rating)
-             
-        pharmacies = query.all()
-        results.extend([to_search_result(p, "pharmacy") for p in pharmacies])
+    # search_text = lowercased name + specialty / subject names
+    query = users_db.query(*projection).filter(
+        ProviderDirectory.is_verified == True,
+        ProviderDirectory.is_deleted == False,
+        ProviderDirectory.search_text.contains(q.lower(), autoescape=True)
+    )
+    if type != "all":
+        query = query.filter(ProviderDirectory.provider_type == type)
+    if city:
+        query = query.filter(ProviderDirectory.city == city)
     
-    # Search teachers
-    if type in ["all", "teacher"]:
-        query = teachers_db.query(Teacher).join(Subject, isouter=True).filter(
-            Teacher.is_verified == True,
-            or_(
-                Teacher.name.ilike(f"%{q}%"),
-                Subject.name_ar.ilike(f"%{q}%"),
-                Subject.name_en.ilike(f"%{q}%")
-            )
-        )
-        if city:
-             query = query.filter(Teacher.city == city)
-             
-        if min_rating is not None:
-             query = query.filter(Teacher.rating >= min_rating)
-             
-        teachers = query.all()
-        results.extend([to_search_result(t, "teacher") for t in teachers])
+    # Price filters only apply to doctors (examination fee)
+    if min_price is not None:
+        query = query.filter(or_(
+            ProviderDirectory.provider_type != "doctor",
+            ProviderDirectory.examination_fee >= min_price
+        ))
+    if max_price is not None:
+        query = query.filter(or_(
+            ProviderDirectory.provider_type != "doctor",
+            ProviderDirectory.examination_fee <= max_price
+        ))
+    if min_rating is not None:
+        query = query.filter(ProviderDirectory.rating >= min_rating)
     
     # Sort
     if sort == "rating":
-        results.sort(key=lambda x: x.rating, reverse=True)
-    elif sort == "price_asc" and type == "doctor":
-         # Only doctors have base fee in this context mainly
-         pass 
-
-    return SearchResponse(results=results, total=len(results))
-
+        # Bayesian ranking score rather than the raw average
+        query = query.order_by(ProviderDirectory.ranking_score.desc(), ProviderDirectory.id)
+    else:
+        query = query.order_by(TYPE_ORDER, ProviderDirectory.provider_id)
+    
+    if columns is not None:
+        results = [with_signed_image(row._asdict()) for row in query.all()]
+    else:
+        results = [
+            with_signed_image(select_fields(row.payload, selected or SEARCH_RESULT_FIELDS))
+            for row in query.all()
+        ]
+    return FastJSONResponse({"results": results, "total": len(results)})
+
+
+@router.get("/changes", response_model=ProviderChangesResponse)
+async def get_provider_changes(
+    since: Optional[str] = Query(default=None, description="next_cursor of the previous sync"),
+    limit: int = Query(default=500, ge=1, le=2000),
+    users_db: Session = Depends(get_users_db)
+):
+    """
+    Providers inserted, updated, unverified or deleted since the cursor,
+    for client-side delta sync of the map. Without `since` the whole
+    directory is returned (first sync); page with next_cursor while has_more.
+    """
+    query = users_db.query(
+        ProviderDirectory.id, ProviderDirectory.provider_type, ProviderDirectory.provider_id,
+        ProviderDirectory.is_verified, ProviderDirectory.is_deleted,
+        ProviderDirectory.change_seq, ProviderDirectory.payload
+    )
+    last_seq, last_id = decode_cursor(since, int, int) if since else (0, 0)
+    if since:
+        query = query.filter(
+            tuple_(ProviderDirectory.change_seq, ProviderDirectory.id) > tuple_(last_seq, last_id)
+        )
+    else:
+        # First sync - tombstones are meaningless to an empty cache
+        query = query.filter(
+            ProviderDirectory.is_deleted == False,
+            ProviderDirectory.is_verified == True
+        )
+    
+    rows = query.order_by(ProviderDirectory.change_seq, ProviderDirectory.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    changes = []
+    for row in rows:
+        removed = row.is_deleted or not row.is_verified
+        changes.append({
+            "type": row.provider_type,
+            "id": row.provider_id,
+            "removed": removed,
+            "provider": None if removed else with_signed_image(row.payload)
+        })
+    
+    if rows:
+        last_seq, last_id = rows[-1].change_seq, rows[-1].id
+    
+    return FastJSONResponse({
+        "changes": changes,
+        "next_cursor": encode_cursor(last_seq, last_id),
+        "has_more": has_more
+    })
@@ -1,44 +1,25 @@
 """
 Jiwar Backend - Specialties Router
-Using Doctors database
+Served from the in-memory reference data cache (Doctors database)
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Request, status
 
-from app.core.database import get_doctors_db
-from app.models import Specialty
 from app.schemas.common import SpecialtyResponse, SpecialtyListResponse
+from app.services.reference_data import reference_data, reference_cache_control
 
 router = APIRouter()
 
 
 @router.get("/", response_model=SpecialtyListResponse)
-async def list_specialties(doctors_db: Session = Depends(get_doctors_db)):
-    """Get all medical specialties"""
-    specialties = doctors_db.query(Specialty).all()
-    
-    return SpecialtyListResponse(
-        specialties=[
-            SpecialtyResponse(
-                id=s.id,
-                name_ar=s.name_ar,
-                name_en=s.name_en,
-                icon=s.icon
-            )
-            for s in specialties
-        ]
-    )
+async def list_specialties(request: Request):
+    """Get all medical specialties (ETag / 304 aware)"""
+    return (await reference_data.specialties()).response(request, cache_control=reference_cache_control())
 
 
 @router.get("/{specialty_id}", response_model=SpecialtyResponse)
-async def get_specialty(
-    specialty_id: int,
-    doctors_db: Session = Depends(get_doctors_db)
-):
-    """Get a specific specialty by ID"""
-    specialty = doctors_db.query(Specialty).filter(
-        Specialty.id == specialty_id
-    ).first()
+async def get_specialty(specialty_id: int, request: Request):
+    """Get a specific specialty by ID (ETag / 304 aware)"""
+    specialty = await reference_data.specialty(specialty_id)
     
     if not specialty:
         raise HTTPException(
@@ -46,9 +27,4 @@ async def get_specialty(
             detail={"error_code": "SPECIALTY_NOT_FOUND", "message": "Specialty not found"}
         )
     
-    return SpecialtyResponse(
-        id=specialty.id,
-        name_ar=specialty.name_ar,
-        name_en=specialty.name_en,
-        icon=specialty.icon
-    )
+    return specialty.response(request, cache_control=reference_cache_control())
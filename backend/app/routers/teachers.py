@@ -2,23 +2,26 @@
 Jiwar Backend - Teachers Router
 Handles teacher search and retrieval operations
 """
-from fastapi import APIRouter, Depends, HTTPException, Query, status, BackgroundTasks
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status, BackgroundTasks
+from sqlalchemy.orm import Session, load_only, selectinload
 from typing import List, Optional
 
 from app.models.reservations import TeacherReservation, ReservationStatus
 from app.core.database import get_teachers_db, get_users_db
+from app.core.fieldsets import FIELDS_DESCRIPTION, parse_fields, entity_columns, sparse_item
+from app.core.responses import FastJSONResponse
 from app.core.security import get_current_user
 from app.models.user import User
-from app.models.teacher import Teacher, Subject, SUBJECTS_DATA
+from app.models.teacher import Teacher
 from datetime import datetime
 from app.models.reservations import TeacherReservation, ReservationStatus
 from app.schemas.reservation import TeacherReservationRequest, ReservationResponse
 from app.schemas.teacher import (
     TeacherResponse, TeacherListResponse, 
-    SubjectResponse
+    SubjectResponse, TeacherPricingResponse
 )
 from app.services.notifications import notify_new_booking
+from app.services.reference_data import reference_data, reference_cache_control
 
 router = APIRouter()
 
@@ -28,20 +31,9 @@ router = APIRouter()
 # ============================================
 
 @router.get("/subjects", response_model=List[SubjectResponse])
-async def list_subjects(
-    teachers_db: Session = Depends(get_teachers_db)
-):
-    """List all teaching subjects"""
-    subjects = teachers_db.query(Subject).all()
-    
-    if not subjects:
-        for subject_data in SUBJECTS_DATA:
-            subject = Subject(**subject_data)
-            teachers_db.add(subject)
-        teachers_db.commit()
-        subjects = teachers_db.query(Subject).all()
-        
-    return subjects
+async def list_subjects(request: Request):
+    """List all teaching subjects (ETag / 304 aware)"""
+    return (await reference_data.subjects()).response(request, cache_control=reference_cache_control())
 
 
 # ============================================
@@ -53,6 +45,19 @@ def build_teacher_response(teacher: Teacher) -> TeacherResponse:
     return teacher
 
 
+# TeacherResponse fields that are relationships: (eager load option, getter)
+TEACHER_DERIVED_FIELDS = {
+    "subject": (
+        selectinload(Teacher.subject),
+        lambda t: SubjectResponse.model_validate(t.subject).model_dump() if t.subject else None
+    ),
+    "pricing": (
+        selectinload(Teacher.pricing),
+        lambda t: [TeacherPricingResponse.model_validate(p).model_dump() for p in t.pricing]
+    ),
+}
+
+
 @router.get("/", response_model=TeacherListResponse)
 async def list_teachers(
     city: Optional[str] = None,
@@ -60,11 +65,13 @@ async def list_teachers(
     name: Optional[str] = None,
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=100, le=1000),
+    fields: Optional[str] = Query(default=None, description=FIELDS_DESCRIPTION),
     teachers_db: Session = Depends(get_teachers_db)
 ):
     """
     List all teachers, optionally filtered by city, subject, or name
     """
+    selected = parse_fields(fields, TeacherResponse)
     query = teachers_db.query(Teacher)
     
     if city:
@@ -76,9 +83,23 @@ async def list_teachers(
     if name:
         query = query.filter(Teacher.name.ilike(f"%{name}%"))
     
-    query = query.order_by(Teacher.rating.desc())
+    # Bayesian ranking score (best first) - served by ix_teachers_city_ranking
+    query = query.order_by(Teacher.ranking_score.desc(), Teacher.id.desc())
     
     total = query.count()
+    
+    if selected is not None:
+        # Sparse fieldset - load only the requested columns and relationships
+        derived = {name: TEACHER_DERIVED_FIELDS[name] for name in selected if name in TEACHER_DERIVED_FIELDS}
+        options = [load_only(*entity_columns(Teacher, selected), Teacher.subject_id)]
+        options += [load for load, _ in derived.values()]
+        teachers = query.options(*options).offset(skip).limit(limit).all()
+        getters = {name: getter for name, (_, getter) in derived.items()}
+        return FastJSONResponse({
+            "teachers": [sparse_item(t, selected, getters) for t in teachers],
+            "total": total
+        })
+    
     teachers = query.offset(skip).limit(limit).all()
     
     return TeacherListResponse(
@@ -1,18 +1,30 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends
-from fastapi.responses import FileResponse
-from app.core.security import get_current_user
-from app.models import User
-import shutil
+from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Query, Request
+from fastapi.responses import FileResponse, Response
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.database import UsersSessionLocal
+from app.core.security import get_current_user, optional_oauth2_scheme
+from app.core.upload_limit import upload_too_large_detail
+from app.services.images import derivative_path, resolve_image, schedule_derivatives
+from app.services.storage import (
+    UPLOAD_DIR, TEMP_PREFIX, blob_name, blob_path, commit_blob, file_url,
+    file_etag, last_modified, is_not_modified, verify_file_signature
+)
+import hashlib
+import mimetypes
 import os
-import uuid
-from typing import Dict
+import tempfile
+import threading
+from typing import Dict, Optional
 import magic
 
 router = APIRouter()
 
-UPLOAD_DIR = "static/uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Uploads are read and written in chunks of this size
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
 # Allowed MIME types for images
 ALLOWED_MIME_TYPES = {
     "image/jpeg": "jpg",
@@ -21,13 +33,29 @@ ALLOWED_MIME_TYPES = {
     "image/webp": "webp"
 }
 
+_magic_local = threading.local()
+
+
+def get_mime_detector() -> magic.Magic:
+    """
+    libmagic detector of the current thread.
+    Creating one loads the magic database, and a handle must not be
+    shared between threads - so each worker thread keeps its own.
+    """
+    detector = getattr(_magic_local, "detector", None)
+    if detector is None:
+        detector = magic.Magic(mime=True)
+        _magic_local.detector = detector
+    return detector
+
+
 def validate_file_content(file_content: bytes) -> str:
     """
     Validate file content using magic bytes (file signature).
     Returns the correct extension if valid, raises HTTPException if invalid.
+    Blocking - call it from the threadpool.
     """
-    mime = magic.Magic(mime=True)
-    detected_mime = mime.from_buffer(file_content[:2048])  # Check first 2KB
+    detected_mime = get_mime_detector().from_buffer(file_content[:2048])  # Check first 2KB
     
     if detected_mime not in ALLOWED_MIME_TYPES:
         raise HTTPException(
@@ -37,67 +65,164 @@ def validate_file_content(file_content: bytes) -> str:
     
     return ALLOWED_MIME_TYPES[detected_mime]
 
-def save_upload_file(file: UploadFile) -> str:
-    """Helper to save uploaded file and return URL path with magic bytes validation"""
+def _write_chunk(buffer, digest, chunk: bytes):
+    buffer.write(chunk)
+    digest.update(chunk)
+
+
+def _discard(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def save_upload_file(file: UploadFile) -> str:
+    """
+    Helper to save uploaded file and return URL path with magic bytes validation.
+    Oversized request bodies are rejected before parsing by UploadLimitMiddleware;
+    the exact file size is checked again here. The spooled upload is copied in
+    chunks: the first chunk is sniffed for its type, and disk writes run in the
+    threadpool into a temp file that is renamed into place when complete.
+    Files are stored under their SHA-256, so identical uploads share one blob.
+    """
     # First check the declared content type
     if not file.content_type or not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
     
-    # Read file content for validation
-    file_content = file.file.read()
-    file.file.seek(0)  # Reset file pointer
+    max_bytes = settings.max_upload_bytes
+    too_large = HTTPException(status_code=413, detail=upload_too_large_detail())
+    if file.size is not None and file.size > max_bytes:
+        raise too_large
     
-    # Validate using magic bytes (actual file content)
-    extension = validate_file_content(file_content)
+    # Validate using magic bytes of the first chunk (actual file content)
+    chunk = await file.read(UPLOAD_CHUNK_SIZE)
+    extension = await run_in_threadpool(validate_file_content, chunk)
     
-    filename = f"{uuid.uuid4()}.{extension}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
+    try:
+        fd, temp_path = await run_in_threadpool(
+            tempfile.mkstemp, dir=UPLOAD_DIR, prefix=TEMP_PREFIX, suffix=".part"
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not save file: {str(e)}")
     
     try:
-        with open(file_path, "wb") as buffer:
-            buffer.write(file_content)
+        written = 0
+        digest = hashlib.sha256()
+        with os.fdopen(fd, "wb") as buffer:
+            while chunk:
+                written += len(chunk)
+                if written > max_bytes:
+                    raise too_large
+                await run_in_threadpool(_write_chunk, buffer, digest, chunk)
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        
+        filename = blob_name(digest.hexdigest(), extension)
+        # Atomic: readers never see a partially written file
+        if await run_in_threadpool(commit_blob, temp_path, filename):
+            # Thumbnail / medium variants are generated in the background
+            schedule_derivatives(blob_path(filename))
         # Return secure API path instead of static path
-        return f"/api/utils/files/{filename}"
+        return file_url(filename)
+    except HTTPException:
+        await run_in_threadpool(_discard, temp_path)
+        raise
     except Exception as e:
+        await run_in_threadpool(_discard, temp_path)
         raise HTTPException(status_code=500, detail=f"Could not save file: {str(e)}")
 
-@router.get("/files/{filename}")
+def authorize_file_access(
+    filename: str,
+    expires: Optional[int] = Query(default=None, description="Signed URL expiry (unix time)"),
+    sig: Optional[str] = Query(default=None, description="Signed URL signature"),
+    token: Optional[str] = Depends(optional_oauth2_scheme)
+):
+    """
+    Signed URLs (minted into provider / order payloads) are checked
+    statelessly; anything else needs a regular access token.
+    """
+    if verify_file_signature(filename, expires, sig):
+        return
+    if not token:
+        raise HTTPException(
+            status_code=401,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    users_db = UsersSessionLocal()
+    try:
+        get_current_user(token, users_db)
+    finally:
+        users_db.close()
+
+
+@router.get("/files/{filename}", dependencies=[Depends(authorize_file_access)])
 async def get_secure_file(
     filename: str,
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    size: Optional[str] = Query(default=None, pattern="^(thumb|medium)$", description="Resized WebP variant")
 ):
     """
-    Securely serve files (images/docs) to authenticated users only.
-    Prevents IDOR and public access.
+    Securely serve files (images/docs) to authenticated users only
+    (access token or signed URL). Prevents IDOR and public access.
+    With `size` the thumb / medium variant is served (the original until it is generated).
+    Stored files never change, so they are sent with long-lived private
+    caching headers; conditional requests get 304 and Range is supported.
     """
     # Prevent directory traversal
     if ".." in filename or "/" in filename:
         raise HTTPException(status_code=400, detail="Invalid filename")
         
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    if not os.path.exists(file_path):
+    file_path = blob_path(filename)
+    if not await run_in_threadpool(os.path.exists, file_path):
         raise HTTPException(status_code=404, detail="File not found")
     
-    return FileResponse(file_path)
+    serve_path = resolve_image(file_path, size)
+    try:
+        stat_result = await run_in_threadpool(os.stat, serve_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    if size and serve_path != derivative_path(file_path, size):
+        # Original standing in for a derivative that is still being generated
+        variant, cache_control = None, "private, no-cache"
+    else:
+        variant = size
+        cache_control = f"private, max-age={settings.upload_cache_max_age_seconds}, immutable"
+    
+    headers = {
+        "ETag": file_etag(filename, variant, stat_result),
+        "Last-Modified": last_modified(stat_result),
+        "Cache-Control": cache_control,
+    }
+    if is_not_modified(request.headers, headers["ETag"], stat_result):
+        return Response(status_code=304, headers=headers)
+    
+    if settings.upload_accel_redirect_prefix:
+        # Authorization passed - let the front proxy (nginx internal location) send the bytes
+        relative_path = os.path.relpath(serve_path, UPLOAD_DIR).replace(os.sep, "/")
+        headers["X-Accel-Redirect"] = settings.upload_accel_redirect_prefix.rstrip("/") + "/" + relative_path
+        media_type = mimetypes.guess_type(serve_path)[0] or "application/octet-stream"
+        return Response(headers=headers, media_type=media_type)
+    
+    return FileResponse(serve_path, stat_result=stat_result, headers=headers)
 
 @router.post("/upload", response_model=Dict[str, str])
 async def upload_file(file: UploadFile = File(...)):
     """
     Upload a file (image) and return the URL.
     """
-    url = save_upload_file(file)
+    url = await save_upload_file(file)
     return {"url": url}
 
 # ============================================
 # CONTACT SUPPORT
 # ============================================
 from pydantic import BaseModel, EmailStr
-from fastapi import BackgroundTasks
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import logging
-from app.core.config import settings
+from app.services.mailer import mailer, mail_configured
 
 logger = logging.getLogger(__name__)
 
@@ -106,64 +231,60 @@ class ContactMessage(BaseModel):
     email: EmailStr
     message: str
 
-def send_support_email(contact: ContactMessage):
+def send_support_email(contact: ContactMessage) -> bool:
     """
-    Sends a professionally formatted email to the support team.
-    Uses settings from config.py
+    Queues a professionally formatted email to the support team.
+    Uses settings from config.py; delivery happens on the mailer worker.
+    Returns False if the mail queue is full.
     """
-    sender_email = settings.mail_username
-    sender_password = settings.mail_password
+    sender_email = settings.mail_username or settings.support_email
     recipient_email = settings.support_email
     
-    if not sender_email or not sender_password:
-        logger.warning(f"⚠️ Email credentials missing (User: {sender_email}). Skipping email send.")
+    if not mail_configured():
+        logger.warning(f"⚠️ Email credentials missing (User: {settings.mail_username}). Skipping email send.")
         logger.info(f"📩 [MOCK EMAIL] To: {recipient_email} | Subject: {contact.subject} | From: {contact.email} | Body: {contact.message}")
-        return
+        return True
 
-    try:
-        # Create professional HTML template
-        html_content = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; border: 1px solid #e0e0e0; border-radius: 8px; overflow: hidden;">
-                <div style="background-color: #4CAF50; padding: 20px; text-align: center; color: white;">
-                    <h2 style="margin: 0;">New Support Request</h2>
-                </div>
-                <div style="padding: 20px; background-color: #f9f9f9;">
-                    <p><strong>From:</strong> {contact.email}</p>
-                    <p><strong>Subject:</strong> {contact.subject}</p>
-                    <hr style="border: 0; border-top: 1px solid #e0e0e0; margin: 20px 0;">
-                    <div style="background-color: white; padding: 15px; border-radius: 4px; border-left: 4px solid #4CAF50;">
-                        <p style="margin-top: 0;">{contact.message}</p>
-                    </div>
-                    <hr style="border: 0; border-top: 1px solid #e0e0e0; margin: 20px 0;">
-                    <p style="font-size: 12px; color: #888; text-align: center;">Sent from Jiwar App Support System</p>
+    # Create professional HTML template
+    html_content = f"""
+    <html>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <div style="max-width: 600px; margin: 0 auto; border: 1px solid #e0e0e0; border-radius: 8px; overflow: hidden;">
+            <div style="background-color: #4CAF50; padding: 20px; text-align: center; color: white;">
+                <h2 style="margin: 0;">New Support Request</h2>
+            </div>
+            <div style="padding: 20px; background-color: #f9f9f9;">
+                <p><strong>From:</strong> {contact.email}</p>
+                <p><strong>Subject:</strong> {contact.subject}</p>
+                <hr style="border: 0; border-top: 1px solid #e0e0e0; margin: 20px 0;">
+                <div style="background-color: white; padding: 15px; border-radius: 4px; border-left: 4px solid #4CAF50;">
+                    <p style="margin-top: 0;">{contact.message}</p>
                 </div>
+                <hr style="border: 0; border-top: 1px solid #e0e0e0; margin: 20px 0;">
+                <p style="font-size: 12px; color: #888; text-align: center;">Sent from Jiwar App Support System</p>
             </div>
-        </body>
-        </html>
-        """
-
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = recipient_email
-        msg['Subject'] = f"Support: {contact.subject}"
-        msg.attach(MIMEText(html_content, 'html'))
-
-        # Connect to Gmail SMTP (or configured server)
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(sender_email, sender_password)
-        server.send_message(msg)
-        server.quit()
-        logger.info("✅ Support email sent successfully")
-    except Exception as e:
-        logger.error(f"❌ Failed to send email: {e}")
+        </div>
+    </body>
+    </html>
+    """
+
+    msg = MIMEMultipart()
+    msg['From'] = sender_email
+    msg['To'] = recipient_email
+    msg['Subject'] = f"Support: {contact.subject}"
+    msg.attach(MIMEText(html_content, 'html'))
+
+    # Sent over the mailer's pooled SMTP connection
+    return mailer.send(msg)
 
 @router.post("/contact-support")
-async def contact_support(contact: ContactMessage, background_tasks: BackgroundTasks):
+async def contact_support(contact: ContactMessage):
     """
-    Receive support message and send email in background.
+    Receive support message and queue the email for delivery.
     """
-    background_tasks.add_task(send_support_email, contact)
+    if not send_support_email(contact):
+        raise HTTPException(
+            status_code=503,
+            detail="Support is receiving too many messages right now. Please try again later."
+        )
     return {"status": "success", "message": "Message received"}
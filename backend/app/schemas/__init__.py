@@ -39,6 +39,18 @@ from app.schemas.common import (
     ErrorResponse,
     PaginatedResponse
 )
+from app.schemas.search import (
+    SearchResult,
+    SearchResponse,
+    MapProvider,
+    AllProvidersResponse,
+    ProviderRef,
+    ProviderBatchRequest,
+    ProviderBatchItem,
+    ProviderBatchResponse,
+    ProviderChange,
+    ProviderChangesResponse
+)
 
 __all__ = [
     # Auth
@@ -74,5 +86,16 @@ __all__ = [
     "SpecialtyListResponse",
     "MessageResponse",
     "ErrorResponse",
-    "PaginatedResponse"
+    "PaginatedResponse",
+    # Search / Providers
+    "SearchResult",
+    "SearchResponse",
+    "MapProvider",
+    "AllProvidersResponse",
+    "ProviderRef",
+    "ProviderBatchRequest",
+    "ProviderBatchItem",
+    "ProviderBatchResponse",
+    "ProviderChange",
+    "ProviderChangesResponse"
 ]
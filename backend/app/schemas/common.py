@@ -3,7 +3,7 @@ Jiwar Backend - Common Schemas
 Shared schemas for ratings and general responses
 """
 from pydantic import BaseModel, Field
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Dict
 from datetime import datetime
 
 
@@ -39,10 +39,12 @@ class RatingResponse(BaseModel):
 
 
 class RatingListResponse(BaseModel):
-    """List of ratings"""
+    """Page of ratings with the precomputed star histogram"""
     ratings: List[RatingResponse]
     total: int
     average: float
+    histogram: Dict[int, int] = {}
+    next_cursor: Optional[str] = None
 
 
 # ============================================
@@ -4,7 +4,7 @@ Pydantic models for doctor-related operations
 """
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict
-from datetime import datetime
+from datetime import datetime, date
 
 
 class AvailabilitySlot(BaseModel):
@@ -68,6 +68,41 @@ class DoctorMapPin(BaseModel):
         from_attributes = True
 
 
+class DayAvailability(BaseModel):
+    """Free slots of a single day"""
+    date: date
+    slots: List[str]
+
+
+class DoctorAvailabilityResponse(BaseModel):
+    """Free slots for a range of days"""
+    doctor_id: int
+    slot_minutes: int
+    days: List[DayAvailability]
+
+
+class NearestDoctorResult(BaseModel):
+    """Doctor with distance and earliest free slot"""
+    id: int
+    name: str
+    specialty_id: int
+    specialty_name_ar: Optional[str] = None
+    address: str
+    latitude: float
+    longitude: float
+    distance_km: float
+    rating: float
+    examination_fee: Optional[float] = None
+    profile_image: Optional[str] = None
+    next_available: datetime
+
+
+class NearestDoctorsResponse(BaseModel):
+    """Ranked nearest available doctors"""
+    results: List[NearestDoctorResult]
+    total: int
+
+
 class DoctorUpdateRequest(BaseModel):
     """Update doctor profile"""
     name: Optional[str] = Field(None, min_length=2, max_length=100)
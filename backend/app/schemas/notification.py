@@ -14,3 +14,6 @@ class NotificationResponse(NotificationBase):
     
     class Config:
         from_attributes = True
+
+class UnreadCountResponse(BaseModel):
+    unread_count: int
@@ -0,0 +1,107 @@
+"""
+Jiwar Backend - Search / Provider Schemas
+Provider shapes shared by search, map and batch endpoints
+"""
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+
+class SearchResult(BaseModel):
+    """Unified search result"""
+    id: int
+    type: str  # doctor, pharmacy, teacher (extensible for future types)
+    name: str
+    specialty: str | None = None
+    address: str
+    latitude: float
+    longitude: float
+    rating: float
+    total_ratings: int = 0
+    phone: str | None = None
+    profile_image: str | None = None
+    description: str | None = None
+
+
+class SearchResponse(BaseModel):
+    results: List[SearchResult]
+    total: int
+
+
+class MapProvider(BaseModel):
+    """Provider data for map markers"""
+    id: int
+    type: str
+    name: str
+    specialty: str | None = None
+    address: str
+    latitude: float
+    longitude: float
+    rating: float
+    total_ratings: int = 0
+    phone: str | None = None
+    profile_image: str | None = None
+    description: str | None = None
+    consultation_fee: float | None = None  # For doctors
+    examination_fee: float | None = None   # For doctors
+    delivery_available: bool | None = None  # For pharmacies
+    working_hours: dict | None = None  # For doctors and pharmacies
+    whatsapp: str | None = None  # For teachers
+    pricing: List[dict] | None = None  # For teachers [{'grade_name': '...', 'price': ...}]
+
+
+class AllProvidersResponse(BaseModel):
+    providers: List[MapProvider]
+    total: int
+    doctors_count: int
+    pharmacies_count: int
+    teachers_count: int
+
+
+# ============================================
+# BATCH PROVIDER SCHEMAS
+# ============================================
+
+class ProviderRef(BaseModel):
+    """(type, id) reference to a provider"""
+    type: str  # doctor, pharmacy, teacher
+    id: int
+
+
+class ProviderBatchRequest(BaseModel):
+    """Providers to resolve in one call"""
+    items: List[ProviderRef] = Field(..., min_length=1, max_length=100)
+
+
+class ProviderBatchItem(BaseModel):
+    """One resolved provider, or the reason it could not be resolved"""
+    type: str
+    id: int
+    provider: Optional[MapProvider] = None
+    error: Optional[dict] = None  # {"error_code": ..., "message": ...}
+
+
+class ProviderBatchResponse(BaseModel):
+    """Results in request order"""
+    results: List[ProviderBatchItem]
+
+
+# ============================================
+# CHANGE FEED SCHEMAS
+# ============================================
+
+class ProviderChange(BaseModel):
+    """
+    A provider inserted / updated since the cursor.
+    `removed` is a tombstone (deleted or no longer verified): drop it from the local cache.
+    """
+    type: str
+    id: int
+    removed: bool = False
+    provider: Optional[MapProvider] = None
+
+
+class ProviderChangesResponse(BaseModel):
+    """Delta since the cursor; pass next_cursor back as `since`"""
+    changes: List[ProviderChange]
+    next_cursor: str
+    has_more: bool
@@ -0,0 +1,336 @@
+"""
+Jiwar Backend - Doctor Availability Cache
+Per-(doctor, day) occupancy bitmaps kept in memory and updated by booking writes
+"""
+import threading
+import time
+from datetime import date, datetime, time as dtime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import DoctorsSessionLocal
+from app.models.reservations import DoctorReservation, ACTIVE_RESERVATION_STATUSES
+from app.services.slot_generator import (
+    DEFAULT_SLOT_MINUTES, compile_working_hours, occupancy_mask, free_slots
+)
+
+
+class AvailabilityCache:
+    """
+    Occupancy bitmaps keyed by (doctor_id, day).
+
+    Booking writes made by this process update entries in place
+    (book / release). Entries hold the ids of the reservations occupying
+    each slot, so applying a write the entry already reflects (a read that
+    saw the committed row) is a no-op rather than a double count.
+    Entries expire after `ttl` seconds so writes made by other workers
+    are picked up as well. Every write bumps a per-doctor generation so
+    a read that raced with a write never stores a stale bitmap.
+
+    The public methods (get / store / book / release / invalidate_doctor)
+    are the whole contract - a shared backend only has to implement them.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 50000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # (doctor_id, day) -> [minute offset -> reservation ids, bitmap, expires_at]
+        self._entries: Dict[Tuple[int, date], list] = {}
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _mask(offsets: Dict[int, Set[int]]) -> int:
+        block = (1 << DEFAULT_SLOT_MINUTES) - 1
+        mask = 0
+        for offset in offsets:
+            mask |= block << offset
+        return mask
+
+    def generation(self, doctor_id: int) -> int:
+        """Current write generation of a doctor (pass it back to store())"""
+        with self._lock:
+            return self._generations.get(doctor_id, 0)
+
+    def get(self, doctor_id: int, day: date) -> Optional[int]:
+        """Cached occupancy bitmap, or None on miss / expiry"""
+        with self._lock:
+            entry = self._entries.get((doctor_id, day))
+            if entry is None:
+                return None
+            if entry[2] < time.monotonic():
+                del self._entries[(doctor_id, day)]
+                return None
+            return entry[1]
+
+    def store(
+        self, doctor_id: int, day: date, visits: Iterable[Tuple[int, datetime]], generation: int
+    ) -> int:
+        """
+        Cache the bitmap of a day loaded from the database
+        (`visits` are the (reservation id, visit_date) pairs of active reservations).
+        Skipped if a booking write happened since `generation` was read.
+        """
+        offsets: Dict[int, Set[int]] = {}
+        for reservation_id, visit in visits:
+            offsets.setdefault(visit.hour * 60 + visit.minute, set()).add(reservation_id)
+        mask = self._mask(offsets)
+        with self._lock:
+            if self._generations.get(doctor_id, 0) != generation:
+                return mask
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[(doctor_id, day)] = [offsets, mask, time.monotonic() + self.ttl]
+        return mask
+
+    def _apply(self, doctor_id: int, reservation_id: int, visit: datetime, active: bool):
+        with self._lock:
+            self._generations[doctor_id] = self._generations.get(doctor_id, 0) + 1
+            entry = self._entries.get((doctor_id, visit.date()))
+            if entry is None:
+                return
+            offsets, offset = entry[0], visit.hour * 60 + visit.minute
+            if active:
+                offsets.setdefault(offset, set()).add(reservation_id)
+            elif offset in offsets:
+                offsets[offset].discard(reservation_id)
+                if not offsets[offset]:
+                    del offsets[offset]
+            entry[1] = self._mask(offsets)
+
+    def book(self, doctor_id: int, reservation_id: int, visit: datetime):
+        """A reservation became active (created / re-accepted)"""
+        self._apply(doctor_id, reservation_id, visit, True)
+
+    def release(self, doctor_id: int, reservation_id: int, visit: datetime):
+        """A reservation stopped being active (cancelled / rejected / deleted)"""
+        self._apply(doctor_id, reservation_id, visit, False)
+
+    def reservation_changed(
+        self, doctor_id: int, reservation_id: int, visit: datetime, was_active: bool, is_active: bool
+    ):
+        """Apply a status transition of a reservation"""
+        if was_active and not is_active:
+            self.release(doctor_id, reservation_id, visit)
+        elif is_active and not was_active:
+            self.book(doctor_id, reservation_id, visit)
+
+    def invalidate_doctor(self, doctor_id: int):
+        """Drop every cached day of a doctor (bulk writes)"""
+        with self._lock:
+            self._generations[doctor_id] = self._generations.get(doctor_id, 0) + 1
+            for key in [k for k in self._entries if k[0] == doctor_id]:
+                del self._entries[key]
+
+
+availability_cache = AvailabilityCache(ttl=settings.availability_cache_ttl_seconds)
+
+
+def get_day_masks(db: Session, doctor_id: int, start: date, end: date) -> Dict[date, int]:
+    """
+    Occupancy bitmaps for every day in [start, end].
+    Days missing from the cache are loaded with a single range query
+    on (doctor_id, visit_date).
+    """
+    masks: Dict[date, int] = {}
+    missing: List[date] = []
+
+    day = start
+    while day <= end:
+        mask = availability_cache.get(doctor_id, day)
+        if mask is None:
+            missing.append(day)
+        else:
+            masks[day] = mask
+        day += timedelta(days=1)
+
+    if missing:
+        generation = availability_cache.generation(doctor_id)
+        # Sargable range predicate - served by ix_doctor_reservations_doctor_visit
+        rows = db.query(DoctorReservation.id, DoctorReservation.visit_date).filter(
+            DoctorReservation.doctor_id == doctor_id,
+            DoctorReservation.visit_date >= datetime.combine(missing[0], dtime.min),
+            DoctorReservation.visit_date < datetime.combine(missing[-1] + timedelta(days=1), dtime.min),
+            DoctorReservation.status.in_(ACTIVE_RESERVATION_STATUSES)
+        ).all()
+
+        visits_by_day: Dict[date, List[Tuple[int, datetime]]] = {}
+        for row in rows:
+            visits_by_day.setdefault(row.visit_date.date(), []).append((row.id, row.visit_date))
+
+        for day in missing:
+            masks[day] = availability_cache.store(
+                doctor_id, day, visits_by_day.get(day, ()), generation
+            )
+
+    return masks
+
+
+class NextFreeSlotIndex:
+    """
+    doctor_id -> earliest free slot start.
+
+    Precomputed for every verified doctor by the warming loop
+    (warm_next_free_slot_index) and recomputed after booking writes
+    (refresh_doctor_next_free_slot); lookups only compute the doctors it misses.
+    An entry is valid until its TTL expires, the doctor's availability
+    generation changes (any booking write or working-hours change) or
+    the slot itself is in the past.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 50000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # doctor_id -> (next free slot or None, availability generation, expires_at)
+        self._entries: Dict[int, Tuple[Optional[datetime], int, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, doctor_id: int, now: datetime) -> Tuple[bool, Optional[datetime]]:
+        """Returns (hit, next free slot)"""
+        generation = availability_cache.generation(doctor_id)
+        with self._lock:
+            entry = self._entries.get(doctor_id)
+        if entry is None:
+            return False, None
+        slot, entry_generation, expires_at = entry
+        if entry_generation != generation or expires_at < time.monotonic():
+            return False, None
+        if slot is not None and slot < now:
+            return False, None
+        return True, slot
+
+    def set(self, doctor_id: int, slot: Optional[datetime], generation: int):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[doctor_id] = (slot, generation, time.monotonic() + self.ttl)
+
+
+next_free_slot_index = NextFreeSlotIndex(
+    ttl=settings.next_slot_cache_ttl_seconds or settings.availability_cache_ttl_seconds
+)
+
+# How far ahead the next free slot is searched
+NEXT_SLOT_HORIZON_DAYS = 14
+
+
+def find_next_free_slots(
+    db: Session,
+    doctors: Sequence[Tuple[int, Optional[dict]]],
+    now: datetime,
+    horizon_days: int = NEXT_SLOT_HORIZON_DAYS
+) -> Dict[int, Optional[datetime]]:
+    """
+    Earliest free slot of each (doctor_id, working_hours) pair.
+    Served from the index when possible; the rest is computed from one
+    reservations query covering all remaining doctors and the whole horizon.
+    """
+    result: Dict[int, Optional[datetime]] = {}
+    pending = []
+    for doctor_id, working_hours in doctors:
+        hit, slot = next_free_slot_index.get(doctor_id, now)
+        if hit:
+            result[doctor_id] = slot
+        else:
+            pending.append((doctor_id, working_hours))
+
+    if pending:
+        result.update(refresh_next_free_slots(db, pending, now, horizon_days))
+    return result
+
+
+def refresh_next_free_slots(
+    db: Session,
+    doctors: Sequence[Tuple[int, Optional[dict]]],
+    now: datetime,
+    horizon_days: int = NEXT_SLOT_HORIZON_DAYS
+) -> Dict[int, Optional[datetime]]:
+    """
+    Compute the earliest free slot of each (doctor_id, working_hours) pair
+    and store it in the index, from one reservations query covering all of
+    them and the whole horizon.
+    """
+    result: Dict[int, Optional[datetime]] = {}
+    if not doctors:
+        return result
+
+    generations = {doctor_id: availability_cache.generation(doctor_id) for doctor_id, _ in doctors}
+    today = now.date()
+    rows = db.query(DoctorReservation.doctor_id, DoctorReservation.visit_date).filter(
+        DoctorReservation.doctor_id.in_(generations.keys()),
+        DoctorReservation.visit_date >= datetime.combine(today, dtime.min),
+        DoctorReservation.visit_date < datetime.combine(today + timedelta(days=horizon_days), dtime.min),
+        DoctorReservation.status.in_(ACTIVE_RESERVATION_STATUSES)
+    ).all()
+
+    visits: Dict[Tuple[int, date], List[datetime]] = {}
+    for row in rows:
+        visits.setdefault((row.doctor_id, row.visit_date.date()), []).append(row.visit_date)
+
+    # Minutes of today that are already in the past
+    elapsed_mask = (1 << (now.hour * 60 + now.minute + 1)) - 1
+
+    for doctor_id, working_hours in doctors:
+        template = compile_working_hours(working_hours)
+        slot = None
+        if template is not None:
+            for offset in range(horizon_days):
+                day = today + timedelta(days=offset)
+                if not template.works_on(day):
+                    continue
+                mask = occupancy_mask(visits.get((doctor_id, day), ()))
+                if offset == 0:
+                    mask |= elapsed_mask
+                slots = free_slots(template, day, mask)
+                if slots:
+                    hours, minutes = slots[0].split(":")
+                    slot = datetime.combine(day, dtime(int(hours), int(minutes)))
+                    break
+        next_free_slot_index.set(doctor_id, slot, generations[doctor_id])
+        result[doctor_id] = slot
+
+    return result
+
+
+def warm_next_free_slot_index(batch_size: int = 500) -> int:
+    """
+    Precompute the next free slot of every verified doctor (blocking),
+    one reservations query per batch of doctors.
+
+    Returns:
+        Number of doctors indexed
+    """
+    from app.models import Doctor
+
+    db = DoctorsSessionLocal()
+    try:
+        now = datetime.now()
+        warmed = 0
+        last_id = 0
+        while True:
+            doctors = db.query(Doctor.id, Doctor.working_hours).filter(
+                Doctor.is_verified == True,
+                Doctor.id > last_id
+            ).order_by(Doctor.id).limit(batch_size).all()
+            if not doctors:
+                break
+            refresh_next_free_slots(db, [(row.id, row.working_hours) for row in doctors], now)
+            warmed += len(doctors)
+            last_id = doctors[-1].id
+        return warmed
+    finally:
+        db.close()
+
+
+def refresh_doctor_next_free_slot(doctor_id: int):
+    """Recompute one doctor's index entry after a booking write (background task)"""
+    from app.models import Doctor
+
+    db = DoctorsSessionLocal()
+    try:
+        working_hours = db.query(Doctor.working_hours).filter(Doctor.id == doctor_id).scalar()
+        refresh_next_free_slots(db, [(doctor_id, working_hours)], datetime.now())
+    finally:
+        db.close()
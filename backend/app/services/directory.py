@@ -0,0 +1,383 @@
+"""
+Jiwar Backend - Provider Directory Sync
+Keeps the provider_directory read model in sync with the provider databases
+"""
+import logging
+import threading
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.database import (
+    UsersSessionLocal, DoctorsSessionLocal, PharmaciesSessionLocal, TeachersSessionLocal
+)
+from app.models import Doctor, Pharmacy
+from app.models.directory import ProviderDirectory, ProviderDirectorySequence
+from app.models.teacher import Teacher, TeacherPricing
+from app.services.providers import PROVIDER_LOADERS
+
+logger = logging.getLogger(__name__)
+
+# session.info key holding the (provider_type, provider_id) pairs touched by a transaction
+DIRECTORY_CHANGES_KEY = "provider_directory_changes"
+
+_PROVIDER_MODELS = {"doctor": Doctor, "pharmacy": Pharmacy, "teacher": Teacher}
+
+_registered = False
+
+# MapProvider fields that have their own directory column - fieldsets made
+# only of these are served without loading the payload JSON
+DIRECTORY_FIELD_COLUMNS = {
+    "id": ProviderDirectory.provider_id,
+    "type": ProviderDirectory.provider_type,
+    "name": ProviderDirectory.name,
+    "specialty": ProviderDirectory.category,
+    "latitude": ProviderDirectory.latitude,
+    "longitude": ProviderDirectory.longitude,
+    "rating": ProviderDirectory.rating,
+    "total_ratings": ProviderDirectory.total_ratings,
+    "examination_fee": ProviderDirectory.examination_fee,
+}
+
+
+def directory_row(provider_type: str, entity) -> dict:
+    """Directory columns of a provider entity (with its category and pricing loaded)"""
+    builder = PROVIDER_LOADERS[provider_type][2]
+    provider = builder(entity)
+
+    category = None
+    if provider_type == "doctor":
+        category = entity.specialty
+    elif provider_type == "teacher":
+        category = entity.subject
+
+    terms = [entity.name]
+    if category is not None:
+        terms += [category.name_ar, category.name_en]
+
+    return {
+        "provider_type": provider_type,
+        "provider_id": entity.id,
+        "name": entity.name,
+        "category_id": category.id if category is not None else None,
+        "category": provider.specialty,
+        "city": entity.city,
+        "latitude": entity.latitude,
+        "longitude": entity.longitude,
+        "rating": entity.rating or 0.0,
+        "total_ratings": entity.total_ratings or 0,
+        "ranking_score": entity.ranking_score or 0.0,
+        "examination_fee": getattr(entity, "examination_fee", None),
+        "is_verified": bool(entity.is_verified),
+        "search_text": " ".join(term for term in terms if term).lower(),
+        "payload": provider.model_dump(),
+    }
+
+
+def directory_columns(fields: Optional[Iterable[str]]) -> Optional[list]:
+    """
+    Labeled directory columns for a set of MapProvider fields,
+    or None when some field is only available in the payload.
+    """
+    if fields is None:
+        return None
+    fields = list(fields)
+    if not set(fields) <= DIRECTORY_FIELD_COLUMNS.keys():
+        return None
+    return [DIRECTORY_FIELD_COLUMNS[name].label(name) for name in fields]
+
+
+def next_change_seq(users_db: Session) -> int:
+    """
+    Allocate the next change feed position.
+    The counter row stays locked until the caller commits.
+    """
+    updated = users_db.query(ProviderDirectorySequence).filter(
+        ProviderDirectorySequence.id == 1
+    ).update({ProviderDirectorySequence.value: ProviderDirectorySequence.value + 1}, synchronize_session=False)
+    if not updated:
+        users_db.add(ProviderDirectorySequence(id=1, value=1))
+        users_db.flush()
+        return 1
+    return users_db.query(ProviderDirectorySequence.value).filter(ProviderDirectorySequence.id == 1).scalar()
+
+
+def lock_change_seq(users_db: Session):
+    """
+    Row-lock the change feed counter until the caller commits, before
+    anything is read (SELECT ... FOR UPDATE; SQLite locks on write anyway).
+    """
+    users_db.query(ProviderDirectorySequence.id).filter(
+        ProviderDirectorySequence.id == 1
+    ).with_for_update().first()
+
+
+def directory_version(users_db: Session) -> int:
+    """Current change feed position - changes whenever any directory row changes"""
+    return users_db.query(ProviderDirectorySequence.value).filter(
+        ProviderDirectorySequence.id == 1
+    ).scalar() or 0
+
+
+def _upsert(users_db: Session, provider_type: str, rows: List[dict], missing_ids: Iterable[int]):
+    """
+    Write directory rows; removed providers become tombstones.
+    Only rows whose content changed get a new change_seq, so resyncs of
+    unchanged providers do not show up in the change feed.
+    """
+    ids = [row["provider_id"] for row in rows] + list(missing_ids)
+    existing = {
+        entry.provider_id: entry
+        for entry in users_db.query(ProviderDirectory).filter(
+            ProviderDirectory.provider_type == provider_type,
+            ProviderDirectory.provider_id.in_(ids)
+        )
+    } if ids else {}
+
+    change_seq = None
+
+    def seq() -> int:
+        nonlocal change_seq
+        if change_seq is None:
+            change_seq = next_change_seq(users_db)
+        return change_seq
+
+    for row in rows:
+        entry = existing.get(row["provider_id"])
+        if entry is None:
+            users_db.add(ProviderDirectory(**row, is_deleted=False, change_seq=seq()))
+        elif entry.is_deleted or any(getattr(entry, field) != value for field, value in row.items()):
+            for field, value in row.items():
+                setattr(entry, field, value)
+            entry.is_deleted = False
+            entry.change_seq = seq()
+
+    for provider_id in missing_ids:
+        entry = existing.get(provider_id)
+        if entry is not None and not entry.is_deleted:
+            entry.is_deleted = True
+            entry.change_seq = seq()
+
+    users_db.commit()
+
+
+def _locked_sync(users_db: Session, provider_type: str, ids: List[int]) -> int:
+    """
+    Read the providers from their database and write their directory rows
+    while holding the change feed lock. Syncs are serialized on the lock, so
+    a sync that writes later also read later - an older read of a provider
+    never overwrites a newer one.
+    """
+    lock_change_seq(users_db)
+
+    session_factory, loader, _ = PROVIDER_LOADERS[provider_type]
+    source_db = session_factory()
+    try:
+        rows = [directory_row(provider_type, entity) for entity in loader(source_db, ids)]
+    finally:
+        source_db.close()
+    missing_ids = set(ids) - {row["provider_id"] for row in rows}
+
+    _upsert(users_db, provider_type, rows, missing_ids)
+    return len(rows)
+
+
+def sync_providers(provider_type: str, ids: Iterable[int]) -> int:
+    """
+    Refresh the directory rows of the given providers from their database.
+    Providers that no longer exist are turned into tombstones.
+
+    Returns:
+        Number of synced rows
+    """
+    ids = list(set(ids))
+    if not ids:
+        return 0
+
+    users_db = UsersSessionLocal()
+    try:
+        try:
+            return _locked_sync(users_db, provider_type, ids)
+        except IntegrityError:
+            # A concurrent sync inserted the same provider first - retry as update
+            users_db.rollback()
+            return _locked_sync(users_db, provider_type, ids)
+    finally:
+        users_db.close()
+
+
+def rebuild_directory(batch_size: int = 500) -> Dict[str, int]:
+    """Resync every provider and tombstone directory rows of deleted providers"""
+    counts = {}
+    for provider_type, (session_factory, _, _) in PROVIDER_LOADERS.items():
+        model = _PROVIDER_MODELS[provider_type]
+        source_db = session_factory()
+        try:
+            all_ids = [row.id for row in source_db.query(model.id).order_by(model.id)]
+        finally:
+            source_db.close()
+
+        for start in range(0, len(all_ids), batch_size):
+            sync_providers(provider_type, all_ids[start:start + batch_size])
+
+        known = set(all_ids)
+        users_db = UsersSessionLocal()
+        try:
+            stale = [
+                row.provider_id for row in users_db.query(ProviderDirectory.provider_id).filter(
+                    ProviderDirectory.provider_type == provider_type,
+                    ProviderDirectory.is_deleted == False
+                )
+                if row.provider_id not in known
+            ]
+            if stale:
+                _upsert(users_db, provider_type, [], stale)
+        finally:
+            users_db.close()
+        counts[provider_type] = len(all_ids)
+    return counts
+
+
+def rebuild_directory_if_empty() -> Optional[Dict[str, int]]:
+    """Initial fill of a fresh directory table (startup)"""
+    users_db = UsersSessionLocal()
+    try:
+        empty = users_db.query(ProviderDirectory.id).first() is None
+    finally:
+        users_db.close()
+    return rebuild_directory() if empty else None
+
+
+# ==========================================
+# SYNC WORKER
+# ==========================================
+
+class DirectorySyncWorker:
+    """
+    Syncs changed providers on a single background thread, after the
+    request that changed them has committed and responded.
+
+    Pending providers are coalesced: a provider changed several times
+    before the worker gets to it is synced once, from its latest state.
+    Failed syncs are logged; the hourly rebuild job repairs the directory.
+    """
+
+    def __init__(self, batch_size: int = 500):
+        self.batch_size = batch_size
+        # provider_type -> provider ids waiting for a sync
+        self._pending: Dict[str, Set[int]] = {}
+        self._stopping = False
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        with self._condition:
+            self._stopping = False
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="directory-sync", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Sync what is pending (up to `timeout` seconds) and stop the worker"""
+        with self._condition:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._condition.notify()
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+
+    def submit(self, changes: Iterable[Tuple[str, int]]):
+        """Queue (provider_type, provider_id) pairs for a sync (never blocks on the database)"""
+        self.start()
+        with self._condition:
+            for provider_type, provider_id in changes:
+                self._pending.setdefault(provider_type, set()).add(provider_id)
+            self._condition.notify()
+
+    def _next_batch(self) -> Optional[Dict[str, Set[int]]]:
+        """Block until providers are pending, then take all of them (None once stopped)"""
+        with self._condition:
+            while not self._pending and not self._stopping:
+                self._condition.wait()
+            if not self._pending:
+                return None
+            batch, self._pending = self._pending, {}
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            for provider_type, ids in batch.items():
+                ids = sorted(ids)
+                for start in range(0, len(ids), self.batch_size):
+                    chunk = ids[start:start + self.batch_size]
+                    try:
+                        sync_providers(provider_type, chunk)
+                    except Exception as e:
+                        # The write itself succeeded; the rebuild job repairs the directory
+                        logger.error(f"Provider directory sync failed for {provider_type} {chunk}: {e}")
+
+
+directory_sync = DirectorySyncWorker()
+
+
+# ==========================================
+# CHANGE EVENTS
+# ==========================================
+
+def _provider_ref(obj) -> Optional[Tuple[str, int]]:
+    if isinstance(obj, Doctor):
+        return "doctor", obj.id
+    if isinstance(obj, Pharmacy):
+        return "pharmacy", obj.id
+    if isinstance(obj, Teacher):
+        return "teacher", obj.id
+    if isinstance(obj, TeacherPricing):
+        return "teacher", obj.teacher_id
+    return None
+
+
+def mark_directory_changed(db: Session, provider_type: str, ids: Iterable[int]):
+    """
+    Queue providers for a directory sync when `db` commits.
+    Needed for bulk UPDATE statements, which bypass the flush events.
+    """
+    changes: Set[Tuple[str, int]] = db.info.setdefault(DIRECTORY_CHANGES_KEY, set())
+    changes.update((provider_type, provider_id) for provider_id in ids)
+
+
+def _after_flush(session: Session, flush_context):
+    changes: Set[Tuple[str, int]] = session.info.setdefault(DIRECTORY_CHANGES_KEY, set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        ref = _provider_ref(obj)
+        if ref is not None and ref[1] is not None:
+            changes.add(ref)
+
+
+def _after_commit(session: Session):
+    changes = session.info.pop(DIRECTORY_CHANGES_KEY, None)
+    if changes:
+        # Synced off the request - the directory catches up right after the response
+        directory_sync.submit(changes)
+
+
+def _after_rollback(session: Session):
+    session.info.pop(DIRECTORY_CHANGES_KEY, None)
+
+
+def register_directory_sync():
+    """Listen to commits of the provider databases and start the sync worker (call once at startup)"""
+    global _registered
+    if _registered:
+        return
+    for session_factory in (DoctorsSessionLocal, PharmaciesSessionLocal, TeachersSessionLocal):
+        event.listen(session_factory, "after_flush", _after_flush)
+        event.listen(session_factory, "after_commit", _after_commit)
+        event.listen(session_factory, "after_rollback", _after_rollback)
+    directory_sync.start()
+    _registered = True
@@ -0,0 +1,104 @@
+"""
+Jiwar Backend - Image Derivatives
+Thumbnail / medium WebP variants of uploaded images, generated in a worker pool
+"""
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Set
+
+from app.core.config import settings
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Optional dependency - originals are served instead
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Derivative name -> longest edge in pixels
+IMAGE_SIZES = {
+    "thumb": 96,    # map markers, list avatars
+    "medium": 512,  # detail screens
+}
+
+WEBP_QUALITY = 80
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.image_worker_threads, thread_name_prefix="image-derivatives"
+)
+
+# Originals queued or being processed - failed ones stay here so they are not retried
+_pending: Set[str] = set()
+_pending_lock = threading.Lock()
+
+
+def derivative_path(path: str, size: str) -> str:
+    """Path of a derivative next to its original: <name>.<size>.webp"""
+    stem, _ = os.path.splitext(path)
+    return f"{stem}.{size}.webp"
+
+
+def generate_derivatives(path: str) -> List[str]:
+    """
+    Write every IMAGE_SIZES variant of an image (blocking - run in the pool).
+    Each variant is written to a temp file and renamed into place.
+    """
+    if Image is None:
+        return []
+
+    written = []
+    with Image.open(path) as original:
+        # Let the JPEG decoder downscale while decoding (much less memory / CPU)
+        largest = max(IMAGE_SIZES.values())
+        original.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+        for size, edge in sorted(IMAGE_SIZES.items(), key=lambda item: -item[1]):
+            variant = image.copy()
+            variant.thumbnail((edge, edge), Image.LANCZOS)
+            target = derivative_path(path, size)
+            temp_path = f"{target}.part"
+            variant.save(temp_path, "WEBP", quality=WEBP_QUALITY, method=4)
+            os.replace(temp_path, target)
+            written.append(target)
+    return written
+
+
+def _finished(path: str, future: Future):
+    error = future.exception()
+    if error is not None:
+        logger.error(f"Image derivative generation failed for {path}: {error}")
+        return
+    with _pending_lock:
+        _pending.discard(path)
+
+
+def schedule_derivatives(path: str):
+    """Queue derivative generation for an image (returns immediately)"""
+    if Image is None:
+        return
+    with _pending_lock:
+        if path in _pending:
+            return
+        _pending.add(path)
+    future = _executor.submit(generate_derivatives, path)
+    future.add_done_callback(lambda done: _finished(path, done))
+
+
+def resolve_image(path: str, size: Optional[str]) -> str:
+    """
+    File to serve for an image at the requested size.
+    Falls back to the original while the derivative does not exist yet
+    (and queues it, which backfills uploads made before derivatives existed).
+    """
+    if not size:
+        return path
+    target = derivative_path(path, size)
+    if os.path.exists(target):
+        return target
+    schedule_derivatives(path)
+    return path
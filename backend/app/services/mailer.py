@@ -0,0 +1,200 @@
+"""
+Jiwar Backend - Mail Sender
+Queued SMTP delivery over a persistent connection, off the request workers
+"""
+import logging
+import queue
+import smtplib
+import ssl
+import threading
+import time
+from email.message import Message
+from typing import List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Stops the worker once everything queued before it is sent
+_STOP = object()
+
+
+def _is_transient(error: Exception) -> bool:
+    """Connection problems and 4xx replies are worth retrying; 5xx replies are not"""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return False
+    return isinstance(error, OSError)
+
+
+class Mailer:
+    """
+    Sends email from a bounded queue on a single worker thread.
+
+    The worker keeps one SMTP connection open (STARTTLS and login happen
+    once, not per message), sends queued messages in batches over it and
+    closes it after `idle_timeout` seconds without mail. Transient failures
+    reconnect and retry with exponential backoff.
+
+    For local debugging point it at a plain SMTP server, e.g.
+    `python -m aiosmtpd -n -l localhost:1025` with SMTP_HOST=localhost,
+    SMTP_PORT=1025, SMTP_STARTTLS=false and SMTP_AUTH=false.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        starttls: bool = True,
+        queue_size: int = 1000,
+        batch_size: int = 20,
+        max_retries: int = 3,
+        retry_backoff: float = 2.0,
+        idle_timeout: float = 60.0,
+        timeout: float = 10.0
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._connection: Optional[smtplib.SMTP] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    # ------------------------------------------
+    # Producer side (request handlers)
+    # ------------------------------------------
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="mailer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Send what is queued (up to `timeout` seconds) and stop the worker"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning("Mail queue still full at shutdown - queued mail is dropped")
+            return
+        thread.join(timeout)
+
+    def send(self, message: Message) -> bool:
+        """
+        Queue a message for delivery (never blocks).
+        Returns False when the queue is full and the message was dropped.
+        """
+        self.start()
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except queue.Full:
+            logger.error(f"Mail queue full - dropped message '{message['Subject']}'")
+            return False
+
+    # ------------------------------------------
+    # Worker side
+    # ------------------------------------------
+
+    def _connect(self) -> smtplib.SMTP:
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                connection.starttls(context=ssl.create_default_context())
+            if self.username and self.password:
+                connection.login(self.username, self.password)
+        except Exception:
+            connection.close()
+            raise
+        return connection
+
+    def _disconnect(self):
+        if self._connection is None:
+            return
+        try:
+            self._connection.quit()
+        except Exception:
+            self._connection.close()
+        self._connection = None
+
+    def _deliver(self, message: Message) -> bool:
+        """Send one message, reconnecting and retrying transient failures"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self._connection is None:
+                    self._connection = self._connect()
+                self._connection.send_message(message)
+                return True
+            except Exception as e:
+                self._disconnect()
+                if not _is_transient(e) or attempt == self.max_retries:
+                    logger.error(f"❌ Failed to send email '{message['Subject']}': {e}")
+                    return False
+                delay = self.retry_backoff * (2 ** attempt)
+                logger.warning(f"Email send failed ({e}), retrying in {delay:.0f}s")
+                time.sleep(delay)
+
+    def _next_batch(self) -> Optional[List]:
+        """Block until mail arrives, then take whatever else is already queued"""
+        try:
+            first = self._queue.get(timeout=self.idle_timeout)
+        except queue.Empty:
+            return None
+        batch = [first]
+        while len(batch) < self.batch_size and batch[-1] is not _STOP:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                # Idle - do not hold the server connection open
+                self._disconnect()
+                continue
+            sent = 0
+            for message in batch:
+                if message is _STOP:
+                    self._disconnect()
+                    return
+                sent += self._deliver(message)
+            if sent:
+                logger.info(f"✅ Sent {sent} email(s)")
+
+
+mailer = Mailer(
+    host=settings.smtp_host,
+    port=settings.smtp_port,
+    username=settings.mail_username if settings.smtp_auth else None,
+    password=settings.mail_password if settings.smtp_auth else None,
+    starttls=settings.smtp_starttls,
+    queue_size=settings.mail_queue_size,
+    batch_size=settings.mail_batch_size,
+    max_retries=settings.mail_max_retries,
+    retry_backoff=settings.mail_retry_backoff_seconds,
+)
+
+
+def mail_configured() -> bool:
+    """Whether mail can be sent (credentials present, or a server without auth)"""
+    return not settings.smtp_auth or bool(settings.mail_username and settings.mail_password)
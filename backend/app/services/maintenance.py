@@ -0,0 +1,122 @@
+"""
+Jiwar Backend - Periodic Maintenance Jobs
+Housekeeping jobs (retention, reconciliation) run on a fixed interval
+"""
+import asyncio
+import logging
+from typing import Callable, List, Tuple, Optional
+
+from app.core.config import settings
+from app.core.database import (
+    UsersSessionLocal, DoctorsSessionLocal, PharmaciesSessionLocal, TeachersSessionLocal
+)
+
+logger = logging.getLogger(__name__)
+
+
+def archive_notifications_job() -> int:
+    """Archive read notifications older than the retention window"""
+    from app.services.notifications import archive_old_notifications
+
+    db = UsersSessionLocal()
+    try:
+        return archive_old_notifications(db, settings.notification_retention_days)
+    finally:
+        db.close()
+
+
+def reconcile_ratings_job() -> dict:
+    """Correct drifted rating aggregates and refresh ranking scores of all providers"""
+    from app.models import Doctor, DoctorRating, Pharmacy, PharmacyRating
+    from app.models.teacher import Teacher, TeacherRating
+    from app.services.ratings import reconcile_rating_aggregates
+
+    targets = [
+        (DoctorsSessionLocal, Doctor, DoctorRating, "doctor_id", "doctor"),
+        (PharmaciesSessionLocal, Pharmacy, PharmacyRating, "pharmacy_id", "pharmacy"),
+        (TeachersSessionLocal, Teacher, TeacherRating, "teacher_id", "teacher"),
+    ]
+    corrected = {}
+    for session_factory, entity_model, rating_model, entity_id_field, provider_type in targets:
+        db = session_factory()
+        try:
+            corrected[entity_model.__tablename__] = reconcile_rating_aggregates(
+                db, entity_model, rating_model, entity_id_field, provider_type
+            )
+        finally:
+            db.close()
+    return corrected
+
+
+def rebuild_directory_job() -> dict:
+    """Resync the provider directory (specialty renames, missed change events)"""
+    from app.services.directory import rebuild_directory
+    return rebuild_directory()
+
+
+def collect_upload_garbage_job() -> object:
+    """Delete uploads no profile or order references (opt-in)"""
+    if not settings.upload_gc_enabled:
+        return "disabled"
+    from app.services.storage import collect_garbage
+    return collect_garbage(settings.upload_gc_grace_hours)
+
+
+# (name, job) pairs - every job must be idempotent, several workers may run it
+MAINTENANCE_JOBS: List[Tuple[str, Callable[[], object]]] = [
+    ("archive_notifications", archive_notifications_job),
+    ("reconcile_ratings", reconcile_ratings_job),
+    ("rebuild_directory", rebuild_directory_job),
+    ("collect_upload_garbage", collect_upload_garbage_job),
+]
+
+
+def run_maintenance_jobs():
+    """Run every maintenance job once, isolating failures"""
+    for name, job in MAINTENANCE_JOBS:
+        try:
+            result = job()
+            logger.info(f"Maintenance job '{name}' finished: {result}")
+        except Exception as e:
+            logger.error(f"Maintenance job '{name}' failed: {e}")
+
+
+async def _maintenance_loop(interval_minutes: int):
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval_minutes * 60)
+        # Jobs use blocking DB sessions - keep them off the event loop
+        await loop.run_in_executor(None, run_maintenance_jobs)
+
+
+def start_maintenance() -> Optional[asyncio.Task]:
+    """Schedule the maintenance loop (call from the startup event)"""
+    if settings.maintenance_interval_minutes <= 0:
+        return None
+    return asyncio.create_task(_maintenance_loop(settings.maintenance_interval_minutes))
+
+
+def warm_next_free_slots_job() -> int:
+    """Precompute the next free slot of every verified doctor"""
+    from app.services.availability import warm_next_free_slot_index
+    return warm_next_free_slot_index()
+
+
+async def _next_slot_warming_loop(interval_seconds: int):
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            await loop.run_in_executor(None, warm_next_free_slots_job)
+        except Exception as e:
+            logger.error(f"Next free slot warming failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+def start_next_slot_warming() -> Optional[asyncio.Task]:
+    """
+    Keep the next-free-slot index precomputed (call from the startup event).
+    Runs more often than the maintenance loop: entries expire with the index TTL.
+    """
+    if settings.next_slot_warm_interval_seconds <= 0:
+        return None
+    return asyncio.create_task(_next_slot_warming_loop(settings.next_slot_warm_interval_seconds))
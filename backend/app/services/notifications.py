@@ -188,11 +188,13 @@ def send_notification_to_user(
 # ==========================================
 
 from app.models.user import User
-from app.models.notification import Notification
+from app.models.notification import Notification, NotificationArchive
 from sqlalchemy.orm import Session
+from sqlalchemy import insert, select
+from datetime import datetime, timedelta, timezone
 
 def save_notification(db: Session, user_id: int, title: str, body: str, data: Optional[Dict[str, Any]] = None):
-    """Save notification to database"""
+    """Save notification to database and bump the user's unread counter"""
     try:
         new_notif = Notification(
             user_id=user_id,
@@ -202,11 +204,55 @@ def save_notification(db: Session, user_id: int, title: str, body: str, data: Op
             is_read=False
         )
         db.add(new_notif)
+        # Same transaction as the insert so the badge counter never drifts
+        db.query(User).filter(User.id == user_id).update(
+            {User.unread_notifications: User.unread_notifications + 1},
+            synchronize_session=False
+        )
         db.commit() # Commit to get ID if needed, or rely on caller? 
         # Better to commit here to ensure persistence even if FCM fails
     except Exception as e:
+        db.rollback()
         logger.error(f"Failed to save notification to DB: {e}")
 
+
+def archive_old_notifications(db: Session, retention_days: int, batch_size: int = 5000) -> int:
+    """
+    Move read notifications older than the retention window to notifications_archive.
+    Unread notifications are never archived, so unread counters are unaffected.
+    Batches are read oldest first from the partial index on read notifications.
+    
+    Returns:
+        Number of archived notifications
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    columns = ["id", "user_id", "title", "body", "data", "is_read", "created_at"]
+    archived = 0
+    
+    while True:
+        ids = [
+            row.id for row in db.query(Notification.id).filter(
+                Notification.is_read == True,
+                Notification.created_at < cutoff
+            ).order_by(Notification.created_at, Notification.id).limit(batch_size).all()
+        ]
+        if not ids:
+            break
+        
+        db.execute(
+            insert(NotificationArchive).from_select(
+                columns,
+                select(*[getattr(Notification, c) for c in columns]).where(Notification.id.in_(ids))
+            )
+        )
+        db.query(Notification).filter(Notification.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        archived += len(ids)
+    
+    if archived:
+        logger.info(f"Archived {archived} notifications older than {retention_days} days")
+    return archived
+
 def notify_new_booking(db: Session, provider: User, patient_name: str, reservation_id: int, provider_type: str) -> bool:
     """Notify provider about a new booking"""
     title = "حجز جديد 📋"
@@ -0,0 +1,94 @@
+"""
+Jiwar Backend - Provider Loading
+Builds MapProvider payloads and bulk-loads providers by id from their databases
+(feeds the provider directory, see services/directory.py)
+"""
+from typing import Dict, Iterable
+
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from app.core.database import DoctorsSessionLocal, PharmaciesSessionLocal, TeachersSessionLocal
+from app.models import Doctor, Pharmacy
+from app.models.teacher import Teacher
+from app.schemas.search import MapProvider
+
+
+def doctor_to_map_provider(d: Doctor) -> MapProvider:
+    return MapProvider(
+        id=d.id,
+        type="doctor",
+        name=d.name,
+        specialty=d.specialty.name_ar if d.specialty else None,
+        address=d.address,
+        latitude=d.latitude,
+        longitude=d.longitude,
+        rating=d.rating or 0.0,
+        total_ratings=d.total_ratings or 0,
+        phone=d.phone,
+        profile_image=d.profile_image,
+        description=d.description,
+        consultation_fee=d.consultation_fee,
+        examination_fee=d.examination_fee,
+        working_hours=d.working_hours,
+    )
+
+
+def pharmacy_to_map_provider(p: Pharmacy) -> MapProvider:
+    return MapProvider(
+        id=p.id,
+        type="pharmacy",
+        name=p.name,
+        specialty=None,
+        address=p.address,
+        latitude=p.latitude,
+        longitude=p.longitude,
+        rating=p.rating or 0.0,
+        total_ratings=p.total_ratings or 0,
+        phone=p.phone,
+        profile_image=p.profile_image,
+        description=None,
+        delivery_available=p.delivery_available,
+        working_hours=p.working_hours,
+    )
+
+
+def teacher_to_map_provider(t: Teacher) -> MapProvider:
+    return MapProvider(
+        id=t.id,
+        type="teacher",
+        name=t.name,
+        specialty=t.subject.name_ar if t.subject else None,
+        address=t.address,
+        latitude=t.latitude,
+        longitude=t.longitude,
+        rating=t.rating or 0.0,
+        total_ratings=t.total_ratings or 0,
+        phone=t.phone,
+        profile_image=t.profile_image,
+        description=t.description,
+        whatsapp=t.whatsapp,
+        pricing=[{"grade_name": p.grade_name, "price": p.price} for p in t.pricing] if t.pricing else []
+    )
+
+
+def _load_doctors(db: Session, ids: Iterable[int]) -> list:
+    return db.query(Doctor).options(joinedload(Doctor.specialty)).filter(Doctor.id.in_(ids)).all()
+
+
+def _load_pharmacies(db: Session, ids: Iterable[int]) -> list:
+    return db.query(Pharmacy).filter(Pharmacy.id.in_(ids)).all()
+
+
+def _load_teachers(db: Session, ids: Iterable[int]) -> list:
+    return db.query(Teacher).options(
+        joinedload(Teacher.subject), selectinload(Teacher.pricing)
+    ).filter(Teacher.id.in_(ids)).all()
+
+
+# type -> (session factory, loader, builder)
+PROVIDER_LOADERS: Dict[str, tuple] = {
+    "doctor": (DoctorsSessionLocal, _load_doctors, doctor_to_map_provider),
+    "pharmacy": (PharmaciesSessionLocal, _load_pharmacies, pharmacy_to_map_provider),
+    "teacher": (TeachersSessionLocal, _load_teachers, teacher_to_map_provider),
+}
+
@@ -0,0 +1,210 @@
+"""
+Jiwar Backend - Rating Aggregates
+Running sum / count / per-star histogram and ranking score of provider ratings
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Tuple, Type
+
+from sqlalchemy import Float, Numeric, bindparam, case, cast, func, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.services.directory import mark_directory_changed
+
+logger = logging.getLogger(__name__)
+
+STARS = range(1, 6)
+
+
+def _average(total_sum, total_count):
+    """round(sum / count, 1) as SQL, portable across PostgreSQL and SQLite"""
+    return func.round(cast(cast(total_sum, Float) / total_count, Numeric), 1)
+
+
+def ranking_score(weighted_sum: float, weighted_count: float) -> float:
+    """
+    Bayesian average: the prior mean counts as `ranking_prior_weight` ratings,
+    so a single 5-star review does not outrank hundreds of 4.8 ones.
+    """
+    prior_weight = settings.ranking_prior_weight
+    denominator = prior_weight + weighted_count
+    if denominator <= 0:
+        return 0.0
+    return (prior_weight * settings.ranking_prior_mean + weighted_sum) / denominator
+
+
+def _ranking_expression(weighted_sum, weighted_count):
+    """ranking_score() as SQL"""
+    prior_weight = settings.ranking_prior_weight
+    return (prior_weight * settings.ranking_prior_mean + weighted_sum) / (prior_weight + weighted_count)
+
+
+def apply_rating(db: Session, entity_model: Type, entity_id: int, stars: int) -> int:
+    """
+    Add one rating to the provider's aggregates with a single UPDATE.
+    All SET expressions read the pre-update row, so concurrent raters
+    serialize on the row lock instead of overwriting each other.
+    Does not commit - runs in the caller's transaction with the rating insert.
+    """
+    total = func.coalesce(entity_model.total_ratings, 0)
+    star_column = getattr(entity_model, f"rating_{stars}_count")
+    # A new rating has full weight; older ones are decayed by the maintenance job
+    weighted_sum = entity_model.ranking_weighted_sum + stars
+    weighted_count = entity_model.ranking_weighted_count + 1
+    return db.query(entity_model).filter(entity_model.id == entity_id).update(
+        {
+            entity_model.rating_sum: entity_model.rating_sum + stars,
+            star_column: star_column + 1,
+            entity_model.total_ratings: total + 1,
+            entity_model.rating: _average(entity_model.rating_sum + stars, total + 1),
+            entity_model.ranking_weighted_sum: weighted_sum,
+            entity_model.ranking_weighted_count: weighted_count,
+            entity_model.ranking_score: _ranking_expression(weighted_sum, weighted_count),
+        },
+        synchronize_session=False
+    )
+
+
+def _star_histograms(db: Session, rating_model: Type, entity_id_column) -> Dict[int, Dict[int, int]]:
+    """entity_id -> {stars: count} from the ratings table"""
+    histograms: Dict[int, Dict[int, int]] = {}
+    for entity_id, stars, count in db.query(
+        entity_id_column, rating_model.rating, func.count(rating_model.id)
+    ).group_by(entity_id_column, rating_model.rating):
+        histograms.setdefault(entity_id, {})[stars] = count
+    return histograms
+
+
+def _ranking_weights(db: Session, rating_model: Type, entity_id_column) -> Dict[int, Tuple[float, float]]:
+    """
+    entity_id -> (weighted sum, weighted count) of its ratings.
+    Each rating weighs 0.5 ** (age / half-life); without decay the weights are 1
+    and the result comes straight from the star histograms.
+    """
+    half_life_days = settings.ranking_decay_half_life_days
+    if half_life_days <= 0:
+        histograms = _star_histograms(db, rating_model, entity_id_column)
+        return {
+            entity_id: (
+                float(sum(stars * count for stars, count in histogram.items())),
+                float(sum(histogram.values()))
+            )
+            for entity_id, histogram in histograms.items()
+        }
+
+    now = datetime.now(timezone.utc)
+    weights: Dict[int, Tuple[float, float]] = {}
+    rows = db.query(entity_id_column, rating_model.rating, rating_model.created_at).yield_per(5000)
+    for entity_id, stars, created_at in rows:
+        if created_at is None:
+            weight = 1.0
+        else:
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            age_days = max((now - created_at).total_seconds() / 86400, 0.0)
+            weight = 0.5 ** (age_days / half_life_days)
+        weighted_sum, weighted_count = weights.get(entity_id, (0.0, 0.0))
+        weights[entity_id] = (weighted_sum + stars * weight, weighted_count + weight)
+    return weights
+
+
+def reconcile_rating_aggregates(
+    db: Session,
+    entity_model: Type,
+    rating_model: Type,
+    entity_id_field: str,
+    provider_type: str
+) -> int:
+    """
+    Recompute aggregates from the ratings table for providers whose stored
+    values drifted (missed updates, manual edits, deleted ratings), and
+    refresh ranking scores (applies recency decay when enabled).
+
+    Returns:
+        Number of corrected providers
+    """
+    entity_id_column = getattr(rating_model, entity_id_field)
+
+    actual = _star_histograms(db, rating_model, entity_id_column)
+
+    star_columns = [getattr(entity_model, f"rating_{stars}_count") for stars in STARS]
+    drifted = []
+    for row in db.query(
+        entity_model.id, entity_model.rating, entity_model.total_ratings,
+        entity_model.rating_sum, *star_columns
+    ):
+        histogram = actual.get(row.id, {})
+        total = sum(histogram.values())
+        rating_sum = sum(stars * count for stars, count in histogram.items())
+        average = round(rating_sum / total, 1) if total else 0.0
+        stored: Tuple = (row.total_ratings or 0, row.rating_sum or 0, *row[4:])
+        expected: Tuple = (total, rating_sum, *(histogram.get(stars, 0) for stars in STARS))
+        if stored != expected or abs((row.rating or 0.0) - average) > 0.05:
+            drifted.append(row.id)
+
+    if drifted:
+        # Recompute inside the UPDATE itself so ratings committed meanwhile are counted
+        def scalar(expression, *criteria):
+            return select(expression).where(
+                entity_id_column == entity_model.id, *criteria
+            ).scalar_subquery()
+
+        rating_sum = func.coalesce(scalar(func.sum(rating_model.rating)), 0)
+        total = scalar(func.count(rating_model.id))
+        values = {
+            entity_model.rating_sum: rating_sum,
+            entity_model.total_ratings: total,
+            entity_model.rating: case((total == 0, 0.0), else_=_average(rating_sum, total)),
+        }
+        for stars, column in zip(STARS, star_columns):
+            values[column] = scalar(func.count(rating_model.id), rating_model.rating == stars)
+
+        db.query(entity_model).filter(entity_model.id.in_(drifted)).update(values, synchronize_session=False)
+        mark_directory_changed(db, provider_type, drifted)
+        db.commit()
+        logger.info(f"Reconciled rating aggregates of {len(drifted)} {entity_model.__tablename__}")
+
+    # Ranking scores. The stored weights are read before the ratings: a rating
+    # applied after this point changes ranking_weighted_count, so the
+    # conditional write below skips that provider (the next run picks it up)
+    # instead of overwriting the new rating with older totals.
+    stored = db.query(
+        entity_model.id, entity_model.ranking_weighted_count, entity_model.ranking_score
+    ).all()
+    weights = _ranking_weights(db, rating_model, entity_id_column)
+    updates = []
+    for row in stored:
+        weighted_sum, weighted_count = weights.get(row.id, (0.0, 0.0))
+        score = ranking_score(weighted_sum, weighted_count)
+        # Decay moves every score a little on every run - only meaningful moves
+        # are written and announced to the directory change feed
+        if abs((row.ranking_score or 0.0) - score) > settings.ranking_score_tolerance:
+            updates.append({
+                "entity_id": row.id,
+                "read_count": row.ranking_weighted_count,
+                "weighted_sum": weighted_sum,
+                "weighted_count": weighted_count,
+                "score": score,
+            })
+
+    refreshed = []
+    if updates:
+        table = entity_model.__table__
+        statement = update(table).where(
+            table.c.id == bindparam("entity_id"),
+            table.c.ranking_weighted_count == bindparam("read_count")
+        ).values(
+            ranking_weighted_sum=bindparam("weighted_sum"),
+            ranking_weighted_count=bindparam("weighted_count"),
+            ranking_score=bindparam("score"),
+        )
+        for values in updates:
+            if db.execute(statement, values).rowcount:
+                refreshed.append(values["entity_id"])
+        if refreshed:
+            mark_directory_changed(db, provider_type, refreshed)
+        db.commit()
+        logger.info(f"Refreshed ranking scores of {len(refreshed)} {entity_model.__tablename__}")
+
+    return len(set(drifted) | set(refreshed))
@@ -0,0 +1,114 @@
+"""
+Jiwar Backend - Reference Data Cache
+Specialties and subjects kept in memory as encoded, precompressed payloads
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.compression import CachedPayload
+from app.core.config import settings
+from app.core.database import DoctorsSessionLocal, TeachersSessionLocal
+from app.core.responses import dumps
+from app.models import Specialty
+from app.models.teacher import Subject
+from app.schemas.teacher import SubjectResponse
+
+
+class ReferenceDataCache:
+    """
+    Encoded specialties / subjects responses, loaded at startup.
+
+    The lists only change when the seeds change, so an entry is reloaded
+    when it is older than `ttl` seconds (picks up seeds run by another
+    worker) or after invalidate(), which every writer of specialties /
+    subjects calls. Reloads query the database, so the accessors run them
+    in the threadpool. A reload that finds the same rows yields the same
+    ETag, so clients keep their copies.
+    """
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self._specialties: Optional[CachedPayload] = None
+        self._specialty_items: Dict[int, CachedPayload] = {}
+        self._subjects: Optional[CachedPayload] = None
+        # kind -> monotonic load time
+        self._loaded_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _stale(self, kind: str) -> bool:
+        loaded_at = self._loaded_at.get(kind)
+        return loaded_at is None or time.monotonic() - loaded_at > self.ttl
+
+    def load(self):
+        """(Re)load every reference list (blocking)"""
+        self._load_specialties()
+        self._load_subjects()
+
+    def invalidate(self):
+        """Reload on next access (call after writing specialties / subjects)"""
+        with self._lock:
+            self._loaded_at.clear()
+
+    def _load_specialties(self):
+        db = DoctorsSessionLocal()
+        try:
+            rows = db.query(
+                Specialty.id, Specialty.name_ar, Specialty.name_en, Specialty.icon
+            ).order_by(Specialty.id).all()
+        finally:
+            db.close()
+
+        items = [
+            {"id": row.id, "name_ar": row.name_ar, "name_en": row.name_en, "icon": row.icon}
+            for row in rows
+        ]
+        specialties = CachedPayload(dumps({"specialties": items}))
+        specialty_items = {item["id"]: CachedPayload(dumps(item)) for item in items}
+        with self._lock:
+            self._specialties = specialties
+            self._specialty_items = specialty_items
+            self._loaded_at["specialties"] = time.monotonic()
+
+    def _load_subjects(self):
+        db = TeachersSessionLocal()
+        try:
+            subjects = db.query(Subject).order_by(Subject.id).all()
+            items = [SubjectResponse.model_validate(subject).model_dump() for subject in subjects]
+        finally:
+            db.close()
+
+        payload = CachedPayload(dumps(items))
+        with self._lock:
+            self._subjects = payload
+            self._loaded_at["subjects"] = time.monotonic()
+
+    async def specialties(self) -> CachedPayload:
+        if self._stale("specialties"):
+            await run_in_threadpool(self._load_specialties)
+        return self._specialties
+
+    async def specialty(self, specialty_id: int) -> Optional[CachedPayload]:
+        if self._stale("specialties"):
+            await run_in_threadpool(self._load_specialties)
+        return self._specialty_items.get(specialty_id)
+
+    async def subjects(self) -> CachedPayload:
+        if self._stale("subjects"):
+            await run_in_threadpool(self._load_subjects)
+        return self._subjects
+
+
+reference_data = ReferenceDataCache(ttl=settings.reference_cache_ttl_seconds)
+
+
+def reference_cache_control() -> str:
+    """
+    Cache-Control header of reference data responses.
+    Never longer than the reload interval, so clients do not keep a list
+    the server has already refreshed.
+    """
+    max_age = min(settings.reference_cache_max_age_seconds, settings.reference_cache_ttl_seconds)
+    return f"public, max-age={max_age}"
@@ -1,63 +1,169 @@
-from datetime import datetime, timedelta, time
-from typing import List, Dict, Optional
+import json
+from datetime import datetime, date, timedelta
+from functools import lru_cache
+from typing import List, Dict, Optional, Iterable
 from app.models.reservations import DoctorReservation
 
+# Length of a booked appointment and the default slot length (minutes)
+DEFAULT_SLOT_MINUTES = 30
+
+# "HH:MM" label for every minute of the day
+_MINUTE_LABELS = [f"{m // 60:02d}:{m % 60:02d}" for m in range(24 * 60)]
+
+_DAY_NAMES = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+
+class WorkingHoursTemplate:
+    """
+    Pre-parsed working hours: enabled weekdays (date.weekday() numbers)
+    and the working window as minute offsets from midnight.
+    """
+    __slots__ = ("weekdays", "start", "end")
+
+    def __init__(self, weekdays: frozenset, start: int, end: int):
+        self.weekdays = weekdays
+        self.start = start
+        self.end = end
+
+    def works_on(self, day: date) -> bool:
+        return day.weekday() in self.weekdays
+
+
+def _parse_minutes(value: str) -> int:
+    """Parse "HH:MM" into minutes from midnight"""
+    hours, minutes = str(value).split(":")
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours <= 23 and 0 <= minutes <= 59):
+        raise ValueError(f"Invalid time: {value}")
+    return hours * 60 + minutes
+
+
+@lru_cache(maxsize=2048)
+def _compile(working_hours_key: str) -> Optional[WorkingHoursTemplate]:
+    working_hours = json.loads(working_hours_key)
+
+    # Format (see provider_details_panel.dart):
+    # {"days": {"sunday": true, ...}, "start": "14:00", "end": "17:00"}
+    days_map = working_hours.get('days') or {}
+    weekdays = frozenset(
+        i for i, name in enumerate(_DAY_NAMES) if days_map.get(name, False)
+    )
+
+    try:
+        start = _parse_minutes(working_hours.get('start', '09:00'))
+        end = _parse_minutes(working_hours.get('end', '21:00'))
+    except ValueError:
+        return None
+
+    return WorkingHoursTemplate(weekdays, start, end)
+
+
+def compile_working_hours(working_hours: Optional[Dict]) -> Optional[WorkingHoursTemplate]:
+    """
+    Compile a doctor's working_hours JSON into a template.
+    Templates are memoized, so identical schedules are parsed only once.
+    Returns None if the doctor has no (valid) working hours.
+    """
+    if not working_hours or not isinstance(working_hours, dict):
+        return None
+    return _compile(json.dumps(working_hours, sort_keys=True))
+
+
+def occupancy_mask(visit_times: Iterable[datetime], duration: int = DEFAULT_SLOT_MINUTES) -> int:
+    """
+    Build a minute-level occupancy bitmap for one day.
+    Bit N is set when minute N of the day is taken by a reservation.
+    """
+    block = (1 << duration) - 1
+    mask = 0
+    for visit in visit_times:
+        mask |= block << (visit.hour * 60 + visit.minute)
+    return mask
+
+
+def free_slots(
+    template: Optional[WorkingHoursTemplate],
+    day: date,
+    mask: int,
+    slot_minutes: int = DEFAULT_SLOT_MINUTES
+) -> List[str]:
+    """List "HH:MM" slot starts of the day that do not overlap the occupancy mask"""
+    if template is None or not template.works_on(day):
+        return []
+
+    block = (1 << slot_minutes) - 1
+    return [
+        _MINUTE_LABELS[start]
+        for start in range(template.start, template.end - slot_minutes + 1, slot_minutes)
+        if not (mask >> start) & block
+    ]
+
+
+def is_slot_start(
+    template: Optional[WorkingHoursTemplate],
+    visit: datetime,
+    slot_minutes: int = DEFAULT_SLOT_MINUTES
+) -> bool:
+    """Whether a visit time is one of the slot starts free_slots() can offer"""
+    if template is None or not template.works_on(visit.date()):
+        return False
+    if visit.second or visit.microsecond:
+        return False
+    minute = visit.hour * 60 + visit.minute
+    return (
+        template.start <= minute <= template.end - slot_minutes
+        and (minute - template.start) % slot_minutes == 0
+    )
+
+
 class SlotGenerator:
     @staticmethod
     def generate_slots(
         working_hours: Dict,
         date: datetime,
-        existing_reservations: List[DoctorReservation]
+        existing_reservations: List[DoctorReservation],
+        slot_minutes: int = DEFAULT_SLOT_MINUTES
     ) -> List[str]:
         """
-        Generate available 30-minute time slots for a specific date
+        Generate available time slots for a specific date
         based on working hours and existing reservations.
         """
-        # Get English day name (e.g., "Sunday")
-        day_name = date.strftime("%A")
-        
-        # Check if doctor works on this day
-        # working_hours format: {"Sunday": [{"start": "14:00", "end": "17:00"}], ...}
-        # Or simple format: {"days": {"sunday": true}, "start": "14:00", "end": "17:00"} (Current format in DB seems mixed, let's support the simple one first based on provider_details_panel.dart)
-        
-        # Based on provider_details_panel.dart:
-        # hours = provider.workingHours!;
-        # start = hours['start'] ?? '09:00';
-        # end = hours['end'] ?? '21:00';
-        # daysMap = hours['days'] as Map<String, dynamic>?;
-        
-        if not working_hours:
-            return []
-            
-        days_map = working_hours.get('days', {})
-        # Check if day is enabled (keys are lowercase in DB usually)
-        if not days_map.get(day_name.lower(), False):
-            return []
-            
-        start_str = working_hours.get('start', '09:00')
-        end_str = working_hours.get('end', '21:00')
-        
-        try:
-            start_time = datetime.strptime(start_str, "%H:%M").time()
-            end_time = datetime.strptime(end_str, "%H:%M").time()
-        except ValueError:
-            return []
-            
-        # Optimize: Create set of booked times for O(1) lookup
-        booked_times = {res.visit_date for res in existing_reservations}
-
-        # Create base slots (30 min intervals)
-        slots = []
-        current_time = datetime.combine(date.date(), start_time)
-        end_datetime = datetime.combine(date.date(), end_time)
-        
-        while current_time + timedelta(minutes=30) <= end_datetime:
-            slot_start = current_time
-            
-            # Check availability
-            if slot_start not in booked_times:
-                slots.append(slot_start.strftime("%H:%M"))
-                
-            current_time += timedelta(minutes=30)
-            
-        return slots
+        template = compile_working_hours(working_hours)
+        mask = occupancy_mask(res.visit_date for res in existing_reservations)
+        return free_slots(template, date.date(), mask, slot_minutes)
+
+    @staticmethod
+    def generate_range(
+        working_hours: Dict,
+        start_date: date,
+        end_date: date,
+        visit_times: Iterable[datetime],
+        slot_minutes: int = DEFAULT_SLOT_MINUTES
+    ) -> Dict[date, List[str]]:
+        """
+        Generate available slots for every day in [start_date, end_date]
+        from a single batch of reservation times.
+        """
+        visits_by_day: Dict[date, List[datetime]] = {}
+        for visit in visit_times:
+            visits_by_day.setdefault(visit.date(), []).append(visit)
+
+        masks = {}
+        day = start_date
+        while day <= end_date:
+            masks[day] = occupancy_mask(visits_by_day.get(day, ()))
+            day += timedelta(days=1)
+        return SlotGenerator.generate_from_masks(working_hours, masks, slot_minutes)
+
+    @staticmethod
+    def generate_from_masks(
+        working_hours: Dict,
+        masks: Dict[date, int],
+        slot_minutes: int = DEFAULT_SLOT_MINUTES
+    ) -> Dict[date, List[str]]:
+        """Generate available slots for each day from precomputed occupancy bitmaps"""
+        template = compile_working_hours(working_hours)
+        return {
+            day: free_slots(template, day, masks[day], slot_minutes)
+            for day in sorted(masks)
+        }
@@ -0,0 +1,239 @@
+"""
+Jiwar Backend - Upload Storage
+Content-addressed, sharded blob storage for uploads and its garbage collection
+"""
+import hashlib
+import hmac
+import logging
+import os
+import re
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Iterator, Optional, Set
+
+from app.core.config import settings
+from app.core.database import DoctorsSessionLocal, PharmaciesSessionLocal, TeachersSessionLocal
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = "static/uploads"
+
+# Public path of a stored file (served by utils.get_secure_file)
+FILE_URL_PREFIX = "/api/utils/files/"
+
+# Prefix of in-progress uploads (see utils.save_upload_file)
+TEMP_PREFIX = ".upload-"
+
+# <sha256>.<ext> - older uploads are flat <uuid4>.<ext> files
+_BLOB_NAME = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]+$")
+_FILE_URL = re.compile(re.escape(FILE_URL_PREFIX) + r"([^/?#\s\"']+)")
+# A whole stored-file URL, optionally with host and query string
+_FILE_URL_FULL = re.compile(r"^(.*?" + re.escape(FILE_URL_PREFIX) + r"[^/?#\s]+)(?:\?[^#\s]*)?$")
+
+
+def blob_name(digest: str, extension: str) -> str:
+    return f"{digest}.{extension}"
+
+
+def blob_path(filename: str) -> str:
+    """
+    Location of a stored file.
+    Content-addressed blobs live in two levels of shard directories
+    (ab/cd/abcd....jpg); legacy uuid names stay in the flat upload dir.
+    """
+    if _BLOB_NAME.match(filename):
+        return os.path.join(UPLOAD_DIR, filename[:2], filename[2:4], filename)
+    return os.path.join(UPLOAD_DIR, filename)
+
+
+def file_url(filename: str) -> str:
+    return f"{FILE_URL_PREFIX}{filename}"
+
+
+# ==========================================
+# SIGNED FILE URLS
+# ==========================================
+
+def file_signature(filename: str, expires: int) -> str:
+    message = f"{filename}:{expires}".encode()
+    return hmac.new(settings.secret_key.encode(), message, hashlib.sha256).hexdigest()[:32]
+
+
+def verify_file_signature(filename: str, expires: Optional[int], sig: Optional[str]) -> bool:
+    """Whether `expires` / `sig` query parameters grant access to a stored file"""
+    if expires is None or not sig or expires < time.time():
+        return False
+    return hmac.compare_digest(file_signature(filename, expires), sig)
+
+
+def url_expiry_bucket(ttl: Optional[int] = None, now: Optional[float] = None) -> int:
+    """
+    Expiry shared by every URL signed in the current TTL window
+    (FILE_URL_TTL_SECONDS unless given). URLs stay byte-identical for a
+    whole window (so clients keep their cached images) and are valid for
+    at least one more TTL.
+    """
+    ttl = ttl or settings.file_url_ttl_seconds
+    now = time.time() if now is None else now
+    return (int(now) // ttl + 2) * ttl
+
+
+def sign_file_url(value: Optional[str], ttl: Optional[int] = None) -> Optional[str]:
+    """
+    Append an expiring signature to a stored-file URL so it can be fetched
+    without an access token for `ttl` to 2x `ttl` seconds. Other values
+    (external URLs, base64 data) are returned unchanged.
+    """
+    if not value or FILE_URL_PREFIX not in value:
+        return value
+    match = _FILE_URL_FULL.match(value)
+    if match is None:
+        return value
+    url = match.group(1)
+    filename = url.rsplit("/", 1)[1]
+    expires = url_expiry_bucket(ttl)
+    return f"{url}?expires={expires}&sig={file_signature(filename, expires)}"
+
+
+def unsigned_file_url(value: Optional[str]) -> Optional[str]:
+    """Drop the signature of a stored-file URL (before saving it)"""
+    if not value or FILE_URL_PREFIX not in value:
+        return value
+    match = _FILE_URL_FULL.match(value)
+    return match.group(1) if match else value
+
+
+def with_signed_image(item: dict, key: str = "profile_image") -> dict:
+    """Copy of a response dict with its image URL signed"""
+    if not item.get(key):
+        return item
+    return {**item, key: sign_file_url(item[key])}
+
+
+def _stem(filename: str) -> str:
+    """Blob / uuid part of a stored file name (originals and derivatives share it)"""
+    return filename.split(".", 1)[0]
+
+
+def commit_blob(temp_path: str, filename: str) -> bool:
+    """
+    Move a fully written upload into place (blocking).
+    If the same content is already stored the temp file is dropped and the
+    existing blob's mtime refreshed, so a pending GC sweep keeps it.
+
+    Returns:
+        True if a new blob was stored, False if it was deduplicated
+    """
+    path = blob_path(filename)
+    if os.path.exists(path):
+        os.utime(path)
+        os.remove(temp_path)
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(temp_path, path)
+    return True
+
+
+def file_etag(filename: str, variant: Optional[str], stat_result: os.stat_result) -> str:
+    """
+    Strong ETag of a stored file. Blobs are tagged by their content hash
+    (stable across dedup mtime refreshes); legacy files by size and mtime.
+    """
+    if _BLOB_NAME.match(filename):
+        tag = _stem(filename) if not variant else f"{_stem(filename)}.{variant}"
+    else:
+        tag = f"{stat_result.st_size:x}-{int(stat_result.st_mtime):x}"
+        if variant:
+            tag = f"{tag}.{variant}"
+    return f'"{tag}"'
+
+
+def last_modified(stat_result: os.stat_result) -> str:
+    return formatdate(stat_result.st_mtime, usegmt=True)
+
+
+def is_not_modified(request_headers, etag: str, stat_result: os.stat_result) -> bool:
+    """Evaluate If-None-Match (preferred) / If-Modified-Since against a stored file"""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag in tags or "*" in tags
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(stat_result.st_mtime) <= since
+    return False
+
+
+# ==========================================
+# GARBAGE COLLECTION
+# ==========================================
+
+def referenced_files() -> Set[str]:
+    """
+    Stems of every stored file referenced by a provider profile image or
+    a prescription image. Only rows holding a file URL are fetched.
+    """
+    from app.models import Doctor, Pharmacy
+    from app.models.orders import PharmacyOrder
+    from app.models.teacher import Teacher
+
+    targets = [
+        (DoctorsSessionLocal, Doctor.profile_image),
+        (PharmaciesSessionLocal, Pharmacy.profile_image),
+        (PharmaciesSessionLocal, PharmacyOrder.prescription_image),
+        (TeachersSessionLocal, Teacher.profile_image),
+    ]
+    stems: Set[str] = set()
+    for session_factory, column in targets:
+        db = session_factory()
+        try:
+            rows = db.query(column).filter(
+                column.contains(FILE_URL_PREFIX, autoescape=True)
+            ).yield_per(1000)
+            for (value,) in rows:
+                stems.update(_stem(name) for name in _FILE_URL.findall(value))
+        finally:
+            db.close()
+    return stems
+
+
+def _stored_files(root: str) -> Iterator[os.DirEntry]:
+    for entry in os.scandir(root):
+        if entry.is_dir(follow_symlinks=False):
+            yield from _stored_files(entry.path)
+        elif entry.is_file(follow_symlinks=False):
+            yield entry
+
+
+def collect_garbage(grace_hours: int) -> Dict[str, int]:
+    """
+    Delete stored files (and their derivatives) that nothing references.
+    Files younger than `grace_hours` are kept: an upload is referenced only
+    after the client saves the returned URL into a profile or an order.
+    Abandoned temp files older than the grace period are removed as well.
+    """
+    if not os.path.isdir(UPLOAD_DIR):
+        return {"scanned": 0, "deleted": 0}
+
+    referenced = referenced_files()
+    cutoff = time.time() - grace_hours * 3600
+    scanned = deleted = 0
+
+    for entry in _stored_files(UPLOAD_DIR):
+        scanned += 1
+        if entry.stat(follow_symlinks=False).st_mtime > cutoff:
+            continue
+        if not entry.name.startswith(TEMP_PREFIX) and _stem(entry.name) in referenced:
+            continue
+        try:
+            os.remove(entry.path)
+            deleted += 1
+        except OSError as e:
+            logger.warning(f"Could not delete unreferenced upload {entry.path}: {e}")
+
+    return {"scanned": scanned, "deleted": deleted}
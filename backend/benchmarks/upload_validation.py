@@ -0,0 +1,71 @@
+"""
+Jiwar - Upload Validation Benchmark
+===================================
+
+Measures MIME validation throughput of uploads (libmagic sniffing of
+the first chunk): a new detector per call versus the per-thread
+detector used by utils.validate_file_content, single-threaded and
+from a thread pool.
+
+Usage: python benchmarks/upload_validation.py [--iterations 2000] [--threads 8]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import magic
+
+from app.routers.utils import validate_file_content
+
+# First bytes of typical uploads (enough for libmagic)
+SAMPLES = [
+    b"\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00" + b"\x00" * 4096,
+    b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x02\x00\x00\x00" + b"\x00" * 4096,
+    b"RIFF\x24\x00\x00\x00WEBPVP8 " + b"\x00" * 4096,
+    b"GIF89a\x01\x00\x01\x00\x00\x00\x00" + b"\x00" * 4096,
+]
+
+
+def per_call_detector(content: bytes) -> str:
+    """Previous behaviour: a new detector (and magic database load) per upload"""
+    return magic.Magic(mime=True).from_buffer(content[:2048])
+
+
+def run(label: str, func, iterations: int, threads: int = 1):
+    payloads = [SAMPLES[i % len(SAMPLES)] for i in range(iterations)]
+    start = time.perf_counter()
+    if threads == 1:
+        for payload in payloads:
+            func(payload)
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(func, payloads))
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<36} {iterations / elapsed:>10.0f} validations/s  ({elapsed * 1000 / iterations:.3f} ms each)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    # Warm up the per-thread detector of the main thread
+    validate_file_content(SAMPLES[0])
+
+    print(f"\n📊 Upload validation ({args.iterations} uploads)\n")
+    run("new detector per call", per_call_detector, args.iterations)
+    run("per-thread detector", validate_file_content, args.iterations)
+    run(f"new detector per call, {args.threads} threads", per_call_detector, args.iterations, args.threads)
+    run(f"per-thread detector, {args.threads} threads", validate_file_content, args.iterations, args.threads)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Database Migration: Change feed columns (change_seq, tombstones) for provider_directory
+Run after create_provider_directory.py to upgrade an existing users database.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.core.database import users_engine
+from app.models.directory import ProviderDirectorySequence
+
+def run_migration():
+    """Add is_deleted / change_seq, the feed index and the sequence counter"""
+    try:
+        ProviderDirectorySequence.__table__.create(users_engine, checkfirst=True)
+        with users_engine.begin() as conn:
+            conn.execute(text(
+                "ALTER TABLE provider_directory ADD COLUMN IF NOT EXISTS "
+                "is_deleted BOOLEAN NOT NULL DEFAULT false"
+            ))
+            conn.execute(text(
+                "ALTER TABLE provider_directory ADD COLUMN IF NOT EXISTS "
+                "change_seq BIGINT NOT NULL DEFAULT 0"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_provider_directory_change_seq "
+                "ON provider_directory (change_seq, id)"
+            ))
+            # Existing rows form the first snapshot (change_seq 1)
+            conn.execute(text("UPDATE provider_directory SET change_seq = 1 WHERE change_seq = 0"))
+            conn.execute(text(
+                "INSERT INTO provider_directory_sequence (id, value) "
+                "SELECT 1, 1 WHERE NOT EXISTS (SELECT 1 FROM provider_directory_sequence WHERE id = 1)"
+            ))
+        print("✅ provider_directory change feed ready!")
+        return True
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    run_migration()
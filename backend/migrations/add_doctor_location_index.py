@@ -0,0 +1,27 @@
+"""
+Database Migration: (specialty_id, latitude, longitude) index for nearest-doctor search
+Run this script to upgrade an existing doctors database.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.core.database import doctors_engine
+
+def run_migration():
+    """Create ix_doctors_specialty_lat_lng if it doesn't exist"""
+    try:
+        with doctors_engine.begin() as conn:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_doctors_specialty_lat_lng "
+                "ON doctors (specialty_id, latitude, longitude)"
+            ))
+        print("✅ doctors location index created successfully!")
+        return True
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    run_migration()
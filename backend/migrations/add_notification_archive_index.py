@@ -0,0 +1,27 @@
+"""
+Database Migration: Partial index on read notifications for the retention job
+Run after add_notification_counters.py to upgrade an existing users database.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.core.database import users_engine
+
+def run_migration():
+    """Create the (created_at, id) WHERE is_read index"""
+    try:
+        with users_engine.begin() as conn:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_notifications_read_created_id "
+                "ON notifications (created_at, id) WHERE is_read"
+            ))
+        print("✅ Notification retention index created!")
+        return True
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    run_migration()
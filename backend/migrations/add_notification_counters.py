@@ -0,0 +1,39 @@
+"""
+Database Migration: Unread notification counter, feed index and archive table
+Run this script to upgrade an existing users database.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.core.database import users_engine
+from app.models.notification import NotificationArchive
+
+def run_migration():
+    """Add users.unread_notifications, backfill it and create the feed index"""
+    try:
+        with users_engine.begin() as conn:
+            conn.execute(text(
+                "ALTER TABLE users ADD COLUMN IF NOT EXISTS "
+                "unread_notifications INTEGER NOT NULL DEFAULT 0"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_notifications_user_created_id "
+                "ON notifications (user_id, created_at, id)"
+            ))
+            # Backfill counters from existing notifications
+            conn.execute(text(
+                "UPDATE users SET unread_notifications = ("
+                "SELECT count(*) FROM notifications n "
+                "WHERE n.user_id = users.id AND n.is_read = false)"
+            ))
+        NotificationArchive.__table__.create(users_engine, checkfirst=True)
+        print("✅ Notification counters, index and archive table ready!")
+        return True
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,59 @@
+"""
+Database Migration: Precomputed Bayesian ranking score for providers
+Run after add_rating_aggregates.py to upgrade existing doctors, pharmacies
+and teachers databases. Recency decay (if enabled) is applied by the
+reconcile_ratings maintenance job.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.database import doctors_engine, pharmacies_engine, teachers_engine
+
+# (engine, provider table, indexed with city)
+TARGETS = [
+    (doctors_engine, "doctors", True),
+    (pharmacies_engine, "pharmacies", False),
+    (teachers_engine, "teachers", True),
+]
+
+def run_migration():
+    """Add ranking columns, backfill them and create the ranking indexes"""
+    prior_weight = float(settings.ranking_prior_weight)
+    prior_mean = float(settings.ranking_prior_mean)
+    try:
+        for engine, table, with_city in TARGETS:
+            with engine.begin() as conn:
+                for column in ("ranking_weighted_sum", "ranking_weighted_count", "ranking_score"):
+                    conn.execute(text(
+                        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS "
+                        f"{column} DOUBLE PRECISION NOT NULL DEFAULT 0"
+                    ))
+                # Unrated providers (also ones inserted outside the ORM) start at the prior mean
+                conn.execute(text(
+                    f"ALTER TABLE {table} ALTER COLUMN ranking_score SET DEFAULT {prior_mean}"
+                ))
+                conn.execute(text(
+                    f"UPDATE {table} SET "
+                    f"ranking_weighted_sum = rating_sum, "
+                    f"ranking_weighted_count = coalesce(total_ratings, 0), "
+                    f"ranking_score = (:weight * :mean + rating_sum) / (:weight + coalesce(total_ratings, 0))"
+                ), {"weight": prior_weight, "mean": prior_mean})
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{table}_ranking_score ON {table} (ranking_score)"
+                ))
+                if with_city:
+                    conn.execute(text(
+                        f"CREATE INDEX IF NOT EXISTS ix_{table}_city_ranking "
+                        f"ON {table} (city, ranking_score, id)"
+                    ))
+            print(f"✅ {table}: ranking score added and backfilled")
+        return True
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    run_migration()
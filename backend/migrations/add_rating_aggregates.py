@@ -0,0 +1,51 @@
+"""
+Database Migration: Running rating aggregates (sum + per-star histogram)
+Run this script to upgrade existing doctors, pharmacies and teachers databases.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.core.database import doctors_engine, pharmacies_engine, teachers_engine
+
+AGGREGATE_COLUMNS = ["rating_sum"] + [f"rating_{stars}_count" for stars in range(1, 6)]
+
+# (engine, provider table, ratings table, foreign key column)
+TARGETS = [
+    (doctors_engine, "doctors", "doctor_ratings", "doctor_id"),
+    (pharmacies_engine, "pharmacies", "pharmacy_ratings", "pharmacy_id"),
+    (teachers_engine, "teachers", "teacher_ratings", "teacher_id"),
+]
+
+def run_migration():
+    """Add aggregate columns and backfill them from the ratings tables"""
+    try:
+        for engine, table, ratings_table, fk in TARGETS:
+            with engine.begin() as conn:
+                for column in AGGREGATE_COLUMNS:
+                    conn.execute(text(
+                        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS "
+                        f"{column} INTEGER NOT NULL DEFAULT 0"
+                    ))
+                histogram = ", ".join(
+                    f"rating_{stars}_count = (SELECT count(*) FROM {ratings_table} r "
+                    f"WHERE r.{fk} = {table}.id AND r.rating = {stars})"
+                    for stars in range(1, 6)
+                )
+                conn.execute(text(
+                    f"UPDATE {table} SET "
+                    f"rating_sum = (SELECT coalesce(sum(r.rating), 0) FROM {ratings_table} r "
+                    f"WHERE r.{fk} = {table}.id), "
+                    f"total_ratings = (SELECT count(*) FROM {ratings_table} r "
+                    f"WHERE r.{fk} = {table}.id), "
+                    f"{histogram}"
+                ))
+            print(f"✅ {table}: rating aggregates added and backfilled")
+        return True
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    run_migration()
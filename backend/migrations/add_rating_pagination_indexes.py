@@ -0,0 +1,37 @@
+"""
+Database Migration: Composite indexes for keyset-paginated ratings listings
+Run this script to upgrade existing doctors, pharmacies and teachers databases.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.core.database import doctors_engine, pharmacies_engine, teachers_engine
+
+# (engine, ratings table, foreign key column, index name prefix)
+TARGETS = [
+    (doctors_engine, "doctor_ratings", "doctor_id", "ix_doctor_ratings_doctor"),
+    (pharmacies_engine, "pharmacy_ratings", "pharmacy_id", "ix_pharmacy_ratings_pharmacy"),
+    (teachers_engine, "teacher_ratings", "teacher_id", "ix_teacher_ratings_teacher"),
+]
+
+def run_migration():
+    """Create (fk, created_at, id) and (fk, rating, id) indexes"""
+    try:
+        for engine, table, fk, prefix in TARGETS:
+            with engine.begin() as conn:
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS {prefix}_created_id ON {table} ({fk}, created_at, id)"
+                ))
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS {prefix}_rating_id ON {table} ({fk}, rating, id)"
+                ))
+            print(f"✅ {table}: pagination indexes created")
+        return True
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    run_migration()
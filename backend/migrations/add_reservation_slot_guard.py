@@ -0,0 +1,43 @@
+"""
+Database Migration: Unique partial index preventing doctor double-bookings
+Run this script to upgrade an existing doctors database.
+The index is built CONCURRENTLY, so bookings keep working while it runs.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.core.database import doctors_engine
+from app.models.reservations import ACTIVE_RESERVATION_SQL
+
+def run_migration():
+    """Create uq_doctor_reservations_active_slot if there are no duplicates"""
+    try:
+        with doctors_engine.connect() as conn:
+            duplicates = conn.execute(text(
+                "SELECT doctor_id, visit_date, array_agg(id ORDER BY id) AS ids "
+                "FROM doctor_reservations "
+                f"WHERE {ACTIVE_RESERVATION_SQL} "
+                "GROUP BY doctor_id, visit_date HAVING count(*) > 1"
+            )).all()
+        
+        if duplicates:
+            print("❌ Resolve these double-bookings first (cancel or reject all but one):")
+            for row in duplicates:
+                print(f"   doctor_id={row.doctor_id} visit_date={row.visit_date} reservation_ids={row.ids}")
+            return False
+        
+        with doctors_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(
+                "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_doctor_reservations_active_slot "
+                f"ON doctor_reservations (doctor_id, visit_date) WHERE {ACTIVE_RESERVATION_SQL}"
+            ))
+        print("✅ Double-booking guard index created successfully!")
+        return True
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    run_migration()
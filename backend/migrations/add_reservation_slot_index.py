@@ -0,0 +1,27 @@
+"""
+Database Migration: Composite (doctor_id, visit_date) index for slot lookups
+Run this script to upgrade an existing doctors database.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.core.database import doctors_engine
+
+def run_migration():
+    """Create ix_doctor_reservations_doctor_visit if it doesn't exist"""
+    try:
+        with doctors_engine.begin() as conn:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_doctor_reservations_doctor_visit "
+                "ON doctor_reservations (doctor_id, visit_date)"
+            ))
+        print("✅ doctor_reservations slot index created successfully!")
+        return True
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,31 @@
+"""
+Database Migration: Create and fill the provider_directory read model
+Run this script to upgrade an existing users database.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.core.database import users_engine
+from app.models.directory import ProviderDirectory
+from app.services.directory import rebuild_directory
+
+def run_migration():
+    """Create provider_directory (with its search index) and fill it from the provider databases"""
+    try:
+        with users_engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        ProviderDirectory.__table__.create(users_engine, checkfirst=True)
+        # Tables created before the trigram index existed
+        for index in ProviderDirectory.__table__.indexes:
+            index.create(users_engine, checkfirst=True)
+        counts = rebuild_directory()
+        print(f"✅ provider_directory created and filled: {counts}")
+        return True
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    run_migration()